@@ -0,0 +1,69 @@
+"""
+Adaptive admission control
+A concurrency limit in front of request handlers that follows observed
+latency with AIMD: the limit creeps up by about one slot per limit's worth
+of fast completions while it is saturated, and is cut multiplicatively when
+completions run slower than the target. Requests beyond the limit are
+rejected immediately instead of queueing behind busy threads.
+"""
+
+import threading
+import time
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit; a limiter with min_limit == max_limit is a fixed budget"""
+
+    def __init__(self, initial, min_limit=1, max_limit=None, target_latency=0.1, backoff=0.9):
+        self.min_limit = min_limit
+        self.max_limit = max_limit if max_limit is not None else initial
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._last_decrease = 0.0
+        self._accepted = 0
+        self._rejected = 0
+
+    def try_acquire(self):
+        """Take a slot if one is free; never blocks"""
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self._rejected += 1
+                return False
+            self.in_flight += 1
+            self._accepted += 1
+            return True
+
+    def resize(self, max_limit):
+        """New ceiling, e.g. once the real thread pool size is known; the limit starts there"""
+        with self._lock:
+            self.max_limit = max(self.min_limit, max_limit)
+            self.limit = float(self.max_limit)
+
+    def release(self, latency=None):
+        """Return a slot and adapt the limit to how long the request took (None: do not adapt)"""
+        with self._lock:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            if latency is None:
+                return
+            now = time.monotonic()
+            if latency > self.target_latency:
+                # Cut at most once per target interval, so one burst of slow
+                # completions does not collapse the limit to the floor
+                if now - self._last_decrease >= self.target_latency:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            elif saturated:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'accepted': self._accepted,
+                'rejected': self._rejected,
+            }
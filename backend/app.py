@@ -6,65 +6,273 @@ A production-ready Flask application with ML inference, logging, and monitoring
 import os
 import json
 import logging
-import joblib
 import numpy as np
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-import sys
+from werkzeug.middleware.proxy_fix import ProxyFix
+import hmac
+import math
+import signal
+import threading
+import time
+import config
+from exporter import load_predictor_module
+from artifact import atomic_write, load_forest, memory_report
+from inference import CompiledForest, LookupTable, QuantizedForest, probe_inputs, precision_report
+from batching import MicroBatcher
+from cache import PredictionCache
+from uds import UnixPredictionServer, bind_unix_socket
+import deadlines
+from deadlines import DeadlineExceeded
+from admission import AdaptiveLimiter
+from ratelimit import SharedRateLimiter
+from logpipe import configure_logging
+from predlog import PredictionLog, RateLimitedLog
+from audit import AuditLog
+from metrics import RequestMetrics, SharedTotals
+from encoding import (BINARY_MIMETYPE, MSGPACK_MIMETYPES, PredictionEncoder, binary_content_type, binary_dtype,
+                      decode_msgpack, decode_rows, encode_json, encode_msgpack, encode_rows, msgpack)
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+log_pipeline = configure_logging(config)
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
 
+def trust_proxies(hops):
+    """Take the client address and scheme from the headers of `hops` trusted reverse proxies"""
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+trust_proxies(config.TRUSTED_PROXY_HOPS)
+
 # Global variables for model and scaler
 model = None
 scaler = None
+engine = None
 model_metadata = {}
 
-def load_or_train_model():
-    """Load existing model or train a new one"""
-    global model, scaler, model_metadata
+class ModelBundle:
+    """One model version: estimator, scaler, serving engine and metadata
+    
+    Swapped in as a single reference, so a request that read `bundle` once
+    finishes on that version even if a reload lands mid-request.
+    """
     
-    model_path = 'models/iris_model.pkl'
-    scaler_path = 'models/scaler.pkl'
+    def __init__(self, engine, model=None, scaler=None, metadata=None):
+        self.engine = engine
+        self.model = model
+        self.scaler = scaler
+        self.metadata = metadata if metadata is not None else {}
+
+bundle = None
+
+# model_files_signature() of the files the serving bundle came from; forked
+# workers compare against it instead of reloading what the master already has
+loaded_signature = None
+
+# Representative rows used to warm a freshly loaded engine before it serves
+WARMUP_ROWS = np.array([
+    [5.1, 3.5, 1.4, 0.2], [7.0, 3.2, 4.7, 1.4], [6.3, 3.3, 6.0, 2.5], [5.9, 3.0, 4.2, 1.5]
+])
+
+def load_model_bundle(allow_training=True):
+    """Load the configured model from disk (training one if allowed) and compile its engine"""
+    model = scaler = forest = None
+    metadata = {}
     
     try:
-        if os.path.exists(model_path) and os.path.exists(scaler_path):
+        if config.MODEL_FORMAT == 'module' and os.path.exists(config.MODEL_MODULE_PATH):
+            # NumPy-only module from exporter.py: no scikit-learn import, no unpickling
+            logger.info("Loading exported predictor module from disk")
+            forest = CompiledForest.from_module(load_predictor_module(config.MODEL_MODULE_PATH))
+            metadata['source'] = 'module'
+        elif config.MODEL_FORMAT == 'mmap' and os.path.exists(config.MODEL_ARTIFACT_PATH):
+            # Read-only mapping: every worker process shares the same page-cache pages
+            logger.info("Mapping forest artifact from disk")
+            forest = load_forest(config.MODEL_ARTIFACT_PATH)
+            metadata['source'] = 'mmap'
+        elif os.path.exists(config.MODEL_PATH) and os.path.exists(config.SCALER_PATH):
+            import joblib
             logger.info("Loading existing model from disk")
-            model = joblib.load(model_path)
-            scaler = joblib.load(scaler_path)
-            model_metadata['source'] = 'disk'
-        else:
+            model = joblib.load(config.MODEL_PATH)
+            scaler = joblib.load(config.SCALER_PATH)
+            metadata['source'] = 'disk'
+        elif allow_training:
+            import joblib
             logger.info("Training new model")
-            train_model()
-            os.makedirs('models', exist_ok=True)
-            joblib.dump(model, model_path)
-            joblib.dump(scaler, scaler_path)
-            model_metadata['source'] = 'training'
+            model, scaler = train_model()
+            # Renamed into place, so a watcher or sibling worker never loads a half-written file
+            with atomic_write(config.MODEL_PATH) as f:
+                joblib.dump(model, f)
+            with atomic_write(config.SCALER_PATH) as f:
+                joblib.dump(scaler, f)
+            metadata['source'] = 'training'
+        else:
+            raise FileNotFoundError('No model found on disk')
         
-        model_metadata['loaded_at'] = datetime.now().isoformat()
+        metadata['loaded_at'] = datetime.now().isoformat()
         logger.info("Model loaded successfully")
     except Exception as e:
+        if not allow_training:
+            raise
         logger.error(f"Error loading/training model: {str(e)}")
-        train_model()
+        model, scaler = train_model()
+        forest = None
+    
+    # Flatten the forest and fold the scaler into its thresholds once, so
+    # requests take raw features and skip sklearn's per-call overhead
+    if forest is None:
+        forest = CompiledForest.from_sklearn(model).fold_scaler(scaler)
+    serving = forest
+    metadata['n_estimators'] = forest.n_estimators
+    metadata['version'] = forest.fingerprint()
+    logger.info(f"Compiled forest: {forest.n_estimators} trees, {forest.n_nodes} nodes")
+    
+    if config.LOOKUP_TABLE_ENABLED:
+        try:
+            serving = LookupTable.from_forest(forest, max_bytes=config.LOOKUP_TABLE_MAX_BYTES)
+            logger.info(f"Lookup table: {serving.n_cells} cells, {serving.nbytes} bytes")
+        except MemoryError as e:
+            logger.warning(f"Falling back to tree traversal: {str(e)}")
+    
+    if config.MODEL_PRECISION != 'float64' and isinstance(serving, CompiledForest):
+        compact = QuantizedForest(serving, config.MODEL_PRECISION, leaf_bits=config.MODEL_LEAF_BITS)
+        report = precision_report(serving, compact, probe_inputs(serving))
+        metadata['precision'] = dict(report, precision=config.MODEL_PRECISION)
+        logger.info(
+            f"Using {config.MODEL_PRECISION} forest: {report['candidate_bytes']} bytes "
+            f"(was {report['reference_bytes']}), max probability deviation "
+            f"{report['max_abs_probability_deviation']:.6f}, class flip rate {report['class_flip_rate']:.4%}"
+        )
+        serving = compact
+    
+    return ModelBundle(serving, model, scaler, metadata)
+
+def install_bundle(new_bundle):
+    """Atomically make new_bundle the serving model"""
+    global bundle, model, scaler, engine, model_metadata
+    
+    # Single reference swap; the module-level aliases are kept for scripts
+    # and the REPL, request paths only ever read `bundle`
+    bundle = new_bundle
+    model, scaler = new_bundle.model, new_bundle.scaler
+    engine, model_metadata = new_bundle.engine, new_bundle.metadata
+    
+    # Cached answers belong to the previous model; invalidating after the
+    # swap means any entry computed on the old engine carries a stale generation
+    if prediction_cache is not None:
+        prediction_cache.invalidate()
+
+def load_or_train_model():
+    """Load existing model or train a new one"""
+    global loaded_signature
+    install_bundle(load_model_bundle())
+    # Taken after loading: training writes the files this reads
+    loaded_signature = model_files_signature()
+
+def warm_up(candidate):
+    """Run a few predictions so lazily built state exists before the swap"""
+    candidate.score(WARMUP_ROWS)
+    candidate.predict_class(WARMUP_ROWS, block_size=config.EARLY_EXIT_BLOCK_SIZE)
+    candidate.predict_class(WARMUP_ROWS[:1], block_size=config.EARLY_EXIT_BLOCK_SIZE)
+
+reload_lock = threading.Lock()
+reload_stats = {'reloads': 0, 'failures': 0, 'last_reload': None, 'last_error': None}
+
+# Called after every successful swap, e.g. to re-fork asgi.py's process pool
+reload_hooks = []
+
+# Set by serve.py in each worker to the master's pid: the master reloads
+# itself and then every worker on SIGHUP, so all of them serve one version
+reload_coordinator = None
+
+def reload_model(only_if_changed=False):
+    """
+    Load, warm and swap in the model on disk; the serving model is kept on failure
+    With only_if_changed, a model whose version matches the serving one is not swapped
+    """
+    global loaded_signature
+    if not reload_lock.acquire(blocking=False):
+        return False
+    try:
+        # Taken before loading, so a write racing the load still looks changed later
+        signature = model_files_signature()
+        new_bundle = load_model_bundle(allow_training=False)
+        if only_if_changed and bundle is not None and new_bundle.metadata['version'] == bundle.metadata['version']:
+            loaded_signature = signature
+            return False
+        warm_up(new_bundle.engine)
+        install_bundle(new_bundle)
+        loaded_signature = signature
+        for hook in reload_hooks:
+            hook()
+        reload_stats['reloads'] += 1
+        reload_stats['last_reload'] = new_bundle.metadata['loaded_at']
+        logger.info(f"Model hot-swapped: {new_bundle.metadata['n_estimators']} trees from {new_bundle.metadata['source']}")
+        return True
+    except Exception as e:
+        reload_stats['failures'] += 1
+        reload_stats['last_error'] = str(e)
+        logger.error(f"Model reload failed, keeping current model: {str(e)}")
+        return False
+    finally:
+        reload_lock.release()
+
+def request_reload():
+    """Start a background reload; returns False if one is already running"""
+    if reload_lock.locked():
+        return False
+    threading.Thread(target=reload_model, name='model-reload', daemon=True).start()
+    return True
+
+def model_files_signature():
+    """(path, mtime, size) of every file a reload could pick up"""
+    signature = []
+    for path in (config.MODEL_PATH, config.SCALER_PATH, config.MODEL_MODULE_PATH, config.MODEL_ARTIFACT_PATH):
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+watcher = None
+
+def start_model_watcher(interval=config.MODEL_WATCH_INTERVAL):
+    """Poll the model files and hot-reload once a change has been stable for one interval
+    
+    Threads do not survive fork, so pre-forked workers call this after forking.
+    """
+    global watcher
+    if watcher is not None and watcher.is_alive():
+        return watcher
+    
+    def watch():
+        loaded = pending = model_files_signature()
+        while True:
+            time.sleep(interval)
+            current = model_files_signature()
+            # Wait for the writer to finish: reload only on a change seen twice in a row
+            if current != loaded and current == pending:
+                logger.info("Model files changed on disk; reloading")
+                reload_model()
+                loaded = current
+            pending = current
+    
+    watcher = threading.Thread(target=watch, name='model-watcher', daemon=True)
+    watcher.start()
+    return watcher
 
 def train_model():
-    """Train a simple ML model on sample iris data"""
-    global model, scaler
+    """Train a simple ML model on sample iris data; returns (model, scaler)"""
+    
+    # Imported here so serving an exported module never loads scikit-learn
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
     
     # Sample iris dataset
     X = np.array([
@@ -81,80 +289,736 @@ def train_model():
     model.fit(X_scaled, y)
     
     logger.info("Model trained successfully")
+    return model, scaler
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint for monitoring"""
-    return jsonify({
+class InvalidFeatures(ValueError):
+    """Client input the model cannot score; answered with 400, not 500"""
+
+def check_finite(features):
+    """Reject NaN/infinite inputs, which the compiled forest would route silently"""
+    if not np.isfinite(features).all():
+        raise InvalidFeatures('Input contains NaN or infinity')
+
+def predict_rows(features):
+    """Score a raw (N, 4) feature matrix with a single forest pass"""
+    check_finite(features)
+    deadlines.check('inference')
+    started = time.perf_counter()
+    result = bundle.engine.score(features)
+    request_metrics.inference(time.perf_counter() - started, len(features))
+    return result
+
+def predict_observed(features):
+    """predict_rows for callers without their own logging (the Unix socket server)"""
+    started = time.perf_counter()
+    predictions, probabilities = predict_rows(features)
+    observe(features, predictions, probabilities, started)
+    return predictions, probabilities
+
+def predict_classes(features):
+    """Class-only scoring that stops walking trees once the argmax is settled"""
+    check_finite(features)
+    deadlines.check('inference')
+    started = time.perf_counter()
+    result = bundle.engine.predict_class(features, block_size=config.EARLY_EXIT_BLOCK_SIZE)
+    request_metrics.inference(time.perf_counter() - started, len(features))
+    return result
+
+# "compact" drops the timestamp and class-name keys: {"prediction", "probabilities": [...]}
+PREDICTION_MODES = ('full', 'class_only', 'compact')
+
+# Precompiled templates for single-prediction JSON responses
+prediction_encoder = PredictionEncoder(config.CLASS_NAMES)
+
+# Per-thread request, latency, batch-size and class counters behind /api/metrics;
+# the shared block is created before serve.py forks, so a scrape covers every worker
+request_metrics = RequestMetrics(
+    config.CLASS_NAMES,
+    shared=SharedTotals(len(config.CLASS_NAMES), slots=config.METRICS_WORKER_SLOTS),
+    publish_interval=config.METRICS_PUBLISH_INTERVAL
+)
+
+# Sampled per-prediction lines and a periodic summary instead of one line per call
+prediction_log = PredictionLog(
+    logger,
+    config.CLASS_NAMES,
+    sample_rate=config.PREDICTION_LOG_SAMPLE_RATE,
+    interval=config.PREDICTION_LOG_SUMMARY_INTERVAL
+)
+not_found_log = RateLimitedLog(logger, config.NOT_FOUND_LOG_LIMIT, config.NOT_FOUND_LOG_INTERVAL)
+
+audit_log = AuditLog(
+    config.AUDIT_DIR,
+    max_bytes=config.AUDIT_SEGMENT_MAX_BYTES,
+    max_age=config.AUDIT_SEGMENT_MAX_AGE,
+    compress=config.AUDIT_COMPRESS,
+    queue_size=config.AUDIT_QUEUE_SIZE
+) if config.AUDIT_ENABLED else None
+
+def observe(features, predictions, probabilities, started, current=None):
+    """
+    Feed scored rows to the log summary and the audit log
+    probabilities is None for class-only answers; current is the bundle that scored them
+    """
+    latency = time.perf_counter() - started
+    confidences = None if probabilities is None else np.max(probabilities, axis=-1)
+    prediction_log.record(predictions, confidences, latency)
+    request_metrics.predictions(predictions)
+    if audit_log is not None:
+        current = current or bundle
+        audit_log.record(features, predictions, probabilities, latency, current.metadata.get('version'))
+
+# Optional micro-batcher coalescing concurrent /api/predict calls
+batcher = MicroBatcher(
+    predict_rows,
+    max_batch_size=config.MICRO_BATCH_MAX_SIZE,
+    max_wait_us=config.MICRO_BATCH_MAX_WAIT_US
+) if config.MICRO_BATCH_ENABLED else None
+
+# Optional LRU+TTL cache in front of single-row inference
+prediction_cache = PredictionCache(
+    max_entries=config.PREDICTION_CACHE_MAX_ENTRIES,
+    ttl_seconds=config.PREDICTION_CACHE_TTL,
+    precision=config.PREDICTION_CACHE_PRECISION
+) if config.PREDICTION_CACHE_ENABLED else None
+
+# Optional Unix-domain-socket server sharing this process's model
+unix_server = None
+
+def start_unix_server(listener=None):
+    """
+    Serve the binary protocol on config.UNIX_SOCKET_PATH, or on an inherited listener
+    Started per process, after any fork, like the model watcher
+    """
+    global unix_server
+    if listener is None:
+        listener = bind_unix_socket(config.UNIX_SOCKET_PATH)
+    unix_server = UnixPredictionServer(predict_observed, listener, max_rows=config.MAX_BATCH_SIZE)
+    unix_server.start()
+    logger.info(f"Unix socket predictions on {config.UNIX_SOCKET_PATH}")
+    return unix_server
+
+def predict_one(features):
+    """Score one (1, 4) row through the cache and micro-batcher when enabled"""
+    check_finite(features)
+    
+    if prediction_cache is not None:
+        generation = prediction_cache.generation
+        key, features = prediction_cache.canonicalize(features)
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            return cached
+    
+    if batcher is not None:
+        prediction, probability = batcher.submit(features[0], deadline=deadlines.current_deadline())
+    else:
+        predictions, probabilities = predict_rows(features)
+        prediction, probability = predictions[0], probabilities[0]
+    result = (int(prediction), probability.tolist())
+    
+    if prediction_cache is not None:
+        prediction_cache.put(key, result, generation)
+    return result
+
+def health_payload():
+    return {
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'model_loaded': model is not None
-    }), 200
+        'model_loaded': bundle is not None
+    }
 
-@app.route('/api/predict', methods=['POST'])
-def predict():
+def model_info_payload():
+    metadata = bundle.metadata if bundle is not None else {}
+    return {
+        'model_type': 'RandomForestClassifier',
+        'n_estimators': metadata.get('n_estimators'),
+        'classes': ['Setosa', 'Versicolor', 'Virginica'],
+        'metadata': metadata
+    }
+
+def metrics_payload():
+    data = {
+        'timestamp': datetime.now().isoformat(),
+        'model_status': 'loaded' if bundle is not None else 'not_loaded',
+        'version': '1.0.0',
+        'model_version': bundle.metadata.get('version') if bundle is not None else None,
+        **request_metrics.snapshot(),
+        'model_reload': dict(reload_stats, in_progress=reload_lock.locked())
+    }
+    if batcher is not None:
+        data['micro_batching'] = batcher.stats()
+    if prediction_cache is not None:
+        data['prediction_cache'] = prediction_cache.stats()
+    if unix_server is not None:
+        data['unix_socket'] = unix_server.stats()
+    data['deadlines'] = deadlines.stats()
+    data['logging'] = log_pipeline.stats()
+    if audit_log is not None:
+        data['audit'] = audit_log.stats()
+    if rate_limiter is not None:
+        data['rate_limit'] = rate_limiter.stats()
+    if config.ADMISSION_ENABLED:
+        data['admission'] = {
+            'predict': predict_limiter.stats(),
+            'health': health_limiter.stats(),
+        }
+    # Unique vs shared resident memory of this worker; Linux only
+    mapped = bundle is not None and bundle.metadata.get('source') == 'mmap'
+    memory = memory_report(config.MODEL_ARTIFACT_PATH if mapped else None)
+    if memory is not None:
+        data['memory'] = memory
+    return data
+
+def handle_predict(data, as_bytes=False):
     """
-    ML prediction endpoint
-    Expected JSON: {"features": [5.1, 3.5, 1.4, 0.2]}
+    Score a parsed /api/predict body; returns (payload, status)
+    Shared by the Flask view and the ASGI variant in asgi.py. With as_bytes,
+    successful full and compact answers come back as encoded JSON bytes.
     """
+    started = time.perf_counter()
     try:
-        data = request.get_json()
+        deadlines.check('request queue')
         
         if not data or 'features' not in data:
             logger.warning("Invalid request: missing features")
-            return jsonify({'error': 'Missing features in request'}), 400
+            return {'error': 'Missing features in request'}, 400
+        
+        mode = data.get('mode', 'full')
+        if mode not in PREDICTION_MODES:
+            logger.warning(f"Invalid prediction mode: {mode}")
+            return {'error': f'Mode must be one of {list(PREDICTION_MODES)}'}, 400
         
         features = np.array(data['features']).reshape(1, -1)
         
         if features.shape[1] != 4:
             logger.warning(f"Invalid feature count: {features.shape[1]}")
-            return jsonify({'error': 'Expected 4 features'}), 400
-        
-        # Scale and predict
-        features_scaled = scaler.transform(features)
-        prediction = model.predict(features_scaled)[0]
-        probability = model.predict_proba(features_scaled)[0].tolist()
+            return {'error': 'Expected 4 features'}, 400
         
         iris_classes = ['Setosa', 'Versicolor', 'Virginica']
         
-        logger.info(f"Prediction made: class={iris_classes[prediction]}, confidence={max(probability):.4f}")
+        if mode == 'class_only':
+            predictions, trees_evaluated = predict_classes(features)
+            prediction = int(predictions[0])
+            observe(features, prediction, None, started)
+            if prediction_log.sampled():
+                logger.info("Class prediction made: class=%s, trees=%d", iris_classes[prediction], trees_evaluated[0])
+            return {
+                'prediction': prediction,
+                'class': iris_classes[prediction],
+                'trees_evaluated': int(trees_evaluated[0]),
+                'timestamp': datetime.now().isoformat()
+            }, 200
+        
+        # Predict in one forest traversal (scaling is folded into the forest)
+        prediction, probability = predict_one(features)
+        confidence = max(probability)
+        
+        observe(features, prediction, probability, started)
+        if prediction_log.sampled():
+            logger.info("Prediction made: class=%s, confidence=%.4f", iris_classes[prediction], confidence)
         
-        return jsonify({
+        if mode == 'compact':
+            if as_bytes:
+                return prediction_encoder.compact(prediction, probability), 200
+            return {'prediction': prediction, 'probabilities': probability}, 200
+        
+        timestamp = datetime.now().isoformat()
+        if as_bytes:
+            return prediction_encoder.full(prediction, probability, confidence, timestamp), 200
+        
+        return {
             'prediction': int(prediction),
             'class': iris_classes[prediction],
-            'confidence': float(max(probability)),
+            'confidence': float(confidence),
             'probabilities': {
                 iris_classes[i]: float(probability[i]) for i in range(3)
             },
+            'timestamp': timestamp
+        }, 200
+        
+    except DeadlineExceeded as e:
+        logger.warning(f"Prediction dropped: {str(e)}")
+        return {'error': str(e)}, e.status
+    except InvalidFeatures as e:
+        logger.warning(f"Invalid features: {str(e)}")
+        return {'error': str(e)}, 400
+    except Exception as e:
+        logger.error(f"Prediction error: {str(e)}")
+        return {'error': str(e)}, 500
+
+def handle_predict_json(data):
+    """/api/predict straight to JSON bytes; returns (body, status)"""
+    result, status = handle_predict(data, as_bytes=True)
+    if not isinstance(result, bytes):
+        result = encode_json(result)
+    return result, status
+
+def handle_predict_batch(data):
+    """
+    Score a parsed /api/predict/batch body; returns (payload, status)
+    Shared by the Flask view and the ASGI variant in asgi.py
+    """
+    started = time.perf_counter()
+    try:
+        deadlines.check('request queue')
+        
+        if not data or 'features' not in data:
+            logger.warning("Invalid batch request: missing features")
+            return {'error': 'Missing features in request'}, 400
+        
+        mode = data.get('mode', 'full')
+        if mode not in PREDICTION_MODES:
+            logger.warning(f"Invalid prediction mode: {mode}")
+            return {'error': f'Mode must be one of {list(PREDICTION_MODES)}'}, 400
+        
+        rows = data['features']
+        
+        if not isinstance(rows, list) or not rows:
+            logger.warning("Invalid batch request: features is not a non-empty list")
+            return {'error': 'Expected a non-empty list of feature rows'}, 400
+        
+        if len(rows) > config.MAX_BATCH_SIZE:
+            logger.warning(f"Batch too large: {len(rows)} rows")
+            return {'error': f'Batch size exceeds {config.MAX_BATCH_SIZE} rows'}, 413
+        
+        try:
+            features = np.array(rows, dtype=float)
+        except (TypeError, ValueError):
+            logger.warning("Invalid batch request: ragged or non-numeric rows")
+            return {'error': 'Expected 4 numeric features per row'}, 400
+        
+        if features.ndim != 2 or features.shape[1] != 4:
+            logger.warning(f"Invalid batch shape: {features.shape}")
+            return {'error': 'Expected 4 features per row'}, 400
+        
+        iris_classes = ['Setosa', 'Versicolor', 'Virginica']
+        
+        if mode == 'class_only':
+            predictions, trees_evaluated = predict_classes(features)
+            results = [
+                {
+                    'prediction': prediction,
+                    'class': iris_classes[prediction],
+                    'trees_evaluated': trees
+                }
+                for prediction, trees in zip(predictions.tolist(), trees_evaluated.tolist())
+            ]
+            observe(features, predictions, None, started)
+            logger.info("Batch class prediction made: rows=%d, trees=%d", len(results), trees_evaluated.sum())
+            return {
+                'predictions': results,
+                'count': len(results),
+                'trees_evaluated': int(trees_evaluated.sum()),
+                'timestamp': datetime.now().isoformat()
+            }, 200
+        
+        # One forest pass for the whole matrix
+        predictions, probabilities = predict_rows(features)
+        observe(features, predictions, probabilities, started)
+        
+        if mode == 'compact':
+            results = [
+                {'prediction': prediction, 'probabilities': row}
+                for prediction, row in zip(predictions.tolist(), probabilities.tolist())
+            ]
+            logger.info("Batch prediction made: rows=%d", len(results))
+            return {'predictions': results, 'count': len(results)}, 200
+        
+        results = [
+            {
+                'prediction': prediction,
+                'class': iris_classes[prediction],
+                'confidence': max(row),
+                'probabilities': {
+                    iris_classes[i]: row[i] for i in range(3)
+                }
+            }
+            for prediction, row in zip(predictions.tolist(), probabilities.tolist())
+        ]
+        
+        logger.info("Batch prediction made: rows=%d", len(results))
+        
+        return {
+            'predictions': results,
+            'count': len(results),
             'timestamp': datetime.now().isoformat()
-        }), 200
+        }, 200
         
+    except DeadlineExceeded as e:
+        logger.warning(f"Batch prediction dropped: {str(e)}")
+        return {'error': str(e)}, e.status
+    except InvalidFeatures as e:
+        logger.warning(f"Invalid features: {str(e)}")
+        return {'error': str(e)}, 400
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        return {'error': str(e)}, 500
+
+ENCODED_MIMETYPES = (BINARY_MIMETYPE,) + MSGPACK_MIMETYPES
+
+def handle_encoded_predict(body, mimetype, params, batch=False):
+    """
+    Score a binary or msgpack prediction body; returns (body, status, content type)
+    Binary rows go straight to the engine and come back as packed probabilities
+    in the request's dtype; msgpack documents take the JSON handlers' path
+    """
+    started = time.perf_counter()
+    if mimetype in MSGPACK_MIMETYPES:
+        if msgpack is None:
+            return encode_json({'error': 'msgpack is not installed on this server'}), 415, 'application/json'
+        try:
+            data = decode_msgpack(body)
+        except Exception:
+            logger.warning("Invalid msgpack body")
+            return encode_msgpack({'error': 'Invalid msgpack body'}), 400, MSGPACK_MIMETYPES[0]
+        payload, status = handle_predict_batch(data) if batch else handle_predict(data)
+        return encode_msgpack(payload), status, MSGPACK_MIMETYPES[0]
+    
+    try:
+        name, dtype = binary_dtype(params)
+        features = decode_rows(body, dtype)
+    except ValueError as e:
+        logger.warning(f"Invalid binary request: {str(e)}")
+        return encode_json({'error': str(e)}), 400, 'application/json'
+    
+    if not batch and len(features) != 1:
+        logger.warning(f"Invalid binary request: {len(features)} rows")
+        return encode_json({'error': 'Expected exactly one row'}), 400, 'application/json'
+    
+    if len(features) > config.MAX_BATCH_SIZE:
+        logger.warning(f"Batch too large: {len(features)} rows")
+        return encode_json({'error': f'Batch size exceeds {config.MAX_BATCH_SIZE} rows'}), 413, 'application/json'
+    
+    try:
+        if batch:
+            predictions, probabilities = predict_rows(features)
+        else:
+            prediction, probability = predict_one(features)
+            predictions, probabilities = [prediction], [probability]
+    except DeadlineExceeded as e:
+        logger.warning(f"Prediction dropped: {str(e)}")
+        return encode_json({'error': str(e)}), e.status, 'application/json'
+    except InvalidFeatures as e:
+        logger.warning(f"Invalid binary request: {str(e)}")
+        return encode_json({'error': str(e)}), 400, 'application/json'
+    except Exception as e:
+        logger.error(f"Prediction error: {str(e)}")
+        return encode_json({'error': str(e)}), 500, 'application/json'
+    
+    observe(features, predictions, probabilities, started)
+    return encode_rows(probabilities, dtype), 200, binary_content_type(name)
+
+def encoded_response():
+    """Flask response for a binary or msgpack prediction request"""
+    body, status, content_type = handle_encoded_predict(
+        request.get_data(), request.mimetype, request.mimetype_params, batch=request.path == '/api/predict/batch'
+    )
+    return Response(body, status, content_type=content_type)
+
+def iter_lines(read, chunk_bytes=16384, max_line_bytes=None):
+    """Yield the lines of a file-like body without buffering more than one read"""
+    max_line_bytes = max_line_bytes or config.STREAM_MAX_LINE_BYTES
+    pending = b''
+    while True:
+        data = read(chunk_bytes)
+        if not data:
+            break
+        lines = (pending + data).split(b'\n')
+        pending = lines.pop()
+        # The unterminated tail is checked too, so one endless line cannot grow `pending`
+        if len(pending) > max_line_bytes or max(map(len, lines), default=0) > max_line_bytes:
+            raise ValueError(f'Line longer than {max_line_bytes} bytes')
+        yield from lines
+    if pending:
+        yield pending
+
+def parse_stream_rows(numbered_lines):
+    """(line number, line) pairs to an (N, 4) matrix; errors name the offending line"""
+    try:
+        features = np.array(json.loads(b'[' + b','.join(line for _, line in numbered_lines) + b']'), dtype=float)
+        # One row per line: a row split over two lines, or two rows on one, would
+        # still join into a valid matrix but misalign answers with input lines
+        if features.ndim == 2 and features.shape == (len(numbered_lines), 4):
+            return features
+    except (TypeError, ValueError):
+        pass
+    
+    # Slow path, only taken for a bad chunk: find the first bad line
+    for number, line in numbered_lines:
+        try:
+            row = np.array(json.loads(line), dtype=float)
+        except (TypeError, ValueError):
+            row = None
+        if row is None or row.shape != (4,):
+            raise ValueError(f'Line {number}: expected a JSON array of 4 numbers')
+    raise ValueError('Expected a JSON array of 4 numbers per line')
+
+def score_stream(read, current, chunk_rows=None):
+    """
+    Score NDJSON feature rows read incrementally; yields NDJSON prediction lines
+    Rows are scored chunk_rows at a time, so memory stays flat however long
+    the body is. Every chunk uses the `current` bundle, even across a reload.
+    On bad input an {"error"} object naming the line is written in place of
+    that line's chunk and the stream ends.
+    """
+    chunk_rows = chunk_rows or config.STREAM_CHUNK_ROWS
+    iris_classes = ['Setosa', 'Versicolor', 'Virginica']
+    pending, line_number, scored = [], 0, 0
+    
+    def score(numbered_lines):
+        started = time.perf_counter()
+        features = parse_stream_rows(numbered_lines)
+        check_finite(features)
+        inference_started = time.perf_counter()
+        predictions, probabilities = current.engine.score(features)
+        request_metrics.inference(time.perf_counter() - inference_started, len(features))
+        observe(features, predictions, probabilities, started, current)
+        return ''.join(
+            json.dumps({
+                'prediction': prediction,
+                'class': iris_classes[prediction],
+                'confidence': max(row),
+                'probabilities': {iris_classes[i]: row[i] for i in range(3)}
+            }, separators=(',', ':')) + '\n'
+            for prediction, row in zip(predictions.tolist(), probabilities.tolist())
+        ).encode()
+    
+    try:
+        for line in iter_lines(read):
+            line_number += 1
+            line = line.strip()
+            if not line:
+                continue
+            pending.append((line_number, line))
+            if len(pending) >= chunk_rows:
+                yield score(pending)
+                scored += len(pending)
+                pending = []
+        if pending:
+            yield score(pending)
+            scored += len(pending)
+    except ValueError as e:
+        logger.warning(f"Stream prediction stopped after {scored} rows: {str(e)}")
+        yield (json.dumps({'error': str(e)}, separators=(',', ':')) + '\n').encode()
+        return
+    
+    logger.info(f"Stream prediction made: rows={scored}")
+
+def handle_admin_reload(authorization):
+    """
+    Start a background hot-swap for an authenticated caller; returns (payload, status)
+    Shared by the Flask view and the ASGI variant in asgi.py
+    """
+    if not config.ADMIN_TOKEN:
+        return {'error': 'Admin endpoints are disabled'}, 403
+    
+    expected = f'Bearer {config.ADMIN_TOKEN}'
+    if not hmac.compare_digest((authorization or '').encode(), expected.encode()):
+        logger.warning("Rejected admin reload: invalid credentials")
+        return {'error': 'Unauthorized'}, 401
+    
+    if reload_lock.locked():
+        return {'error': 'Reload already in progress'}, 409
+    
+    if reload_coordinator is not None:
+        # Reloading only this worker would leave its siblings on the old model
+        os.kill(reload_coordinator, signal.SIGHUP)
+        scope = 'all_workers'
+    elif request_reload():
+        scope = 'this_process'
+    else:
+        return {'error': 'Reload already in progress'}, 409
+    
+    logger.info(f"Model reload requested via admin endpoint ({scope})")
+    return {'status': 'reloading', 'scope': scope, 'timestamp': datetime.now().isoformat()}, 202
+
+# Every route but /health shares one adaptive limit, capped at the worker's
+# threads minus the /health budget, so no mix of requests can take the threads
+# probes need; serve.py calls size_admission() with its real pool size
+predict_limiter = AdaptiveLimiter(
+    initial=max(config.ADMISSION_MIN_LIMIT, config.THREAD_POOL_SIZE - config.ADMISSION_HEALTH_BUDGET),
+    min_limit=config.ADMISSION_MIN_LIMIT,
+    target_latency=config.ADMISSION_LATENCY_TARGET_MS / 1000.0
+)
+health_limiter = AdaptiveLimiter(
+    initial=config.ADMISSION_HEALTH_BUDGET,
+    min_limit=config.ADMISSION_HEALTH_BUDGET
+)
+# Completion times are scaled to the /api/predict target before adapting the
+# shared limit, so a large batch is judged against its own target; routes not
+# listed (streams, info, metrics) hold a slot without adapting it
+ADMISSION_LATENCY_SCALE = {
+    '/api/predict': 1.0,
+    '/api/predict/batch': config.ADMISSION_LATENCY_TARGET_MS / config.ADMISSION_BATCH_LATENCY_TARGET_MS,
+}
+
+def size_admission(threads):
+    """Cap the shared limit for a pool of `threads` request threads"""
+    predict_limiter.resize(threads - config.ADMISSION_HEALTH_BUDGET)
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    request_metrics.request_started()
+
+@app.before_request
+def start_deadline():
+    """Deadline for this request: the client's header budget, at most TIMEOUT"""
+    # serve.py stamps when the connection was accepted, so time queued for a thread counts
+    started = request.environ.get('serve.accepted_at', time.monotonic())
+    budget = deadlines.budget_from_header(request.headers.get(config.DEADLINE_HEADER), config.TIMEOUT)
+    deadlines.set_deadline(started + budget)
+
+# Created at import, before serve.py forks, so all workers share the buckets
+rate_limiter = SharedRateLimiter(
+    config.RATE_LIMIT_REQUESTS,
+    config.RATE_LIMIT_WINDOW,
+    slots=config.RATE_LIMIT_TABLE_SIZE
+) if config.RATE_LIMIT_ENABLED else None
+
+def client_identity(api_key, remote_addr):
+    return f'key:{api_key}' if api_key else f'ip:{remote_addr}'
+
+def forwarded_address(remote_addr, forwarded_for, hops=None):
+    """Client address as ProxyFix resolves it: the entry the outermost trusted proxy appended"""
+    hops = config.TRUSTED_PROXY_HOPS if hops is None else hops
+    addresses = [address.strip() for address in forwarded_for.split(',')] if forwarded_for else []
+    if hops and len(addresses) >= hops:
+        return addresses[-hops]
+    return remote_addr
+
+def rate_limited_response(retry_after):
+    return {'error': 'Rate limit exceeded'}, 429, {'Retry-After': str(max(1, math.ceil(retry_after)))}
+
+@app.before_request
+def limit_rate():
+    """Per-client token bucket on the API routes; health probes are exempt"""
+    if rate_limiter is None or not request.path.startswith('/api/') or request.method == 'OPTIONS':
+        return None
+    identity = client_identity(request.headers.get(config.RATE_LIMIT_API_KEY_HEADER), request.remote_addr)
+    allowed, retry_after = rate_limiter.hit(identity)
+    if allowed:
+        return None
+    payload, status, headers = rate_limited_response(retry_after)
+    return jsonify(payload), status, headers
+
+@app.before_request
+def admit_request():
+    """Reject immediately when this route's concurrency budget is full"""
+    if not config.ADMISSION_ENABLED or request.method == 'OPTIONS':
+        return None
+    limiter = health_limiter if request.path == '/health' else predict_limiter
+    if not limiter.try_acquire():
+        return jsonify({'error': 'Server overloaded, retry later'}), 503
+    g.admission = (limiter, time.monotonic(), ADMISSION_LATENCY_SCALE.get(request.path))
+    return None
+
+@app.teardown_request
+def release_admission(error):
+    admission = g.pop('admission', None)
+    if admission is not None:
+        limiter, started, scale = admission
+        limiter.release(None if scale is None else (time.monotonic() - started) * scale)
+
+@app.after_request
+def note_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    # Unmatched paths share one label, so scanner traffic cannot grow the table
+    endpoint = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    request_metrics.request_finished(endpoint, g.pop('metrics_status', 500), time.perf_counter() - started)
+
+@app.after_request
+def add_retry_after(response):
+    # Work shed before it ran: ask the client to back off briefly
+    if response.status_code == 503:
+        response.headers.setdefault('Retry-After', '1')
+    return response
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Health check endpoint for monitoring"""
+    return jsonify(health_payload()), 200
+
+@app.route('/api/predict', methods=['POST'])
+def predict():
+    """
+    ML prediction endpoint
+    Expected JSON: {"features": [5.1, 3.5, 1.4, 0.2]}
+    Optional "mode": "class_only" returns only the class, via early-exit evaluation;
+    "compact" returns {"prediction", "probabilities": [...]} without a timestamp
+    Also accepts application/octet-stream (one packed float32/float64 row,
+    dtype= content-type parameter) and application/msgpack bodies
+    """
+    if request.mimetype in ENCODED_MIMETYPES:
+        return encoded_response()
+    try:
+        body, status = handle_predict_json(request.get_json())
+        return Response(body, status, mimetype='application/json')
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Batch ML prediction endpoint
+    Expected JSON: {"features": [[5.1, 3.5, 1.4, 0.2], [6.3, 3.3, 6.0, 2.5]]}
+    Optional "mode": "class_only" returns only classes, via early-exit evaluation;
+    "compact" returns {"prediction", "probabilities": [...]} rows without a timestamp
+    Also accepts application/octet-stream (packed rows) and application/msgpack bodies
+    """
+    if request.mimetype in ENCODED_MIMETYPES:
+        return encoded_response()
+    try:
+        payload, status = handle_predict_batch(request.get_json())
+        return jsonify(payload), status
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    Streaming ML prediction endpoint
+    Body: NDJSON, one feature row per line, e.g. [5.1, 3.5, 1.4, 0.2]; may be chunked
+    Response: NDJSON predictions, written as each chunk of rows is scored
+    """
+    # Pin the model version for the whole stream
+    current = bundle
+    if current is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+    stream = request.stream
+    return Response(stream_with_context(score_stream(stream.read, current)), mimetype='application/x-ndjson')
+
 @app.route('/api/model/info', methods=['GET'])
 def model_info():
     """Get model information"""
-    return jsonify({
-        'model_type': 'RandomForestClassifier',
-        'n_estimators': 10,
-        'classes': ['Setosa', 'Versicolor', 'Virginica'],
-        'metadata': model_metadata
-    }), 200
+    return jsonify(model_info_payload()), 200
 
 @app.route('/api/metrics', methods=['GET'])
 def metrics():
     """Get application metrics"""
-    return jsonify({
-        'timestamp': datetime.now().isoformat(),
-        'model_status': 'loaded' if model is not None else 'not_loaded',
-        'version': '1.0.0'
-    }), 200
+    return jsonify(metrics_payload()), 200
+
+@app.route('/api/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Hot-swap the model from disk without restarting
+    Requires "Authorization: Bearer <ADMIN_TOKEN>"
+    """
+    payload, status = handle_admin_reload(request.headers.get('Authorization'))
+    return jsonify(payload), status
 
 @app.errorhandler(404)
 def not_found(error):
-    logger.warning(f"404 error: {request.path}")
+    not_found_log.warning("404 error: %s", request.path)
     return jsonify({'error': 'Endpoint not found'}), 404
 
 @app.errorhandler(500)
@@ -165,4 +1029,8 @@ def server_error(error):
 if __name__ == '__main__':
     logger.info("Starting ML DevOps application")
     load_or_train_model()
+    if config.MODEL_WATCH_ENABLED:
+        start_model_watcher()
+    if config.UNIX_SOCKET_ENABLED:
+        start_unix_server()
     app.run(host='0.0.0.0', port=5000, debug=False)
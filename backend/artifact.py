@@ -0,0 +1,197 @@
+"""
+Memory-mapped serving artifact for the compiled forest
+Node arrays are stored uncompressed at aligned offsets, so every process
+that loads the file maps the same page-cache pages instead of holding its
+own unpickled copy
+"""
+
+import contextlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from inference import CompiledForest
+
+MAGIC = b'IRISFRST'
+VERSION = 1
+ALIGNMENT = 64
+# magic, format version, JSON header length
+PREAMBLE = struct.Struct('<8sII')
+
+ARRAYS = ('feature', 'threshold', 'children_left', 'children_right', 'value', 'roots', 'classes_')
+
+
+class ArtifactError(ValueError):
+    """Raised when an artifact file is malformed or inconsistent"""
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='wb'):
+    """
+    Write to a temporary file beside path, then rename it over path
+    Processes that have the old file mapped or open keep its pages; truncating
+    it in place would SIGBUS every worker serving from a mapping of it.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        # mkstemp creates 0600; model files are read by other users' tooling too
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def save_forest(forest, path):
+    """Write a CompiledForest as a memory-mappable artifact"""
+    arrays = {name: np.ascontiguousarray(getattr(forest, name)) for name in ARRAYS}
+
+    # Offsets depend on the header length, so size the header with placeholder offsets first
+    entries = {name: {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': 0} for name, a in arrays.items()}
+    header = {'max_depth': int(forest.max_depth), 'input_dtype': np.dtype(forest.input_dtype).str,
+              'arrays': entries}
+    header_size = len(json.dumps(header).encode()) + 32 * len(entries)
+
+    offset = _align(PREAMBLE.size + header_size)
+    for name, array in arrays.items():
+        entries[name]['offset'] = offset
+        offset = _align(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode().ljust(header_size)
+    with atomic_write(path) as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(entries[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(offset)
+    return path
+
+
+def load_forest(path):
+    """Map an artifact read-only and return a CompiledForest viewing its pages"""
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapped) < PREAMBLE.size:
+        raise ArtifactError(f'{path}: file too small')
+    magic, version, header_size = PREAMBLE.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        raise ArtifactError(f'{path}: not a forest artifact')
+    if version != VERSION:
+        raise ArtifactError(f'{path}: unsupported artifact version {version}')
+
+    try:
+        header = json.loads(bytes(mapped[PREAMBLE.size:PREAMBLE.size + header_size]))
+    except ValueError as e:
+        raise ArtifactError(f'{path}: corrupt header') from e
+
+    arrays = {}
+    for name in ARRAYS:
+        entry = header['arrays'].get(name)
+        if entry is None:
+            raise ArtifactError(f'{path}: missing array {name}')
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape']))
+        if entry['offset'] % ALIGNMENT or entry['offset'] + count * dtype.itemsize > len(mapped):
+            raise ArtifactError(f'{path}: array {name} out of bounds')
+        arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count,
+                                     offset=entry['offset']).reshape(entry['shape'])
+
+    forest = CompiledForest(
+        feature=arrays['feature'],
+        threshold=arrays['threshold'],
+        children_left=arrays['children_left'],
+        children_right=arrays['children_right'],
+        value=arrays['value'],
+        roots=arrays['roots'],
+        max_depth=header['max_depth'],
+        classes=arrays['classes_'],
+        input_dtype=np.dtype(header['input_dtype']),
+    )
+    _validate(forest, path)
+    return forest
+
+
+def _validate(forest, path):
+    """Cheap structural checks so a bad file fails at load, not mid-request"""
+    n_nodes = forest.n_nodes
+    if not (len(forest.threshold) == len(forest.children_left) == len(forest.children_right)
+            == len(forest.value) == n_nodes):
+        raise ArtifactError(f'{path}: node arrays disagree in length')
+    for name in ('children_left', 'children_right', 'roots'):
+        array = getattr(forest, name)
+        if len(array) and (array.min() < 0 or array.max() >= n_nodes):
+            raise ArtifactError(f'{path}: {name} points outside the node arrays')
+    if forest.value.ndim != 2 or forest.value.shape[1] != len(forest.classes_):
+        raise ArtifactError(f'{path}: leaf values do not match the class count')
+
+
+def memory_report(path=None):
+    """Unique vs shared resident memory of this process, in KiB
+
+    Reads /proc/self/smaps_rollup (Linux). With ``path``, also reports the
+    resident pages of mappings of that file.
+    """
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            rollup = _parse_smaps(f.read().splitlines())
+    except OSError:
+        return None
+
+    report = {
+        'rss_kb': rollup.get('Rss', 0),
+        'pss_kb': rollup.get('Pss', 0),
+        'unique_kb': rollup.get('Private_Clean', 0) + rollup.get('Private_Dirty', 0),
+        'shared_kb': rollup.get('Shared_Clean', 0) + rollup.get('Shared_Dirty', 0),
+    }
+
+    if path is not None:
+        report['artifact'] = _mapping_report(path)
+    return report
+
+
+def _parse_smaps(lines):
+    values = {}
+    for line in lines:
+        key, _, rest = line.partition(':')
+        parts = rest.split()
+        if len(parts) == 2 and parts[1] == 'kB':
+            values[key] = values.get(key, 0) + int(parts[0])
+    return values
+
+
+def _mapping_report(path):
+    target = os.path.realpath(path)
+    totals, in_target = {}, False
+    try:
+        with open('/proc/self/smaps') as f:
+            for line in f:
+                fields = line.split()
+                if '-' in fields[0] and ':' not in fields[0]:
+                    in_target = len(fields) >= 6 and fields[-1] == target
+                elif in_target:
+                    for key, value in _parse_smaps([line]).items():
+                        totals[key] = totals.get(key, 0) + value
+    except OSError:
+        return None
+    return {
+        'rss_kb': totals.get('Rss', 0),
+        'shared_kb': totals.get('Shared_Clean', 0) + totals.get('Shared_Dirty', 0),
+        'unique_kb': totals.get('Private_Clean', 0) + totals.get('Private_Dirty', 0),
+    }
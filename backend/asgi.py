@@ -0,0 +1,301 @@
+"""
+Asyncio (ASGI) variant of the ML DevOps app
+Health, model info and metrics are answered directly on the event loop;
+prediction work runs on a bounded executor sized by config.THREAD_POOL_SIZE,
+so idle keep-alive and slow clients no longer pin a worker thread each.
+
+Serve it with any ASGI server, e.g.:
+
+    pip install uvicorn
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from werkzeug.http import parse_options_header
+
+import config
+import app as flask_app
+import deadlines
+from admission import AdaptiveLimiter
+from encoding import encode_json
+
+logger = logging.getLogger('asgi')
+
+CORS_HEADERS = [(b'access-control-allow-origin', b'*')]
+
+PREDICT_ROUTES = {
+    '/api/predict': flask_app.handle_predict_json,
+    '/api/predict/batch': flask_app.handle_predict_batch,
+}
+
+# Admission limit name and latency target per prediction route
+ADMISSION_ROUTES = {
+    '/api/predict': ('predict', config.ADMISSION_LATENCY_TARGET_MS),
+    '/api/predict/batch': ('batch', config.ADMISSION_BATCH_LATENCY_TARGET_MS),
+}
+
+ADMIN_ROUTES = {
+    '/api/admin/reload': flask_app.handle_admin_reload,
+}
+
+INFO_ROUTES = {
+    '/health': flask_app.health_payload,
+    '/api/model/info': flask_app.model_info_payload,
+    '/api/metrics': flask_app.metrics_payload,
+}
+
+
+def parse_and_handle_in_child(route, body, content_type, deadline=None):
+    """
+    parse_and_handle for a process executor; also returns the metrics it recorded
+    The child never publishes its own counts, so they travel back with the
+    answer and the parent records them.
+    """
+    try:
+        return parse_and_handle(route, body, content_type, deadline) + (flask_app.request_metrics.take(),)
+    except Exception:
+        flask_app.request_metrics.take()
+        raise
+
+
+def parse_and_handle(route, body, content_type, deadline=None):
+    """Runs on the executor: decode the body and score it; returns (body, status, content type)"""
+    deadlines.set_deadline(deadline)
+    mimetype, params = parse_options_header(content_type)
+    if mimetype in flask_app.ENCODED_MIMETYPES:
+        return flask_app.handle_encoded_predict(body, mimetype, params, batch=route == '/api/predict/batch')
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        return encode_json({'error': 'Invalid JSON body'}), 400, 'application/json'
+    result, status = PREDICT_ROUTES[route](data)
+    # /api/predict answers with pre-encoded bytes
+    body = result if isinstance(result, bytes) else encode_json(result)
+    return body, status, 'application/json'
+
+
+class InferenceApp:
+    """Minimal ASGI application mirroring the Flask routes"""
+
+    def __init__(self, workers=config.THREAD_POOL_SIZE, max_pending=config.ASGI_MAX_PENDING,
+                 executor_kind=config.ASGI_EXECUTOR, max_body_bytes=config.ASGI_MAX_BODY_BYTES):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor_kind = executor_kind
+        self.max_body_bytes = max_body_bytes
+        self.executor = None
+        self.pending = 0
+        # Admitted requests may wait for the executor, so each route's limit runs
+        # from the executor's capacity (never shed while a worker is idle) up to
+        # max_pending; the Flask limits are sized for one request per thread
+        self.limiters = {
+            route: AdaptiveLimiter(
+                initial=max_pending,
+                min_limit=min(max(config.ADMISSION_MIN_LIMIT, workers), max_pending),
+                max_limit=max_pending,
+                target_latency=target_ms / 1000.0
+            )
+            for route, (_, target_ms) in ADMISSION_ROUTES.items()
+        }
+        self.info_routes = dict(INFO_ROUTES, **{'/api/metrics': self.metrics_payload})
+
+    def startup(self):
+        flask_app.load_or_train_model()
+        if config.MODEL_WATCH_ENABLED:
+            flask_app.start_model_watcher()
+        if self.executor_kind == 'process':
+            # Forked after loading, so every process starts with the model in memory
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'))
+            # The children hold the model they were forked with; re-fork them after a swap
+            flask_app.reload_hooks.append(self.replace_process_pool)
+        else:
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='inference')
+        logger.info(f"ASGI app ready: {self.workers} {self.executor_kind} executor workers")
+
+    def replace_process_pool(self):
+        """New process pool forked from the freshly installed model; the old one finishes its work"""
+        old, self.executor = self.executor, ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context('fork'))
+        old.shutdown(wait=False)
+        logger.info("Process executor re-forked with the reloaded model")
+
+    def metrics_payload(self):
+        data = flask_app.metrics_payload()
+        if config.ADMISSION_ENABLED:
+            data['admission'] = {
+                ADMISSION_ROUTES[route][0]: limiter.stats() for route, limiter in self.limiters.items()
+            }
+        return data
+
+    def shutdown(self):
+        if self.replace_process_pool in flask_app.reload_hooks:
+            flask_app.reload_hooks.remove(self.replace_process_pool)
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http_with_metrics(scope, receive, send)
+
+    async def http_with_metrics(self, scope, receive, send):
+        """Count the request under its route and status, like the Flask hooks"""
+        path = scope['path']
+        endpoint = path if path in PREDICT_ROUTES or path in ADMIN_ROUTES or path in INFO_ROUTES else '<unmatched>'
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_and_note_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        flask_app.request_metrics.request_started()
+        try:
+            await self.http(scope, receive, send_and_note_status)
+        finally:
+            flask_app.request_metrics.request_finished(endpoint, status[0], time.perf_counter() - started)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def respond(self, send, payload, status, headers=()):
+        await self.respond_bytes(send, encode_json(payload), status, 'application/json', headers)
+
+    async def respond_bytes(self, send, body, status, content_type, headers=()):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': CORS_HEADERS + [(b'content-type', content_type.encode()),
+                                               (b'content-length', str(len(body)).encode())] + list(headers)})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def read_body(self, receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise ValueError('Request body too large')
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    async def http(self, scope, receive, send):
+        path, method = scope['path'], scope['method']
+        started = time.monotonic()
+
+        if method == 'OPTIONS':
+            await send({'type': 'http.response.start', 'status': 204, 'headers': [
+                (b'access-control-allow-origin', b'*'),
+                (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                (b'access-control-allow-headers', b'Content-Type'),
+            ]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        if path in self.info_routes and method in ('GET', 'HEAD'):
+            await self.respond(send, self.info_routes[path](), 200)
+            return
+
+        if path in ADMIN_ROUTES:
+            if method != 'POST':
+                await self.respond(send, {'error': 'Method not allowed'}, 405)
+                return
+            authorization = dict(scope['headers']).get(b'authorization', b'').decode('latin-1')
+            payload, status = ADMIN_ROUTES[path](authorization)
+            await self.respond(send, payload, status)
+            return
+
+        if path not in PREDICT_ROUTES:
+            flask_app.not_found_log.warning("404 error: %s", path)
+            await self.respond(send, {'error': 'Endpoint not found'}, 404)
+            return
+
+        if method != 'POST':
+            await self.respond(send, {'error': 'Method not allowed'}, 405)
+            return
+
+        try:
+            body = await self.read_body(receive)
+        except ValueError as e:
+            await self.respond(send, {'error': str(e)}, 413)
+            return
+        if body is None:
+            return
+
+        # Bound queued work; beyond it, shed load instead of growing the queue
+        if self.pending >= self.max_pending:
+            await self.respond(send, {'error': 'Server busy'}, 503, [(b'retry-after', b'1')])
+            return
+
+        headers = dict(scope['headers'])
+
+        # Same per-client buckets as the Flask routes; the admission limits are per app (see __init__)
+        if flask_app.rate_limiter is not None:
+            api_key = headers.get(config.RATE_LIMIT_API_KEY_HEADER.lower().encode(), b'').decode('latin-1')
+            client = flask_app.forwarded_address(
+                (scope.get('client') or ('unknown',))[0],
+                headers.get(b'x-forwarded-for', b'').decode('latin-1')
+            )
+            allowed, retry_after = flask_app.rate_limiter.hit(flask_app.client_identity(api_key, client))
+            if not allowed:
+                payload, status, extra = flask_app.rate_limited_response(retry_after)
+                await self.respond(send, payload, status, [(b'retry-after', extra['Retry-After'].encode())])
+                return
+
+        limiter = self.limiters[path] if config.ADMISSION_ENABLED else None
+        if limiter is not None and not limiter.try_acquire():
+            await self.respond(send, {'error': 'Server overloaded, retry later'}, 503, [(b'retry-after', b'1')])
+            return
+        admitted = time.monotonic()
+
+        content_type = headers.get(b'content-type', b'application/json').decode('latin-1')
+        header = headers.get(config.DEADLINE_HEADER.lower().encode(), b'').decode('latin-1')
+        deadline = started + deadlines.budget_from_header(header, config.TIMEOUT)
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # The executor drops the request unscored if it is already late when a
+            # thread picks it up; the client gets its answer at the deadline either way
+            if self.executor_kind == 'process':
+                future = loop.run_in_executor(self.executor, parse_and_handle_in_child, path, body, content_type, deadline)
+                body, status, content_type, recorded = await asyncio.wait_for(future, max(0.0, deadline - time.monotonic()))
+                flask_app.request_metrics.add(recorded)
+            else:
+                future = loop.run_in_executor(self.executor, parse_and_handle, path, body, content_type, deadline)
+                body, status, content_type = await asyncio.wait_for(future, max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            error = deadlines.expired_in_flight('executor')
+            logger.warning(f"Prediction dropped: {str(error)}")
+            body, status, content_type = encode_json({'error': str(error)}), error.status, 'application/json'
+        except Exception as e:
+            logger.error(f"Prediction error: {str(e)}")
+            body, status, content_type = encode_json({'error': str(e)}), 500, 'application/json'
+        finally:
+            self.pending -= 1
+            if limiter is not None:
+                limiter.release(time.monotonic() - admitted)
+
+        await self.respond_bytes(send, body, status, content_type,
+                                 [(b'retry-after', b'1')] if status == 503 else ())
+
+
+app = InferenceApp()
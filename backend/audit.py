@@ -0,0 +1,333 @@
+"""
+Prediction audit log
+Every scored row is kept as a fixed-size binary record (time, features,
+prediction, probabilities, latency) in segment files under AUDIT_DIR. Each
+worker process writes its own segments. A segment is closed once it reaches
+its size or age limit or the model version changes; closed segments are
+gzipped on a background thread. Segments left open by a process that died
+are gzipped by the next one to start. Request threads only enqueue; when the
+queue is full the entry is dropped and counted rather than waiting.
+
+Segment layout: MAGIC, <uint32 header length>, JSON header (model version,
+record dtype, creation time), then packed records.
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import struct
+import threading
+import time
+
+import numpy as np
+
+from artifact import atomic_write
+
+logger = logging.getLogger('audit')
+
+MAGIC = b'IRISAUDT'
+HEADER_LENGTH = struct.Struct('<I')
+RECORD_DTYPE = np.dtype([
+    ('time', '<f8'),
+    ('features', '<f8', (4,)),
+    ('prediction', 'u1'),
+    ('probabilities', '<f4', (3,)),
+    ('latency_us', '<u4'),
+])
+SEGMENT_SUFFIX = '.seg'
+COMPRESSED_SUFFIX = '.seg.gz'
+
+_instances = []
+
+
+class AuditLog:
+    """Per-process segment writer fed through a bounded queue"""
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, max_age=3600.0, compress=True, queue_size=10000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self.queue_size = queue_size
+        self._pid = None
+        self._start_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        _instances.append(self)
+
+    def _start(self):
+        # Threads and the open segment belong to the process that started them;
+        # a forked worker starts its own on first use
+        self._queue = queue.Queue(self.queue_size)
+        self._compress_queue = queue.Queue()
+        self._segment = None
+        self._sequence = 0
+        self._stats = {'records': 0, 'dropped': 0, 'segments': 0, 'compressed': 0}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        threading.Thread(target=self._write_loop, name='audit-writer', daemon=True).start()
+        if self.compress:
+            for path in orphaned_segments(self.directory):
+                self._compress_queue.put(path)
+            threading.Thread(target=self._compress_loop, name='audit-compress', daemon=True).start()
+
+    def record(self, features, predictions, probabilities, latency, model_version):
+        """Queue one request's rows; probabilities may be None (class-only answers). Never blocks"""
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._start()
+        try:
+            self._queue.put_nowait((time.time(), features, predictions, probabilities, latency, model_version))
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+
+    def flush(self, timeout=5.0):
+        """Wait until queued entries are on disk (for tests and shutdown)"""
+        if self._pid != os.getpid():
+            return
+        done = threading.Event()
+        self._queue.put((None, done))
+        done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Write what is queued, close the current segment and wait for it to be compressed"""
+        if self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        done = threading.Event()
+        self._queue.put((None, done, 'close'))
+        done.wait(timeout)
+        if self.compress:
+            compressed = threading.Event()
+            self._compress_queue.put(compressed)
+            compressed.wait(max(0.0, deadline - time.monotonic()))
+
+    def _write_loop(self):
+        while True:
+            entries = [self._queue.get()]
+            # Drain whatever else is waiting so it goes out in one write
+            while len(entries) < 1024:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(entries)
+            except Exception as e:
+                logger.error(f"Audit write failed: {str(e)}")
+
+    def _write(self, entries):
+        run = []
+        for entry in entries:
+            if entry[0] is not None and (not run or run[-1][5] == entry[5]):
+                run.append(entry)
+                continue
+            self._write_run(run)
+            run = []
+            if entry[0] is not None:
+                run.append(entry)
+                continue
+
+            # Control marker from flush() or close()
+            if self._segment is not None:
+                self._segment['file'].flush()
+                if len(entry) == 3:
+                    self._close_segment()
+            entry[1].set()
+
+        self._write_run(run)
+        if self._segment is not None:
+            self._segment['file'].flush()
+
+    def _write_run(self, run):
+        """Pack consecutive entries for one model version into a single write"""
+        if not run:
+            return
+        predictions = [np.atleast_1d(entry[2]) for entry in run]
+        counts = [len(p) for p in predictions]
+        n_features = RECORD_DTYPE['features'].shape[0]
+        n_classes = RECORD_DTYPE['probabilities'].shape[0]
+
+        records = np.empty(sum(counts), dtype=RECORD_DTYPE)
+        records['time'] = np.repeat([entry[0] for entry in run], counts)
+        records['features'] = np.concatenate([
+            np.asarray(entry[1], dtype=np.float64).reshape(-1, n_features) for entry in run
+        ])
+        records['prediction'] = np.concatenate(predictions)
+        records['probabilities'] = np.concatenate([
+            np.full((count, n_classes), np.nan, dtype=np.float32) if entry[3] is None
+            else np.asarray(entry[3], dtype=np.float32).reshape(-1, n_classes)
+            for entry, count in zip(run, counts)
+        ])
+        latencies_us = np.minimum(np.array([entry[4] for entry in run]) * 1e6, 2 ** 32 - 1)
+        records['latency_us'] = np.repeat(latencies_us.astype(np.uint32), counts)
+
+        # Split across segments so none grows past max_bytes
+        offset = 0
+        while offset < len(records):
+            segment = self._segment_for(run[0][5])
+            room = max(1, (self.max_bytes - segment['bytes']) // RECORD_DTYPE.itemsize)
+            chunk = records[offset:offset + room]
+            segment['file'].write(chunk.tobytes())
+            segment['bytes'] += chunk.nbytes
+            offset += len(chunk)
+        with self._lock:
+            self._stats['records'] += len(records)
+
+    def _segment_for(self, model_version):
+        segment = self._segment
+        if segment is not None and (
+            segment['model_version'] != model_version
+            or segment['bytes'] >= self.max_bytes
+            or time.monotonic() - segment['opened'] >= self.max_age
+        ):
+            self._close_segment()
+            segment = None
+        if segment is None:
+            segment = self._segment = self._open_segment(model_version)
+        return segment
+
+    def _open_segment(self, model_version):
+        self._sequence += 1
+        name = f"audit-{time.strftime('%Y%m%dT%H%M%S')}-{self._pid}-{self._sequence:06d}{SEGMENT_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        header = json.dumps({
+            'model_version': model_version,
+            'created': time.time(),
+            'pid': self._pid,
+            'dtype': RECORD_DTYPE.descr,
+        }).encode()
+        f = open(path, 'wb')
+        f.write(MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+        with self._lock:
+            self._stats['segments'] += 1
+        return {'path': path, 'file': f, 'bytes': 0, 'opened': time.monotonic(), 'model_version': model_version}
+
+    def _close_segment(self):
+        segment, self._segment = self._segment, None
+        segment['file'].close()
+        if self.compress:
+            self._compress_queue.put(segment['path'])
+
+    def _compress_loop(self):
+        while True:
+            path = self._compress_queue.get()
+            if isinstance(path, threading.Event):
+                # Marker from close()
+                path.set()
+                continue
+            try:
+                # Written aside and renamed, so a crash never leaves a torn .gz and
+                # two processes sweeping the same orphan both produce a whole one
+                with open(path, 'rb') as source, \
+                        atomic_write(path[:-len(SEGMENT_SUFFIX)] + COMPRESSED_SUFFIX) as f, \
+                        gzip.GzipFile(fileobj=f, mode='wb') as target:
+                    shutil.copyfileobj(source, target)
+                os.unlink(path)
+                with self._lock:
+                    self._stats['compressed'] += 1
+            except FileNotFoundError:
+                # Another process swept the same orphaned segment first
+                pass
+            except OSError as e:
+                logger.error(f"Audit compression failed for {path}: {str(e)}")
+
+    def stats(self):
+        if self._pid != os.getpid():
+            return {'records': 0, 'dropped': 0, 'segments': 0, 'compressed': 0, 'pending': 0}
+        with self._lock:
+            return dict(self._stats, pending=self._queue.qsize())
+
+
+def shutdown():
+    """Close every audit log's current segment; for exits that skip atexit (os._exit)"""
+    for audit_log in _instances:
+        audit_log.close()
+
+
+atexit.register(shutdown)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def orphaned_segments(directory):
+    """Uncompressed segments whose writing process has exited (killed, or stopped before compressing)"""
+    orphans = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(SEGMENT_SUFFIX):
+            continue
+        # audit-<time>-<pid>-<sequence>.seg
+        try:
+            pid = int(name.split('-')[2])
+        except (IndexError, ValueError):
+            continue
+        if pid != os.getpid() and not _process_alive(pid):
+            orphans.append(os.path.join(directory, name))
+    return orphans
+
+
+def read_segment(path):
+    """(header, records) for one segment, plain or gzipped; a torn final record is ignored"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not an audit segment')
+    (length,) = HEADER_LENGTH.unpack_from(data, len(MAGIC))
+    start = len(MAGIC) + HEADER_LENGTH.size
+    header = json.loads(data[start:start + length])
+    body = memoryview(data)[start + length:]
+    n_records = len(body) // RECORD_DTYPE.itemsize
+    return header, np.frombuffer(body, dtype=RECORD_DTYPE, count=n_records)
+
+
+def iter_segments(directory):
+    """Yield (path, header, records) for every segment, oldest first"""
+    names = sorted(
+        name for name in os.listdir(directory)
+        if name.endswith(SEGMENT_SUFFIX) or name.endswith(COMPRESSED_SUFFIX)
+    )
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            header, records = read_segment(path)
+        except FileNotFoundError:
+            # Compressed and removed between listing and reading; the .gz follows
+            continue
+        yield path, header, records
+
+
+def iter_records(directory, since=None, until=None):
+    """Yield one dict per audited row, optionally within [since, until) epoch seconds"""
+    seen = set()
+    for path, header, records in iter_segments(directory):
+        stem = path.rsplit('.seg', 1)[0]
+        if stem in seen:
+            continue
+        seen.add(stem)
+        if since is not None:
+            records = records[records['time'] >= since]
+        if until is not None:
+            records = records[records['time'] < until]
+        for row in records:
+            yield {
+                'time': float(row['time']),
+                'model_version': header['model_version'],
+                'features': row['features'].tolist(),
+                'prediction': int(row['prediction']),
+                'probabilities': row['probabilities'].tolist(),
+                'latency_us': int(row['latency_us']),
+            }
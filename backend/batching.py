@@ -0,0 +1,176 @@
+"""
+Dynamic micro-batching for single-row predictions
+Requests arriving within a short window are stacked into one matrix and
+scored with a single vectorized call, then results are handed back to the
+waiting request threads
+"""
+
+import os
+import threading
+import time
+import queue
+from collections import deque
+
+import numpy as np
+
+from deadlines import DeadlineExceeded, expired_in_flight, expired_in_queue
+
+
+class _PendingPrediction:
+    """One queued row and the slot its result is delivered into"""
+
+    __slots__ = ('features', 'deadline', 'enqueued_at', 'started', 'done', 'result', 'error')
+
+    def __init__(self, features, deadline=None):
+        self.features = features
+        self.deadline = deadline
+        self.enqueued_at = time.perf_counter()
+        self.started = False
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one vectorized call
+
+    ``predict_fn`` takes an (N, n_features) matrix and returns
+    ``(predictions, probabilities)``. The first queued row opens a window of
+    ``max_wait_us`` microseconds; the batch closes when the window expires or
+    ``max_batch_size`` rows have been collected.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_us=500, delay_samples=2048):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1e6
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        self._batches = 0
+        self._rows = 0
+        self._batch_sizes = {}
+        self._delays = deque(maxlen=delay_samples)
+
+    def submit(self, features, deadline=None):
+        """Queue one feature row and block until its (prediction, probabilities) is ready
+
+        ``deadline`` is a time.monotonic() value; a row still queued when it
+        passes is dropped unscored, and the caller stops waiting at it.
+        """
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                raise expired_in_queue('micro-batch')
+
+        self._ensure_worker()
+        pending = _PendingPrediction(features, deadline)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise expired_in_flight('micro-batch') if pending.started else expired_in_queue('micro-batch')
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so each process starts its own worker
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def _collect(self):
+        """Block for the first row, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        window_end = batch[0].enqueued_at + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = window_end - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _drop_expired(self, batch):
+        """Skip rows whose deadline passed while queued; returns the rest
+
+        Their callers have stopped waiting and already counted the expiry.
+        """
+        now = time.monotonic()
+        live = []
+        for pending in batch:
+            if pending.deadline is not None and pending.deadline <= now:
+                pending.error = DeadlineExceeded('Deadline passed while queued (micro-batch)', status=503)
+                pending.done.set()
+            else:
+                pending.started = True
+                live.append(pending)
+        return live
+
+    def _run(self):
+        while True:
+            batch = self._drop_expired(self._collect())
+            if not batch:
+                continue
+            started = time.perf_counter()
+
+            try:
+                predictions, probabilities = self.predict_fn(
+                    np.array([pending.features for pending in batch], dtype=np.float64)
+                )
+                for i, pending in enumerate(batch):
+                    pending.result = (predictions[i], probabilities[i])
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+
+            for pending in batch:
+                pending.done.set()
+
+            self._record(batch, started)
+
+    def _record(self, batch, started):
+        size = len(batch)
+        with self._lock:
+            self._batches += 1
+            self._rows += size
+            # Power-of-two buckets: 1, 2, 4, 8, ...
+            bucket = 1 << (size - 1).bit_length()
+            self._batch_sizes[bucket] = self._batch_sizes.get(bucket, 0) + 1
+            self._delays.extend(started - pending.enqueued_at for pending in batch)
+
+    def stats(self):
+        """Batch-size distribution and queueing delay summary"""
+        with self._lock:
+            delays = np.array(self._delays) * 1e6
+            stats = {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_us': self.max_wait * 1e6,
+                'batches': self._batches,
+                'rows': self._rows,
+                'mean_batch_size': self._rows / self._batches if self._batches else 0.0,
+                'batch_size_histogram': {
+                    f'<={bucket}': count for bucket, count in sorted(self._batch_sizes.items())
+                },
+            }
+
+        if len(delays):
+            stats['queue_delay_us'] = {
+                'mean': float(delays.mean()),
+                'p50': float(np.percentile(delays, 50)),
+                'p99': float(np.percentile(delays, 99)),
+                'max': float(delays.max()),
+            }
+        return stats
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+High-concurrency load generator for /api/predict
+Opens N concurrent connections that each POST predictions in a loop for a
+fixed duration, reusing the connection when the server keeps it alive.
+Point it at the Flask launcher (serve.py) and the ASGI variant (asgi.py) to
+compare them:
+
+    python serve.py --port 5000 &
+    uvicorn asgi:app --port 5001 --workers 4 &
+    python benchmarks/bench_concurrency.py --port 5000 --connections 1000
+    python benchmarks/bench_concurrency.py --port 5001 --connections 1000
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import time
+
+import numpy as np
+
+BODY = json.dumps({'features': [5.1, 3.5, 1.4, 0.2]}).encode()
+
+
+def build_request(host, port):
+    return (
+        f'POST /api/predict HTTP/1.1\r\nHost: {host}:{port}\r\n'
+        f'Content-Type: application/json\r\nContent-Length: {len(BODY)}\r\n'
+        f'Connection: keep-alive\r\n\r\n'
+    ).encode() + BODY
+
+
+async def read_response(reader):
+    """Returns (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    version, status = status_line.split()[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+
+    keep_alive = version == b'HTTP/1.1' and headers.get('connection') != 'close'
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        keep_alive = False
+    return int(status), keep_alive
+
+
+async def client(host, port, deadline, latencies, errors):
+    request = build_request(host, port)
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+        except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            keep_alive = False
+            await asyncio.sleep(0.01)
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(host, port, connections, duration):
+    latencies, errors = [], {}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client(host, port, deadline, latencies, errors) for _ in range(connections)))
+    return np.array(latencies) * 1000, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    # Each connection needs a file descriptor
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    latencies, errors = asyncio.run(run(args.host, args.port, args.connections, args.duration))
+    print(f"connections={args.connections} duration={args.duration}s requests={len(latencies)} "
+          f"throughput={len(latencies) / args.duration:.0f} req/s")
+    if len(latencies):
+        print(f"latency ms: p50={np.percentile(latencies, 50):.1f} p99={np.percentile(latencies, 99):.1f} "
+              f"max={latencies.max():.1f}")
+    print(f"errors: {errors or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
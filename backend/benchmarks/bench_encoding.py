@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Encoding benchmark: JSON vs packed binary vs msgpack prediction bodies
+Times decoding a request body into the (N, 4) feature matrix and encoding
+N rows of probabilities back, per row, at several batch sizes. Inference
+itself is excluded. msgpack is skipped when it is not installed. Run from
+the backend directory:
+
+    python benchmarks/bench_encoding.py [--sizes 1 100 10000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoding import decode_rows, encode_json, encode_rows, msgpack
+
+CLASSES = ['Setosa', 'Versicolor', 'Virginica']
+F32 = np.dtype('<f4')
+
+
+def json_results(probabilities):
+    # Same document shape as /api/predict/batch
+    return {
+        'predictions': [
+            {'prediction': int(np.argmax(row)), 'class': CLASSES[int(np.argmax(row))], 'confidence': max(row),
+             'probabilities': {CLASSES[i]: row[i] for i in range(3)}}
+            for row in probabilities.tolist()
+        ],
+        'count': len(probabilities)
+    }
+
+
+def codecs(features, probabilities):
+    """name -> (request body, parse fn, serialize fn)"""
+    document = {'features': features.tolist()}
+    table = {
+        'json': (
+            json.dumps(document).encode(),
+            lambda body: np.array(json.loads(body)['features'], dtype=float),
+            lambda: encode_json(json_results(probabilities)),
+        ),
+        'binary': (
+            encode_rows(features, F32),
+            lambda body: decode_rows(body, F32),
+            lambda: encode_rows(probabilities, F32),
+        ),
+    }
+    if msgpack is not None:
+        table['msgpack'] = (
+            msgpack.packb(document),
+            lambda body: np.array(msgpack.unpackb(body)['features'], dtype=float),
+            lambda: msgpack.packb(json_results(probabilities)),
+        )
+    return table
+
+
+def per_row_us(fn, n_rows):
+    number = max(1, 20000 // n_rows)
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return best / number / n_rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>6} {'codec':>8} {'request B/row':>14} {'parse us/row':>13} {'serialize us/row':>17}")
+    for n_rows in args.sizes:
+        features = rng.uniform(0.1, 8.0, size=(n_rows, 4)).round(1)
+        probabilities = rng.dirichlet(np.ones(3), size=n_rows)
+        for name, (body, parse, serialize) in codecs(features, probabilities).items():
+            print(f"{n_rows:>6} {name:>8} {len(body) / n_rows:>14.1f} "
+                  f"{per_row_us(lambda: parse(body), n_rows):>13.3f} {per_row_us(serialize, n_rows):>17.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Response serialization microbenchmark for /api/predict
+Compares building the payload dict and passing it to jsonify with the
+precompiled templates (byte-identical output) and the compact mode, for one
+prediction. Inference is excluded. Run from the backend directory:
+
+    python benchmarks/bench_response.py
+"""
+
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+
+import config
+from encoding import PredictionEncoder
+
+PREDICTION = 2
+PROBABILITY = [0.0, 0.1, 0.9]
+
+
+def jsonify_payload():
+    iris_classes = ['Setosa', 'Versicolor', 'Virginica']
+    return jsonify({
+        'prediction': int(PREDICTION),
+        'class': iris_classes[PREDICTION],
+        'confidence': float(max(PROBABILITY)),
+        'probabilities': {
+            iris_classes[i]: float(PROBABILITY[i]) for i in range(3)
+        },
+        'timestamp': datetime.now().isoformat()
+    }).get_data()
+
+
+def main():
+    app = Flask(__name__)
+    encoder = PredictionEncoder(config.CLASS_NAMES)
+    cases = {
+        'dict + jsonify': jsonify_payload,
+        'template (identical bytes)': lambda: encoder.full(PREDICTION, PROBABILITY, max(PROBABILITY),
+                                                           datetime.now().isoformat()),
+        'template, compact': lambda: encoder.compact(PREDICTION, PROBABILITY),
+    }
+    with app.app_context():
+        baseline = None
+        for name, fn in cases.items():
+            best = min(timeit.repeat(fn, number=20000, repeat=5)) / 20000 * 1e6
+            baseline = baseline or best
+            print(f"{name:<28} {best:7.2f} us/response  {baseline / best:5.1f}x  {len(fn())} bytes")
+
+
+if __name__ == '__main__':
+    main()
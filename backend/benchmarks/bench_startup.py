@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: pickled sklearn model vs exported predictor module
+Each path is loaded in a fresh interpreter; reports time to a ready engine
+and peak RSS. Run from the backend directory:
+
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PICKLE_PATH = '''
+import time
+start = time.perf_counter()
+import joblib
+from inference import CompiledForest
+model = joblib.load('models/iris_model.pkl')
+scaler = joblib.load('models/scaler.pkl')
+engine = CompiledForest.from_sklearn(model).fold_scaler(scaler)
+'''
+
+MODULE_PATH = '''
+import time
+start = time.perf_counter()
+from exporter import load_predictor_module
+from inference import CompiledForest
+engine = CompiledForest.from_module(load_predictor_module({path!r}))
+'''
+
+REPORT = '''
+elapsed = time.perf_counter() - start
+import json, sys
+# VmHWM is per address space; ru_maxrss would carry over the parent's peak across exec
+with open('/proc/self/status') as f:
+    status = dict(line.split(':', 1) for line in f)
+print(json.dumps({'seconds': elapsed, 'max_rss_kb': int(status['VmHWM'].split()[0]),
+                  'sklearn_imported': 'sklearn' in sys.modules}))
+'''
+
+
+def run(code):
+    output = subprocess.run([sys.executable, '-c', code + REPORT], cwd=BACKEND,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(name, samples):
+    seconds = sorted(s['seconds'] for s in samples)
+    rss = sorted(s['max_rss_kb'] for s in samples)
+    print(f"{name:<8} load {seconds[len(seconds) // 2] * 1000:8.1f} ms   "
+          f"peak RSS {rss[len(rss) // 2] / 1024:7.1f} MiB   sklearn imported: {samples[0]['sklearn_imported']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND)
+    os.chdir(BACKEND)
+    import joblib
+    from exporter import export_predictor_module
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = export_predictor_module(joblib.load('models/iris_model.pkl'), joblib.load('models/scaler.pkl'),
+                                       os.path.join(tmpdir, 'iris_predictor.py'))
+        summarize('pickle', [run(PICKLE_PATH) for _ in range(args.runs)])
+        summarize('module', [run(MODULE_PATH.format(path=path)) for _ in range(args.runs)])
+
+
+if __name__ == '__main__':
+    main()
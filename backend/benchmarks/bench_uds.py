@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Round-trip latency of the Unix-domain-socket prediction server
+Starts the server in a forked child with the app's model, then times
+single-row requests from one persistent client connection. Run from the
+backend directory:
+
+    python benchmarks/bench_uds.py [--requests 20000] [--rows 1]
+"""
+
+import argparse
+import os
+import signal
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve(path):
+    import app as app_module
+    from uds import bind_unix_socket
+    app_module.load_or_train_model()
+    app_module.start_unix_server(bind_unix_socket(path))
+    while True:
+        time.sleep(3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--rows', type=int, default=1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND)
+    os.chdir(BACKEND)
+    from uds import UnixPredictionClient
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'predict.sock')
+        pid = os.fork()
+        if pid == 0:
+            try:
+                serve(path)
+            finally:
+                os._exit(0)
+        try:
+            while not os.path.exists(path):
+                time.sleep(0.05)
+            client = UnixPredictionClient(path)
+            features = np.random.default_rng(0).uniform(0.1, 8.0, size=(args.rows, 4)).astype(np.float32)
+            for _ in range(1000):
+                client.predict(features)
+
+            latencies = np.empty(args.requests)
+            for i in range(args.requests):
+                start = time.perf_counter()
+                client.predict(features)
+                latencies[i] = time.perf_counter() - start
+            latencies *= 1e6
+            print(f"rows/request={args.rows} requests={args.requests} "
+                  f"p50={np.percentile(latencies, 50):.1f}us p99={np.percentile(latencies, 99):.1f}us "
+                  f"max={latencies.max():.1f}us")
+        finally:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+In-process prediction cache
+LRU + TTL cache keyed on feature vectors canonicalized to a fixed precision
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """Bounded LRU cache with per-entry TTL for single-row predictions
+
+    Every entry holds one 4-float key and one (class, probabilities) value, so
+    bounding the entry count bounds memory. ``precision`` rounds features to
+    that many decimals before keying; the rounded row is also what gets
+    scored, so a cached answer never depends on which raw row came first.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=300, precision=None):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.precision = precision
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def canonicalize(self, features):
+        """Return (key, canonical_features) for a feature row"""
+        features = np.asarray(features, dtype=np.float64)
+        if self.precision is not None:
+            # Adding 0.0 folds -0.0 into 0.0 so both share a key
+            features = np.round(features, self.precision) + 0.0
+        return features.tobytes(), features
+
+    def get(self, key):
+        """Return the cached value or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        """Store a value, dropping it if the model changed since it was computed"""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the model or scaler is reloaded"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'precision': self.precision,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
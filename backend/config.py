@@ -1,5 +1,7 @@
 # Configuration file for ML DevOps App
 
+import os
+
 # Application Settings
 DEBUG = False
 TESTING = False
@@ -11,12 +13,38 @@ CORS_ORIGINS = ["*"]  # Restrict in production
 # Model Configuration
 MODEL_PATH = "models/iris_model.pkl"
 SCALER_PATH = "models/scaler.pkl"
+MODEL_FORMAT = "pickle"  # "pickle" (joblib + scikit-learn), "module" (exported NumPy-only predictor) or "mmap" (shared artifact)
+MODEL_MODULE_PATH = "models/iris_predictor.py"
+MODEL_ARTIFACT_PATH = "models/iris_forest.bin"
 AUTO_TRAIN_ON_STARTUP = True
 
+# Hot reload: watch the model files, or POST /api/admin/reload with the admin token
+MODEL_WATCH_ENABLED = False
+MODEL_WATCH_INTERVAL = 2.0  # seconds between polls of the model files
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")  # admin endpoints are disabled when unset
+
 # Logging Configuration
 LOG_LEVEL = "INFO"
 LOG_FILE = "logs/app.log"
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Request threads only enqueue records; a listener thread per process does the I/O
+LOG_QUEUE_ENABLED = True
+LOG_QUEUE_SIZE = 10000  # records; a full queue applies LOG_QUEUE_POLICY
+LOG_QUEUE_POLICY = "drop"  # "drop" (count and discard) or "block" (wait up to LOG_QUEUE_BLOCK_TIMEOUT, then drop)
+LOG_QUEUE_BLOCK_TIMEOUT = 0.05  # seconds
+PREDICTION_LOG_SAMPLE_RATE = 0.01  # fraction of predictions logged individually
+PREDICTION_LOG_SUMMARY_INTERVAL = 60  # seconds between aggregate prediction records
+NOT_FOUND_LOG_LIMIT = 10  # 404 warnings logged per NOT_FOUND_LOG_INTERVAL; the rest are counted
+NOT_FOUND_LOG_INTERVAL = 60  # seconds
+
+# Binary audit log of every prediction (audit.py): per-worker rotated segments,
+# gzipped once closed; read back with audit.iter_records(AUDIT_DIR)
+AUDIT_ENABLED = False
+AUDIT_DIR = "audit"
+AUDIT_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+AUDIT_SEGMENT_MAX_AGE = 3600  # seconds
+AUDIT_COMPRESS = True
+AUDIT_QUEUE_SIZE = 10000  # queued requests; beyond it entries are dropped and counted
 
 # Feature Configuration
 FEATURE_NAMES = ["Sepal Length", "Sepal Width", "Petal Length", "Petal Width"]
@@ -27,14 +55,66 @@ N_CLASSES = 3
 # Performance Settings
 WORKERS = 4
 THREAD_POOL_SIZE = 10
-TIMEOUT = 30
+TIMEOUT = 30  # seconds; also the default and maximum per-request deadline
+DEADLINE_HEADER = "X-Request-Timeout-Ms"  # optional client budget in milliseconds
+MAX_BATCH_SIZE = 10000  # rows accepted by /api/predict/batch
+STREAM_CHUNK_ROWS = 1024  # rows scored per forest pass by /api/predict/stream
+STREAM_MAX_LINE_BYTES = 4096  # longest NDJSON line /api/predict/stream accepts
+
+# Admission control: adaptive (AIMD) concurrency limit on the prediction routes,
+# starting at THREAD_POOL_SIZE minus the slots reserved for /health
+ADMISSION_ENABLED = True
+ADMISSION_LATENCY_TARGET_MS = 100  # /api/predict completions slower than this shrink the limit
+ADMISSION_BATCH_LATENCY_TARGET_MS = 1000  # same for /api/predict/batch, on the same shared limit
+ADMISSION_MIN_LIMIT = 1
+ADMISSION_HEALTH_BUDGET = 2  # concurrent /health probes, never taken by predictions
+
+# Optional Unix-domain-socket listener with a binary protocol for local clients (uds.py)
+UNIX_SOCKET_ENABLED = False
+UNIX_SOCKET_PATH = "/tmp/ml-devops-predict.sock"
+
+# ASGI variant (asgi.py): inference executor and its queue bound
+ASGI_EXECUTOR = "thread"  # "thread" or "process"
+ASGI_MAX_PENDING = 1000  # queued + running predictions before answering 503
+ASGI_MAX_BODY_BYTES = 10 * 1024 * 1024
+
+# Precomputed threshold-grid lookup table (exact, falls back to trees past the budget)
+LOOKUP_TABLE_ENABLED = False
+LOOKUP_TABLE_MAX_BYTES = 64 * 1024 * 1024
+
+# Serving precision of the compiled forest: "float64", "float32" or "int16"
+# (16-bit threshold ranks, exact splits, with MODEL_LEAF_BITS fixed-point leaves)
+MODEL_PRECISION = "float64"
+MODEL_LEAF_BITS = 8
+
+# Trees scored per step by class-only (early-exit) batch evaluation
+EARLY_EXIT_BLOCK_SIZE = 4
+
+# Micro-batching of concurrent /api/predict calls
+MICRO_BATCH_ENABLED = False
+MICRO_BATCH_MAX_SIZE = 64
+MICRO_BATCH_MAX_WAIT_US = 500
+
+# Prediction cache for repeated /api/predict feature vectors
+PREDICTION_CACHE_ENABLED = False
+PREDICTION_CACHE_MAX_ENTRIES = 100000  # fixed-size entries, bounds memory
+PREDICTION_CACHE_TTL = 300  # seconds
+PREDICTION_CACHE_PRECISION = None  # decimals to round features to; None keys on exact values
 
 # Security
 RATE_LIMIT_ENABLED = False
 RATE_LIMIT_REQUESTS = 100
 RATE_LIMIT_WINDOW = 60
+RATE_LIMIT_TABLE_SIZE = 65536  # clients tracked at once across all workers
+RATE_LIMIT_API_KEY_HEADER = "X-API-Key"  # clients sending it are limited per key, others per IP
+# Reverse proxies in front of the app (e.g. 1 behind the bundled nginx); their
+# X-Forwarded-For entries are trusted for the client address. Keep 0 when
+# clients reach the app directly, or they could pick their own address.
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", 0))
 
 # Monitoring
 HEALTH_CHECK_INTERVAL = 30  # seconds
 METRICS_ENABLED = True
+METRICS_WORKER_SLOTS = 64  # worker processes whose counts /api/metrics aggregates
+METRICS_PUBLISH_INTERVAL = 1.0  # seconds; how stale other workers' counts in a scrape may be
 TRACE_ENABLED = False
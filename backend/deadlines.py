@@ -0,0 +1,76 @@
+"""
+Per-request deadlines
+A deadline is an absolute time.monotonic() value carried in a context
+variable while a request is served. Work whose deadline has passed before
+it runs is dropped instead of spending CPU on an answer nobody will read.
+"""
+
+import contextvars
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passes; ``status`` is the HTTP answer"""
+
+    def __init__(self, message, status=504):
+        super().__init__(message)
+        self.status = status
+
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+_lock = threading.Lock()
+_counts = {'expired_in_queue': 0, 'expired_in_flight': 0}
+
+
+def budget_from_header(value, default):
+    """Seconds allowed by a milliseconds header value, capped at ``default``"""
+    try:
+        budget = float(value) / 1000.0
+    except (TypeError, ValueError):
+        return default
+    if budget != budget or budget <= 0:
+        return default
+    return min(budget, default)
+
+
+def set_deadline(deadline):
+    return _deadline.set(deadline)
+
+
+def current_deadline():
+    return _deadline.get()
+
+
+def remaining(deadline=None):
+    """Seconds left before the deadline, or None when there is none"""
+    deadline = current_deadline() if deadline is None else deadline
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired_in_queue(stage):
+    """Count and build the error for work dropped before it started (503)"""
+    with _lock:
+        _counts['expired_in_queue'] += 1
+    return DeadlineExceeded(f'Deadline passed while queued ({stage})', status=503)
+
+
+def expired_in_flight(stage):
+    """Count and build the error for work that ran out of time midway (504)"""
+    with _lock:
+        _counts['expired_in_flight'] += 1
+    return DeadlineExceeded(f'Deadline exceeded ({stage})', status=504)
+
+
+def check(stage, deadline=None):
+    """Raise before starting ``stage`` if the deadline has already passed"""
+    left = remaining(deadline)
+    if left is not None and left <= 0:
+        raise expired_in_queue(stage)
+
+
+def stats():
+    with _lock:
+        return dict(_counts)
@@ -0,0 +1,95 @@
+"""
+Request/response encodings for the prediction endpoints
+application/octet-stream bodies are packed little-endian float rows decoded
+with np.frombuffer; application/msgpack carries the same documents as JSON
+when the optional msgpack package is installed. PredictionEncoder writes
+single-prediction JSON from precompiled templates.
+"""
+
+import json
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+BINARY_MIMETYPE = 'application/octet-stream'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# dtype= parameter of the binary content type; float32 when omitted
+BINARY_DTYPES = {
+    'float32': np.dtype('<f4'),
+    'float64': np.dtype('<f8'),
+}
+
+
+def encode_json(payload):
+    """Same bytes as Flask's jsonify outside debug mode"""
+    return (json.dumps(payload, sort_keys=True, separators=(',', ':')) + '\n').encode()
+
+
+class PredictionEncoder:
+    """Single-prediction JSON from precompiled byte templates
+
+    full() is byte-identical to encode_json() (and jsonify) of the /api/predict
+    payload: keys sorted, compact separators, floats as repr(), trailing newline.
+    Only the numbers and timestamp are formatted per call.
+    """
+
+    def __init__(self, classes):
+        names = [json.dumps(name) for name in classes]
+        # Probabilities are keyed by class name, so sort_keys orders them by name
+        self.order = sorted(range(len(classes)), key=lambda i: classes[i])
+        probabilities = ','.join(f'{names[i]}:%r' for i in self.order)
+        self.full_templates = [
+            '{"class":' + names[i] + ',"confidence":%r,"prediction":' + str(i)
+            + ',"probabilities":{' + probabilities + '},"timestamp":"%s"}\n'
+            for i in range(len(classes))
+        ]
+        self.compact_templates = [
+            '{"prediction":' + str(i) + ',"probabilities":[' + ','.join(['%r'] * len(classes)) + ']}\n'
+            for i in range(len(classes))
+        ]
+
+    def full(self, prediction, probability, confidence, timestamp):
+        values = [probability[i] for i in self.order]
+        return (self.full_templates[prediction] % (confidence, *values, timestamp)).encode()
+
+    def compact(self, prediction, probability):
+        return (self.compact_templates[prediction] % tuple(probability)).encode()
+
+
+def binary_dtype(params):
+    """Resolve the dtype= content-type parameter"""
+    name = params.get('dtype', 'float32')
+    if name not in BINARY_DTYPES:
+        raise ValueError(f'dtype must be one of {list(BINARY_DTYPES)}')
+    return name, BINARY_DTYPES[name]
+
+
+def decode_rows(body, dtype, n_features=4):
+    """View a packed body as an (N, n_features) array without copying"""
+    row_bytes = n_features * dtype.itemsize
+    if not body or len(body) % row_bytes:
+        raise ValueError(f'Body must hold whole rows of {n_features} {dtype.name} values')
+    return np.frombuffer(body, dtype=dtype).reshape(-1, n_features)
+
+
+def encode_rows(array, dtype):
+    return np.ascontiguousarray(array, dtype=dtype).tobytes()
+
+
+def binary_content_type(name):
+    return f'{BINARY_MIMETYPE}; dtype={name}'
+
+
+def decode_msgpack(body):
+    if msgpack is None:
+        raise RuntimeError('msgpack is not installed')
+    return msgpack.unpackb(body, raw=False)
+
+
+def encode_msgpack(payload):
+    return msgpack.packb(payload, use_bin_type=True)
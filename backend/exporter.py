@@ -0,0 +1,85 @@
+"""
+Export a trained forest as a standalone predictor module
+The generated module depends only on NumPy, so serving it does not import
+scikit-learn or unpickle estimators
+"""
+
+import importlib.util
+from datetime import datetime
+
+from artifact import atomic_write
+from inference import CompiledForest
+
+MODULE_TEMPLATE = '''"""
+Standalone iris predictor
+Generated by exporter.py on {generated_at} from a {n_estimators}-tree
+RandomForestClassifier with its StandardScaler folded into the thresholds.
+Depends only on NumPy. Do not edit by hand; re-export instead.
+"""
+
+import numpy as np
+
+N_ESTIMATORS = {n_estimators}
+MAX_DEPTH = {max_depth}
+CLASSES = np.array({classes!r})
+
+# Flat node arrays; leaves point back to themselves
+FEATURE = np.array({feature!r}, dtype=np.int32)
+THRESHOLD = np.array({threshold!r}, dtype=np.float64)
+CHILDREN_LEFT = np.array({children_left!r}, dtype=np.int32)
+CHILDREN_RIGHT = np.array({children_right!r}, dtype=np.int32)
+VALUE = np.array({value!r}, dtype=np.float64)
+ROOTS = np.array({roots!r}, dtype=np.int32)
+
+
+def apply(X):
+    """Leaf index reached in every tree for raw (unscaled) rows"""
+    X = np.asarray(X, dtype=np.float64)
+    rows = np.arange(X.shape[0])[:, np.newaxis]
+    node = np.broadcast_to(ROOTS, (X.shape[0], len(ROOTS)))
+    for _ in range(MAX_DEPTH):
+        go_left = X[rows, FEATURE[node]] <= THRESHOLD[node]
+        node = np.where(go_left, CHILDREN_LEFT[node], CHILDREN_RIGHT[node])
+    return node
+
+
+def predict_proba(X):
+    probabilities = VALUE[apply(X)].sum(axis=1)
+    probabilities /= len(ROOTS)
+    return probabilities
+
+
+def predict(X):
+    return CLASSES.take(np.argmax(predict_proba(X), axis=1))
+'''
+
+
+def export_predictor_module(model, scaler, path):
+    """Write a NumPy-only predictor module for a fitted model and scaler"""
+    forest = CompiledForest.from_sklearn(model).fold_scaler(scaler)
+
+    # repr() of a Python float round-trips exactly, so thresholds stay bit-identical
+    source = MODULE_TEMPLATE.format(
+        generated_at=datetime.now().isoformat(timespec='seconds'),
+        n_estimators=forest.n_estimators,
+        max_depth=forest.max_depth,
+        classes=forest.classes_.tolist(),
+        feature=forest.feature.tolist(),
+        threshold=forest.threshold.tolist(),
+        children_left=forest.children_left.tolist(),
+        children_right=forest.children_right.tolist(),
+        value=forest.value.tolist(),
+        roots=forest.roots.tolist(),
+    )
+
+    with atomic_write(path, 'w') as f:
+        f.write(source)
+    return path
+
+
+def load_predictor_module(path):
+    """Import a generated predictor module from its file path"""
+    spec = importlib.util.spec_from_file_location('iris_predictor', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,523 @@
+"""
+Inference engines for the iris random forest
+Flattens fitted scikit-learn forests into contiguous NumPy arrays so that
+serving does not go through sklearn's per-call validation and joblib dispatch
+"""
+
+import hashlib
+
+import numpy as np
+
+
+def _scaled_le(x, threshold, mean, scale):
+    """The split test sklearn runs on a raw value: scale, cast to float32, compare"""
+    return ((x - mean) / scale).astype(np.float32) <= threshold
+
+
+def _raw_split_points(threshold, mean, scale, max_iter=2200):
+    """Largest raw float64 value that still goes left at each scaled split
+
+    The scaled test is monotone in x, so the boundary is found by bisecting
+    between a bracket that goes left and one that goes right until the two
+    ends are adjacent doubles.
+    """
+    guess = threshold * scale + mean
+    delta = (np.abs(threshold) + 1.0) * scale * 1e-5
+    lo = guess - delta
+    hi = guess + delta
+
+    # Widen the bracket until lo goes left and hi goes right
+    for _ in range(max_iter):
+        bad_lo = ~_scaled_le(lo, threshold, mean, scale)
+        bad_hi = _scaled_le(hi, threshold, mean, scale)
+        if not (bad_lo.any() or bad_hi.any()):
+            break
+        delta = delta * 2.0
+        lo = np.where(bad_lo, guess - delta, lo)
+        hi = np.where(bad_hi, guess + delta, hi)
+
+    for _ in range(max_iter):
+        if (np.nextafter(lo, np.inf) >= hi).all():
+            break
+        mid = lo + (hi - lo) / 2.0
+        # Guard against mid rounding onto an endpoint
+        mid = np.where((mid <= lo) | (mid >= hi), np.nextafter(lo, np.inf), mid)
+        goes_left = _scaled_le(mid, threshold, mean, scale)
+        lo = np.where(goes_left, mid, lo)
+        hi = np.where(goes_left, hi, mid)
+    else:
+        raise RuntimeError('Could not fold scaler into split thresholds')
+
+    return lo
+
+
+class CompiledForest:
+    """Random forest flattened into contiguous node arrays
+
+    All trees share one set of node arrays. Leaves point back to themselves,
+    so every row can be walked for ``max_depth`` steps through every tree at
+    once without branching on leaf status.
+    """
+
+    # Weight a single tree's leaf row sums to; fixed-point copies override it
+    value_scale = 1.0
+
+    def __init__(self, feature, threshold, children_left, children_right,
+                 value, roots, max_depth, classes, input_dtype=np.float32):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        # sklearn trees compare float32 inputs against float64 thresholds
+        self.input_dtype = input_dtype
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (
+            self.feature, self.threshold, self.children_left,
+            self.children_right, self.value, self.roots
+        ))
+
+    @property
+    def split_mask(self):
+        """True for internal (split) nodes, False for leaves"""
+        return self.children_left != np.arange(self.n_nodes)
+
+    def split_points(self, n_features):
+        """Sorted unique split thresholds for each feature"""
+        is_split = self.split_mask
+        return [
+            np.unique(self.threshold[is_split & (self.feature == f)])
+            for f in range(n_features)
+        ]
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Build a compiled forest from a fitted RandomForestClassifier"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count, dtype=np.int32)
+            is_leaf = tree.children_left < 0
+
+            # Leaves loop back onto themselves and test feature 0
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left).astype(np.int32) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right).astype(np.int32) + offset)
+            # Since scikit-learn 1.4 tree values already hold class fractions
+            values.append(tree.value[:, 0, :model.n_classes_])
+            roots.append(offset)
+
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children_left=np.concatenate(lefts),
+            children_right=np.concatenate(rights),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.array(roots, dtype=np.int32),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_),
+        )
+
+    @classmethod
+    def from_module(cls, module):
+        """Build a compiled forest from a predictor module written by exporter.py"""
+        return cls(
+            feature=module.FEATURE,
+            threshold=module.THRESHOLD,
+            children_left=module.CHILDREN_LEFT,
+            children_right=module.CHILDREN_RIGHT,
+            value=module.VALUE,
+            roots=module.ROOTS,
+            max_depth=module.MAX_DEPTH,
+            classes=module.CLASSES,
+            input_dtype=np.float64,
+        )
+
+    def fold_scaler(self, scaler):
+        """Return a copy whose thresholds live in raw (unscaled) feature space
+
+        For every split the raw threshold is the largest float64 ``x`` with
+        ``float32((x - mean) / scale) <= threshold``. That is exactly the test
+        sklearn performs after ``scaler.transform``, so the folded forest
+        reaches the same leaves for every float64 input.
+        """
+        n_features = scaler.n_features_in_
+        mean = np.zeros(n_features) if scaler.mean_ is None else np.asarray(scaler.mean_, dtype=np.float64)
+        scale = np.ones(n_features) if scaler.scale_ is None else np.asarray(scaler.scale_, dtype=np.float64)
+
+        is_split = self.split_mask
+        feature = self.feature[is_split]
+        threshold = self.threshold[is_split]
+
+        raw_threshold = self.threshold.copy()
+        raw_threshold[is_split] = _raw_split_points(threshold, mean[feature], scale[feature])
+
+        return CompiledForest(
+            feature=self.feature,
+            threshold=raw_threshold,
+            children_left=self.children_left,
+            children_right=self.children_right,
+            value=self.value,
+            roots=self.roots,
+            max_depth=self.max_depth,
+            classes=self.classes_,
+            input_dtype=np.float64,
+        )
+
+    def fingerprint(self):
+        """Short content hash; the same trees and thresholds give the same version in every worker"""
+        digest = hashlib.blake2b(digest_size=6)
+        for array in (self.feature, self.threshold, self.children_left, self.children_right, self.value, self.roots):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def _encode(self, X):
+        """Convert input rows into the representation thresholds are compared in"""
+        return np.asarray(X, dtype=self.input_dtype)
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_rows, n_trees)"""
+        X = self._encode(X)
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.children_left[node], self.children_right[node])
+
+        return node
+
+    def predict_proba(self, X):
+        """Average leaf class distributions over all trees"""
+        leaves = self.apply(X)
+        # Reducing over the tree axis accumulates trees in order, like sklearn
+        probabilities = self.value[leaves].sum(axis=1)
+        probabilities /= len(self.roots)
+        return probabilities
+
+    def score(self, X):
+        """Return (predictions, probabilities) from a single traversal"""
+        probabilities = self.predict_proba(X)
+        predictions = self.classes_.take(np.argmax(probabilities, axis=1))
+        return predictions, probabilities
+
+    def predict_class(self, X, block_size=4):
+        """Return (predictions, trees_evaluated), stopping once the class is settled
+
+        Trees are scored in order, ``block_size`` at a time. Each tree adds at
+        most ``value_scale`` to any class, so a row is settled once its leading
+        class is ahead of the runner-up by more than the remaining trees could
+        add. Rows that never settle walk every tree and get the same argmax as
+        ``score``. Single rows are walked in plain Python, one tree at a time,
+        where per-call NumPy overhead would outweigh the trees skipped.
+        """
+        X = self._encode(X)
+        if X.shape[0] == 1:
+            prediction, trees_evaluated = self._predict_class_row(X[0].tolist())
+            return self.classes_[[prediction]], np.array([trees_evaluated], dtype=np.int64)
+
+        n_rows, n_trees = X.shape[0], len(self.roots)
+        votes = np.zeros((n_rows, self.value.shape[1]), dtype=np.float64)
+        trees_evaluated = np.zeros(n_rows, dtype=np.int64)
+        active = np.arange(n_rows)
+
+        for start in range(0, n_trees, block_size):
+            roots = self.roots[start:start + block_size]
+            rows = active[:, np.newaxis]
+            node = np.broadcast_to(roots, (len(active), len(roots)))
+
+            for _ in range(self.max_depth):
+                if (self.children_left[node] == node).all():
+                    break
+                go_left = X[rows, self.feature[node]] <= self.threshold[node]
+                node = np.where(go_left, self.children_left[node], self.children_right[node])
+
+            # Accumulate tree by tree to keep the same sums as predict_proba
+            for j in range(len(roots)):
+                votes[active] += self.value[node[:, j]]
+            trees_evaluated[active] = start + len(roots)
+
+            remaining = (n_trees - start - len(roots)) * self.value_scale
+            top_two = np.sort(votes[active], axis=1)[:, -2:]
+            active = active[top_two[:, 1] - top_two[:, 0] <= remaining]
+            if not len(active):
+                break
+
+        predictions = self.classes_.take(np.argmax(votes, axis=1))
+        return predictions, trees_evaluated
+
+    def _node_lists(self):
+        if getattr(self, '_lists', None) is None:
+            self._lists = tuple(array.tolist() for array in (
+                self.feature, self.threshold, self.children_left,
+                self.children_right, self.value, self.roots
+            ))
+        return self._lists
+
+    def _predict_class_row(self, x):
+        """Early-exit walk of one encoded row; returns (class index, trees evaluated)"""
+        feature, threshold, left, right, value, roots = self._node_lists()
+        n_trees = len(roots)
+        votes = [0.0] * len(value[0])
+
+        for t, node in enumerate(roots):
+            while left[node] != node:
+                node = left[node] if x[feature[node]] <= threshold[node] else right[node]
+            for c, v in enumerate(value[node]):
+                votes[c] += v
+
+            remaining = (n_trees - t - 1) * self.value_scale
+            runner_up, top = sorted(votes)[-2:]
+            if top - runner_up > remaining:
+                break
+
+        return votes.index(max(votes)), t + 1
+
+
+class LookupTable:
+    """Exact forest replacement backed by a precomputed cell table
+
+    The split thresholds on each feature cut feature space into a grid of
+    cells, and every row in a cell reaches the same leaves. Each feature is
+    binned with ``np.searchsorted`` and the cell's probabilities are read from
+    a table, so prediction cost does not depend on the number of trees.
+    Cells accumulate leaf values in tree order, which keeps the table
+    bit-for-bit equal to the forest.
+    """
+
+    def __init__(self, cuts, strides, cell_index, table, classes, input_dtype):
+        self.cuts = cuts
+        self.strides = strides
+        # cell_index is None for a dense table with one row per cell
+        self.cell_index = cell_index
+        self.table = table
+        self.classes_ = classes
+        self.input_dtype = input_dtype
+
+    @property
+    def n_cells(self):
+        return int(np.prod([len(c) + 1 for c in self.cuts]))
+
+    @property
+    def nbytes(self):
+        index_bytes = 0 if self.cell_index is None else self.cell_index.nbytes
+        return self.table.nbytes + index_bytes + sum(c.nbytes for c in self.cuts)
+
+    @staticmethod
+    def _index_dtype(n_rows):
+        for dtype in (np.uint8, np.uint16, np.uint32):
+            if n_rows <= np.iinfo(dtype).max + 1:
+                return dtype
+        return np.uint64
+
+    @classmethod
+    def from_forest(cls, forest, n_features=4, max_bytes=64 * 1024 * 1024):
+        """Tabulate a CompiledForest, raising MemoryError if it exceeds max_bytes"""
+        cuts = forest.split_points(n_features)
+        shape = tuple(len(c) + 1 for c in cuts)
+        n_classes = forest.value.shape[1]
+
+        dense_bytes = int(np.prod(shape)) * n_classes * 8
+        if dense_bytes > max_bytes:
+            raise MemoryError(f'Lookup table needs {dense_bytes} bytes, over the {max_bytes} byte budget')
+
+        # Paint each leaf's class distribution onto the box of cells that reach
+        # it, one tree at a time, so cells accumulate trees in the same order
+        # as CompiledForest.predict_proba
+        dense = np.zeros(shape + (n_classes,), dtype=np.float64)
+        for root in forest.roots:
+            stack = [(int(root), (0,) * n_features, shape)]
+            while stack:
+                node, lo, hi = stack.pop()
+                left = int(forest.children_left[node])
+                if left == node:
+                    box = tuple(slice(a, b) for a, b in zip(lo, hi))
+                    dense[box] += forest.value[node]
+                    continue
+                f = int(forest.feature[node])
+                # x <= cuts[k] exactly when its bin is <= k
+                k = int(np.searchsorted(cuts[f], forest.threshold[node]))
+                stack.append((left, lo, hi[:f] + (min(hi[f], k + 1),) + hi[f + 1:]))
+                stack.append((int(forest.children_right[node]),
+                              lo[:f] + (max(lo[f], k + 1),) + lo[f + 1:], hi))
+        dense /= len(forest.roots)
+        dense = dense.reshape(-1, n_classes)
+
+        # Store unique probability rows plus a narrow per-cell index when smaller
+        unique, inverse = np.unique(dense, axis=0, return_inverse=True)
+        index_dtype = cls._index_dtype(len(unique))
+        compressed_bytes = unique.nbytes + len(dense) * np.dtype(index_dtype).itemsize
+
+        if compressed_bytes < dense.nbytes:
+            table, cell_index = unique, inverse.reshape(-1).astype(index_dtype)
+        else:
+            table, cell_index = dense, None
+
+        strides = np.array([int(np.prod(shape[f + 1:])) for f in range(n_features)], dtype=np.int64)
+        return cls(cuts, strides, cell_index, table, forest.classes_, forest.input_dtype)
+
+    def cells(self, X):
+        """Flat cell index of every row"""
+        X = np.asarray(X, dtype=self.input_dtype)
+        cell = np.zeros(X.shape[0], dtype=np.int64)
+        for f, cuts in enumerate(self.cuts):
+            # side='left' counts cuts strictly below x, matching the x <= t split test
+            cell += np.searchsorted(cuts, X[:, f], side='left') * self.strides[f]
+        return cell
+
+    def predict_proba(self, X):
+        cell = self.cells(X)
+        if self.cell_index is not None:
+            cell = self.cell_index[cell]
+        return self.table[cell]
+
+    def score(self, X):
+        """Return (predictions, probabilities) from one table lookup"""
+        probabilities = self.predict_proba(X)
+        predictions = self.classes_.take(np.argmax(probabilities, axis=1))
+        return predictions, probabilities
+
+    def predict_class(self, X, block_size=None):
+        """Return (predictions, trees_evaluated); a table lookup walks no trees"""
+        predictions, _ = self.score(X)
+        return predictions, np.zeros(len(predictions), dtype=np.int64)
+
+
+def _smallest_uint(max_value):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+class QuantizedForest(CompiledForest):
+    """Compact serving copy of a CompiledForest
+
+    ``precision='float32'`` stores thresholds and leaf probabilities as
+    float32. ``precision='int16'`` replaces each threshold by its 16-bit rank
+    among that feature's split points and bins inputs the same way, which
+    keeps every split decision exact, and stores leaf probabilities as
+    ``leaf_bits``-bit fixed point. Node indices use the narrowest unsigned
+    type that fits. Use ``precision_report`` to measure the deviation.
+    """
+
+    PRECISIONS = ('float32', 'int16')
+
+    def __init__(self, forest, precision='int16', leaf_bits=8, n_features=4):
+        if precision not in self.PRECISIONS:
+            raise ValueError(f'Unknown precision {precision!r}, expected one of {self.PRECISIONS}')
+
+        index_dtype = _smallest_uint(forest.n_nodes - 1)
+        cuts = None
+
+        if precision == 'float32':
+            threshold = forest.threshold.astype(np.float32)
+            value = forest.value.astype(np.float32)
+            self.value_scale = 1.0
+            input_dtype = np.float32
+        else:
+            cuts = forest.split_points(n_features)
+            if max(len(c) for c in cuts) > np.iinfo(np.uint16).max:
+                raise ValueError('Too many split points for 16-bit threshold ranks')
+            # x <= cuts[k] exactly when searchsorted(cuts, x) <= k
+            threshold = np.zeros(forest.n_nodes, dtype=np.uint16)
+            is_split = forest.split_mask
+            for f in range(n_features):
+                on_feature = is_split & (forest.feature == f)
+                threshold[on_feature] = np.searchsorted(cuts[f], forest.threshold[on_feature])
+            self.value_scale = float((1 << leaf_bits) - 1)
+            value = np.rint(forest.value * self.value_scale).astype(_smallest_uint(self.value_scale))
+            input_dtype = forest.input_dtype
+
+        super().__init__(
+            feature=forest.feature.astype(np.uint8),
+            threshold=threshold,
+            children_left=forest.children_left.astype(index_dtype),
+            children_right=forest.children_right.astype(index_dtype),
+            value=value,
+            roots=forest.roots.astype(index_dtype),
+            max_depth=forest.max_depth,
+            classes=forest.classes_,
+            input_dtype=input_dtype,
+        )
+        self.precision = precision
+        self.leaf_bits = leaf_bits if precision == 'int16' else 32
+        self.cuts = cuts
+
+    @property
+    def nbytes(self):
+        cut_bytes = 0 if self.cuts is None else sum(c.nbytes for c in self.cuts)
+        return super().nbytes + cut_bytes
+
+    def _encode(self, X):
+        X = np.asarray(X, dtype=self.input_dtype)
+        if self.cuts is None:
+            return X
+        codes = np.empty(X.shape, dtype=np.uint16)
+        for f, cuts in enumerate(self.cuts):
+            codes[:, f] = np.searchsorted(cuts, X[:, f], side='left')
+        return codes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        probabilities = self.value[leaves].sum(axis=1, dtype=np.float64)
+        probabilities /= self.value_scale * len(self.roots)
+        return probabilities
+
+
+def probe_inputs(forest, n_rows=10000, n_features=4, seed=0):
+    """Rows whose features sit on, just above, or between split points
+
+    Exercises every split boundary, which is where reduced-precision
+    thresholds can disagree with the original forest.
+    """
+    rng = np.random.default_rng(seed)
+    columns = []
+    for cuts in forest.split_points(n_features):
+        if not len(cuts):
+            columns.append(np.zeros(n_rows))
+            continue
+        candidates = np.concatenate([
+            cuts,
+            np.nextafter(cuts, np.inf),
+            np.nextafter(cuts, -np.inf),
+            (cuts[:-1] + cuts[1:]) / 2,
+            [cuts[0] - 1.0, cuts[-1] + 1.0],
+        ])
+        columns.append(rng.choice(candidates, size=n_rows))
+    return np.column_stack(columns)
+
+
+def precision_report(reference, candidate, X):
+    """Compare a reduced-precision engine against the full-precision forest"""
+    ref_pred, ref_proba = reference.score(X)
+    cand_pred, cand_proba = candidate.score(X)
+    deviation = np.abs(ref_proba - cand_proba)
+    return {
+        'rows': int(len(X)),
+        'max_abs_probability_deviation': float(deviation.max()),
+        'mean_abs_probability_deviation': float(deviation.mean()),
+        'class_flip_rate': float(np.mean(ref_pred != cand_pred)),
+        'reference_bytes': int(reference.nbytes),
+        'candidate_bytes': int(candidate.nbytes),
+    }
@@ -0,0 +1,163 @@
+"""
+Non-blocking logging
+Request threads put records on a bounded queue; one listener thread per
+process formats them and does the file and console I/O. A full queue either
+drops the record or waits briefly, per LOG_QUEUE_POLICY, and every dropped
+record is counted.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+_active = None
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks longer than ``block_timeout`` on a full queue"""
+
+    def __init__(self, log_queue, policy='drop', block_timeout=0.05):
+        super().__init__(log_queue)
+        if policy not in ('drop', 'block'):
+            raise ValueError(f"Unknown log queue policy: {policy}")
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # Render only what cannot travel to the listener (tracebacks hold frames);
+        # the formatted line is built on the listener thread
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.policy == 'block':
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class ConsoleHandler(logging.StreamHandler):
+    """StreamHandler writing to whatever sys.stdout is when the record is emitted
+
+    Records can be written well after setup (the listener thread, exit-time
+    summaries), by which point test runners or daemonizers may have swapped
+    and closed the stdout that was current at configuration time.
+    """
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class LogPipeline:
+    """Root-logger setup: direct handlers, or a queue in front of them"""
+
+    def __init__(self, handlers, level, queued=True, queue_size=10000, policy='drop', block_timeout=0.05):
+        self.handlers = handlers
+        self.queued = queued
+        self.queue_size = queue_size
+        self.handler = None
+        self.listener = None
+
+        # Replaces any earlier setup, flushing its queue first
+        global _active
+        shutdown()
+        _active = None
+        root = logging.getLogger()
+        root.setLevel(level)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        if not queued:
+            for handler in handlers:
+                root.addHandler(handler)
+            return
+
+        _active = self
+        self.handler = BoundedQueueHandler(queue.Queue(queue_size), policy, block_timeout)
+        root.addHandler(self.handler)
+        self.start()
+
+    def start(self):
+        self.listener = logging.handlers.QueueListener(self.handler.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def restart_in_child(self):
+        # Records queued in the parent were already the parent's to write, and
+        # the old queue's lock may have been held by its listener at fork time
+        self.handler.queue = queue.Queue(self.queue_size)
+        self.handler._lock = threading.Lock()
+        self.handler.dropped = 0
+        self.start()
+
+    def stop(self):
+        """Flush queued records and stop the listener"""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+    def stats(self):
+        if not self.queued:
+            return {'queued': False}
+        return {
+            'queued': True,
+            'policy': self.handler.policy,
+            'pending': self.handler.queue.qsize(),
+            'capacity': self.queue_size,
+            'dropped': self.handler.dropped,
+        }
+
+
+def configure_logging(config):
+    """Log to config.LOG_FILE and stdout at config.LOG_LEVEL"""
+    formatter = logging.Formatter(config.LOG_FORMAT)
+    handlers = [ConsoleHandler()]
+    if config.LOG_FILE:
+        directory = os.path.dirname(config.LOG_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.insert(0, logging.FileHandler(config.LOG_FILE))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    return LogPipeline(
+        handlers,
+        getattr(logging, str(config.LOG_LEVEL).upper(), logging.INFO),
+        queued=config.LOG_QUEUE_ENABLED,
+        queue_size=config.LOG_QUEUE_SIZE,
+        policy=config.LOG_QUEUE_POLICY,
+        block_timeout=config.LOG_QUEUE_BLOCK_TIMEOUT
+    )
+
+
+def shutdown():
+    """Flush the queued pipeline, if any; for exits that skip atexit (os._exit)"""
+    if _active is not None:
+        _active.stop()
+
+
+def _restart_in_child():
+    if _active is not None:
+        _active.restart_in_child()
+
+
+# The listener thread does not survive fork; give each worker its own
+os.register_at_fork(after_in_child=_restart_in_child)
+atexit.register(shutdown)
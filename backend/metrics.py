@@ -0,0 +1,379 @@
+"""
+Request and inference metrics
+Every thread records into its own shard, so instrumentation takes no shared
+lock on the hot path; a snapshot merges the shards on read. Shards of threads
+that have exited are folded into a retired total, so thread-per-request
+servers do not grow the shard list without bound.
+
+With a SharedTotals block created before the server forks, every worker
+publishes its totals to its own slot once per publish interval (and at exit),
+and a snapshot adds the other workers' latest totals to its own, so any
+worker answers for all of them. Totals of workers that have exited are kept.
+"""
+
+import atexit
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+import time
+import weakref
+
+import numpy as np
+
+logger = logging.getLogger('metrics')
+
+# Upper bounds of the latency histogram buckets, in milliseconds (last one open-ended)
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+# Upper bounds of the batch-size histogram buckets, in rows
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, float('inf'))
+# Bytes per worker slot in SharedTotals: pid, payload length, JSON totals
+SLOT_BYTES = 64 * 1024
+SLOT_HEADER = struct.Struct('<qI')
+
+_instances = weakref.WeakSet()
+
+
+def _bucket(bounds, value):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            return i
+    return len(bounds) - 1
+
+
+class _Shard:
+    """One thread's accumulators; only the owning thread writes to it"""
+
+    def __init__(self, n_classes):
+        self.thread = threading.current_thread()
+        self.in_flight = 0
+        self.requests = {}
+        self.handler_ms = {}
+        self.inference_ms = [0, 0.0, [0] * len(LATENCY_BUCKETS_MS)]
+        self.batch_rows = [0, 0, [0] * len(BATCH_BUCKETS)]
+        self.classes = [0] * n_classes
+
+    def merge_into(self, total):
+        total.in_flight += self.in_flight
+        for key, count in list(self.requests.items()):
+            total.requests[key] = total.requests.get(key, 0) + count
+        for endpoint, histogram in list(self.handler_ms.items()):
+            _add_histogram(total.handler_ms.setdefault(endpoint, [0, 0.0, [0] * len(LATENCY_BUCKETS_MS)]), histogram)
+        _add_histogram(total.inference_ms, self.inference_ms)
+        _add_histogram(total.batch_rows, self.batch_rows)
+        total.classes = [a + b for a, b in zip(total.classes, self.classes)]
+
+    def to_json(self):
+        return json.dumps({
+            'in_flight': self.in_flight,
+            'requests': [[endpoint, status, count] for (endpoint, status), count in list(self.requests.items())],
+            'handler_ms': dict(self.handler_ms),
+            'inference_ms': self.inference_ms,
+            'batch_rows': self.batch_rows,
+            'classes': self.classes,
+        }).encode()
+
+    @classmethod
+    def from_json(cls, data, n_classes):
+        fields = json.loads(data)
+        shard = cls(n_classes)
+        shard.in_flight = fields['in_flight']
+        shard.requests = {(endpoint, status): count for endpoint, status, count in fields['requests']}
+        shard.handler_ms = fields['handler_ms']
+        shard.inference_ms = fields['inference_ms']
+        shard.batch_rows = fields['batch_rows']
+        shard.classes = fields['classes']
+        return shard
+
+
+def _add_histogram(total, histogram):
+    total[0] += histogram[0]
+    total[1] += histogram[1]
+    total[2] = [a + b for a, b in zip(total[2], histogram[2])]
+
+
+def _summary(histogram, bounds, unit):
+    """Count, mean and bucket-bound percentiles of [count, sum, buckets]"""
+    count, total, buckets = histogram
+    summary = {'count': count, f'mean_{unit}': round(total / count, 4) if count else None}
+    cumulative = np.cumsum(buckets)
+    for q in (50, 95, 99):
+        if count:
+            bound = bounds[int(np.searchsorted(cumulative, count * q / 100.0))]
+            summary[f'p{q}_{unit}'] = None if bound == float('inf') else bound
+        else:
+            summary[f'p{q}_{unit}'] = None
+    return summary
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedTotals:
+    """Per-process totals in anonymous shared memory; slot 0 accumulates exited processes"""
+
+    def __init__(self, n_classes, slots=64):
+        self.n_classes = n_classes
+        self.slots = slots
+        # Anonymous mappings are MAP_SHARED, so forked workers see the same pages
+        self._memory = mmap.mmap(-1, (slots + 1) * SLOT_BYTES)
+        self._lock = multiprocessing.get_context('fork').Lock()
+        self._full_warned = False
+
+    def _read(self, slot):
+        pid, length = SLOT_HEADER.unpack_from(self._memory, slot * SLOT_BYTES)
+        if not length:
+            return pid, None
+        start = slot * SLOT_BYTES + SLOT_HEADER.size
+        return pid, _Shard.from_json(self._memory[start:start + length], self.n_classes)
+
+    def _write(self, slot, pid, shard):
+        data = shard.to_json() if shard is not None else b''
+        if SLOT_HEADER.size + len(data) > SLOT_BYTES:
+            logger.warning(f"Metrics totals of {len(data)} bytes do not fit a shared slot; not published")
+            return
+        start = slot * SLOT_BYTES
+        SLOT_HEADER.pack_into(self._memory, start, pid, len(data))
+        self._memory[start + SLOT_HEADER.size:start + SLOT_HEADER.size + len(data)] = data
+
+    def _retire_exited(self):
+        """Fold the slots of processes that have exited into slot 0; call with the lock held"""
+        retired = None
+        for slot in range(1, self.slots + 1):
+            pid, shard = self._read(slot)
+            if not pid or _process_alive(pid):
+                continue
+            if retired is None:
+                retired = self._read(0)[1] or _Shard(self.n_classes)
+            if shard is not None:
+                # Requests of a killed worker will never finish
+                shard.in_flight = 0
+                shard.merge_into(retired)
+            self._write(slot, 0, None)
+        if retired is not None:
+            self._write(0, 0, retired)
+
+    def _acquire(self):
+        # A worker killed while holding the lock must not stall every scrape after it
+        if self._lock.acquire(timeout=1.0):
+            return True
+        logger.warning("Shared metrics lock unavailable; serving this process's counts only")
+        return False
+
+    def publish(self, shard):
+        """Replace this process's totals"""
+        pid = os.getpid()
+        if not self._acquire():
+            return
+        try:
+            free = None
+            for slot in range(1, self.slots + 1):
+                owner = SLOT_HEADER.unpack_from(self._memory, slot * SLOT_BYTES)[0]
+                if owner == pid:
+                    self._write(slot, pid, shard)
+                    return
+                if not owner and free is None:
+                    free = slot
+            if free is None:
+                self._retire_exited()
+                free = next((slot for slot in range(1, self.slots + 1)
+                             if not SLOT_HEADER.unpack_from(self._memory, slot * SLOT_BYTES)[0]), None)
+            if free is None:
+                if not self._full_warned:
+                    logger.warning(f"All {self.slots} shared metrics slots are taken; process {pid} is not aggregated")
+                    self._full_warned = True
+                return
+            self._write(free, pid, shard)
+        finally:
+            self._lock.release()
+
+    def collect(self):
+        """(totals of every other process, exited ones included; number of live processes published)"""
+        pid = os.getpid()
+        others, processes = [], 0
+        if not self._acquire():
+            return others, 1
+        try:
+            self._retire_exited()
+            for slot in range(self.slots + 1):
+                owner, shard = self._read(slot)
+                if slot and owner:
+                    processes += 1
+                if owner != pid and shard is not None:
+                    others.append(shard)
+        finally:
+            self._lock.release()
+        return others, processes
+
+
+class RequestMetrics:
+    """Per-thread counters for requests, handler and inference time, batch sizes and classes"""
+
+    def __init__(self, classes, shared=None, publish_interval=1.0):
+        self.classes = list(classes)
+        self.shared = shared
+        self.publish_interval = publish_interval
+        self._reset()
+        _instances.add(self)
+
+    def _reset(self):
+        # Also the at-fork reset: a worker starts from zero, its parent's counts stay the parent's
+        self._lock = threading.Lock()
+        self._publishing = False
+        self._clear()
+
+    def _clear(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(len(self.classes))
+
+    def _start_publisher(self):
+        with self._lock:
+            if self._publishing:
+                return
+            self._publishing = True
+        threading.Thread(target=self._publish_loop, name='metrics-publisher', daemon=True).start()
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self.publish_interval)
+            try:
+                self.publish()
+            except Exception as e:
+                logger.error(f"Publishing metrics failed: {str(e)}")
+
+    def publish(self):
+        """Write this process's totals to the shared block, if any"""
+        if self.shared is not None:
+            self.shared.publish(self._merged())
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(len(self.classes))
+            # Registration is the only locked step, once per thread
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def request_started(self):
+        if self.shared is not None and not self._publishing:
+            self._start_publisher()
+        self._shard().in_flight += 1
+
+    def request_finished(self, endpoint, status, seconds):
+        """Call on the thread that called request_started"""
+        shard = self._shard()
+        shard.in_flight -= 1
+        key = (endpoint, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        histogram = shard.handler_ms.get(endpoint)
+        if histogram is None:
+            histogram = shard.handler_ms[endpoint] = [0, 0.0, [0] * len(LATENCY_BUCKETS_MS)]
+        ms = seconds * 1000.0
+        histogram[0] += 1
+        histogram[1] += ms
+        histogram[2][_bucket(LATENCY_BUCKETS_MS, ms)] += 1
+
+    def inference(self, seconds, rows):
+        """One engine call over rows inputs"""
+        shard = self._shard()
+        ms = seconds * 1000.0
+        shard.inference_ms[0] += 1
+        shard.inference_ms[1] += ms
+        shard.inference_ms[2][_bucket(LATENCY_BUCKETS_MS, ms)] += 1
+        shard.batch_rows[0] += 1
+        shard.batch_rows[1] += rows
+        shard.batch_rows[2][_bucket(BATCH_BUCKETS, rows)] += 1
+
+    def predictions(self, predictions):
+        """Count predicted class ids"""
+        classes = self._shard().classes
+        if isinstance(predictions, int):
+            classes[predictions] += 1
+            return
+        for prediction in np.atleast_1d(predictions).tolist():
+            classes[prediction] += 1
+
+    def _merged(self):
+        with self._lock:
+            return self._merged_locked()
+
+    def _merged_locked(self):
+        total = _Shard(len(self.classes))
+        live = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                live.append(shard)
+            else:
+                shard.merge_into(self._retired)
+        self._shards = live
+        self._retired.merge_into(total)
+        for shard in live:
+            shard.merge_into(total)
+        return total
+
+    def take(self):
+        """This process's counts as JSON, resetting them; for work done in an executor child"""
+        with self._lock:
+            total = self._merged_locked()
+            self._clear()
+        return total.to_json()
+
+    def add(self, recorded):
+        """Add counts returned by take() in another process to the calling thread's"""
+        _Shard.from_json(recorded, len(self.classes)).merge_into(self._shard())
+
+    def snapshot(self):
+        """Merged view of every shard, and of every worker's published totals when shared"""
+        total = self._merged()
+        processes = 1
+        if self.shared is not None:
+            self.shared.publish(total)
+            others, processes = self.shared.collect()
+            for shard in others:
+                shard.merge_into(total)
+
+        requests = {}
+        for (endpoint, status), count in sorted(total.requests.items()):
+            requests.setdefault(endpoint, {})[str(status)] = count
+        return {
+            'in_flight': total.in_flight,
+            'requests': requests,
+            'handler_time': {
+                endpoint: _summary(histogram, LATENCY_BUCKETS_MS, 'ms')
+                for endpoint, histogram in sorted(total.handler_ms.items())
+            },
+            'inference_time': _summary(total.inference_ms, LATENCY_BUCKETS_MS, 'ms'),
+            'batch_size': _summary(total.batch_rows, BATCH_BUCKETS, 'rows'),
+            'predictions_by_class': dict(zip(self.classes, total.classes)),
+            'pid': os.getpid(),
+            'processes': processes,
+        }
+
+
+def shutdown():
+    """Publish final totals; for exits that skip atexit (os._exit)"""
+    for metrics in list(_instances):
+        # Only processes that served requests have totals of their own
+        if metrics._publishing:
+            metrics.publish()
+
+
+def _reset_in_child():
+    for metrics in list(_instances):
+        metrics._reset()
+
+
+os.register_at_fork(after_in_child=_reset_in_child)
+atexit.register(shutdown)
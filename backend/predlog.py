@@ -0,0 +1,171 @@
+"""
+Prediction log volume control
+Per-prediction lines are sampled and formatted lazily, so unsampled
+predictions cost one random draw. Every prediction still feeds a running
+aggregate that is logged as one summary record per interval, by a timer
+thread in each process so the summary appears even when traffic stops, and
+once more at exit. Noisy warnings (404s from scanners) go through a
+per-interval cap instead.
+"""
+
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+
+import numpy as np
+
+# Latency samples kept per summary interval (reservoir sampling beyond that)
+LATENCY_RESERVOIR = 1024
+
+_instances = []
+
+
+class PredictionLog:
+    """Sampled per-prediction lines plus a periodic aggregate summary"""
+
+    def __init__(self, logger, classes, sample_rate=1.0, interval=60.0, timer=True):
+        self.logger = logger
+        self.classes = list(classes)
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.timer = timer
+        self._pid = None
+        self._lock = threading.Lock()
+        self._reset(time.monotonic())
+        _instances.append(self)
+
+    def _start_timer(self):
+        # The timer thread belongs to the process that started it; a forked
+        # worker starts its own on its first prediction
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._timer_loop, name='prediction-summary', daemon=True).start()
+
+    def _timer_loop(self):
+        while True:
+            with self._lock:
+                wait = self._window_start + self.interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            self.flush()
+            with self._lock:
+                # An idle window moves on without logging an empty summary
+                if time.monotonic() - self._window_start >= self.interval:
+                    self._window_start = time.monotonic()
+
+    def _reset(self, now):
+        self._window_start = now
+        self._requests = 0
+        self._predictions = 0
+        self._class_counts = np.zeros(len(self.classes), dtype=np.int64)
+        self._confidence_sum = 0.0
+        self._confidence_count = 0
+        self._latencies = []
+        self._latencies_seen = 0
+
+    def sampled(self):
+        """Whether to emit this prediction's own line"""
+        if self.sample_rate >= 1.0:
+            return self.logger.isEnabledFor(logging.INFO)
+        return random.random() < self.sample_rate and self.logger.isEnabledFor(logging.INFO)
+
+    def record(self, predictions, confidences, latency):
+        """Add one request's predictions (scalars or arrays) to the current summary"""
+        if self.timer and self._pid != os.getpid():
+            self._start_timer()
+        predictions = np.atleast_1d(predictions)
+        now = time.monotonic()
+        with self._lock:
+            self._requests += 1
+            self._predictions += len(predictions)
+            self._class_counts += np.bincount(predictions, minlength=len(self.classes))[:len(self.classes)]
+            if confidences is not None:
+                confidences = np.atleast_1d(confidences)
+                self._confidence_sum += float(confidences.sum())
+                self._confidence_count += len(confidences)
+
+            self._latencies_seen += 1
+            if len(self._latencies) < LATENCY_RESERVOIR:
+                self._latencies.append(latency)
+            else:
+                slot = random.randrange(self._latencies_seen)
+                if slot < LATENCY_RESERVOIR:
+                    self._latencies[slot] = latency
+
+            if now - self._window_start < self.interval:
+                return
+            summary = self._summary(now)
+            self._reset(now)
+        self._emit(summary)
+
+    def flush(self):
+        """Log the current summary now, if it has any predictions"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._requests:
+                return
+            summary = self._summary(now)
+            self._reset(now)
+        self._emit(summary)
+
+    def _summary(self, now):
+        latencies_ms = np.percentile(np.array(self._latencies) * 1000, [50, 95, 99])
+        return (
+            self._predictions, self._requests, now - self._window_start,
+            ', '.join(f'{name}={count}' for name, count in zip(self.classes, self._class_counts.tolist())),
+            self._confidence_sum / self._confidence_count if self._confidence_count else float('nan'),
+            *latencies_ms
+        )
+
+    def _emit(self, summary):
+        self.logger.info(
+            "Prediction summary: %d predictions in %d requests over %.0fs, classes: %s, "
+            "mean confidence=%.4f, latency ms p50=%.2f p95=%.2f p99=%.2f",
+            *summary
+        )
+
+
+def shutdown():
+    """Log every pending summary; for exits that skip atexit (os._exit)"""
+    for prediction_log in _instances:
+        prediction_log.flush()
+
+
+atexit.register(shutdown)
+
+
+class RateLimitedLog:
+    """At most ``limit`` records per interval; the rest are counted and reported once"""
+
+    def __init__(self, logger, limit=10, interval=60.0):
+        self.logger = logger
+        self.limit = limit
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._emitted = 0
+        self._suppressed = 0
+
+    def warning(self, msg, *args):
+        now = time.monotonic()
+        with self._lock:
+            suppressed = 0
+            if now - self._window_start >= self.interval:
+                suppressed, self._suppressed = self._suppressed, 0
+                self._window_start, self._emitted = now, 0
+            allowed = self._emitted < self.limit
+            if allowed:
+                self._emitted += 1
+            else:
+                self._suppressed += 1
+
+        if suppressed:
+            self.logger.warning("Suppressed %d similar warnings", suppressed)
+        if allowed:
+            self.logger.warning(msg, *args)
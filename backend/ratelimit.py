@@ -0,0 +1,96 @@
+"""
+Cross-worker per-client rate limiting
+Each client gets a token bucket of RATE_LIMIT_REQUESTS per RATE_LIMIT_WINDOW,
+kept as a single theoretical-arrival time (GCRA), so the limit slides with
+every request instead of resetting at window boundaries. Buckets live in an
+anonymous shared memory table created before the server forks, so every
+worker enforces the same budget.
+"""
+
+import hashlib
+import mmap
+import multiprocessing
+import time
+
+import numpy as np
+
+# Slots probed per key; a key evicts the stalest bucket of its group when all are taken
+WAYS = 4
+ALLOWED, LIMITED, EVICTED = range(3)
+
+
+class SharedRateLimiter:
+    """Fixed-size, set-associative table of per-client token buckets in shared memory"""
+
+    def __init__(self, requests, window, slots=65536, stripes=16):
+        self.requests = requests
+        self.window = window
+        # One request refills every interval; a full bucket absorbs `requests` at once
+        self.interval = window / requests
+        self.tolerance = window - self.interval
+        self.groups = max(1, slots // WAYS)
+        self.slots = self.groups * WAYS
+        self.stripes = stripes
+
+        # Anonymous mappings are MAP_SHARED, so forked workers see the same pages
+        self._memory = mmap.mmap(-1, self.slots * 16 + stripes * 3 * 8)
+        view = memoryview(self._memory)
+        self._keys = view[:self.slots * 8].cast('Q')
+        self._tats = view[self.slots * 8:self.slots * 16].cast('d')
+        self._counters = view[self.slots * 16:].cast('q')
+        self._locks = [multiprocessing.get_context('fork').Lock() for _ in range(stripes)]
+
+    @staticmethod
+    def fingerprint(key):
+        # Stable across processes, unlike hash(); 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+    def hit(self, key):
+        """Count one request for key; returns (allowed, retry_after_seconds)"""
+        digest = self.fingerprint(key)
+        group = digest % self.groups
+        base = group * WAYS
+        stripe = group % self.stripes
+        keys, tats, counters = self._keys, self._tats, self._counters
+
+        now = time.monotonic()
+        with self._locks[stripe]:
+            slot = None
+            victim, oldest = base, float('inf')
+            for i in range(base, base + WAYS):
+                if keys[i] == digest:
+                    slot = i
+                    break
+                if tats[i] < oldest:
+                    victim, oldest = i, tats[i]
+
+            if slot is None:
+                # A bucket whose arrival time has passed is full again, so reusing
+                # it loses nothing; evicting a live one forgives that client
+                if oldest > now:
+                    counters[stripe * 3 + EVICTED] += 1
+                slot = victim
+                keys[slot] = digest
+                tats[slot] = now
+
+            tat = max(tats[slot], now)
+            if tat - now > self.tolerance:
+                counters[stripe * 3 + LIMITED] += 1
+                return False, tat - now - self.tolerance
+            tats[slot] = tat + self.interval
+            counters[stripe * 3 + ALLOWED] += 1
+            return True, 0.0
+
+    def stats(self):
+        counters = np.frombuffer(self._memory, dtype=np.int64, offset=self.slots * 16).reshape(self.stripes, 3)
+        tats = np.frombuffer(self._memory, dtype=np.float64, count=self.slots, offset=self.slots * 8)
+        totals = counters.sum(axis=0)
+        return {
+            'limit': self.requests,
+            'window_seconds': self.window,
+            'allowed': int(totals[ALLOWED]),
+            'limited': int(totals[LIMITED]),
+            'evicted': int(totals[EVICTED]),
+            'active_clients': int(np.count_nonzero(tats > time.monotonic())),
+            'capacity': self.slots,
+        }
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the ML DevOps app
+Loads the model once, then pre-forks config.WORKERS processes that share it
+copy-on-write. Each worker serves the listening socket with a pool of
+config.THREAD_POOL_SIZE threads; the master restarts workers that die or
+hold a request longer than config.TIMEOUT. SIGHUP to the master hot-reloads
+the model in every worker. With config.UNIX_SOCKET_ENABLED every worker also
+accepts binary-protocol clients on config.UNIX_SOCKET_PATH.
+
+    python serve.py [--workers N] [--threads M] [--port P]
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+import audit
+import config
+import logpipe
+import metrics
+import predlog
+
+logger = logging.getLogger('serve')
+
+
+class TimedRequestHandler(WSGIRequestHandler):
+    """Request handler that records when each request starts in its thread's slot
+
+    Streamed responses refresh the slot with every chunk written, so the
+    master's timeout applies to a stalled stream rather than a long one.
+
+    HTTP/1.0 closes the connection after every response, so a pooled thread is
+    never pinned by an idle keep-alive client.
+    """
+
+    protocol_version = 'HTTP/1.0'
+    # Socket timeout for reading the request and writing the response
+    timeout = config.TIMEOUT
+
+    def make_environ(self):
+        environ = super().make_environ()
+        # Lets the app count time spent waiting for a pool thread against the deadline
+        environ['serve.accepted_at'] = self.server.accepted_at()
+        return environ
+
+    def run_wsgi(self):
+        slot = self.server.slot()
+        self.server.busy_since[slot] = time.time()
+        try:
+            super().run_wsgi()
+        finally:
+            self.server.busy_since[slot] = 0.0
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server handing accepted connections to a fixed thread pool
+
+    The accept loop blocks while every thread is busy, leaving new
+    connections in the kernel backlog for sibling workers to pick up.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, fd=None, threads=10, busy_since=None):
+        self.busy_since = busy_since if busy_since is not None else [0.0] * threads
+        self._local = threading.local()
+        self._next_slot = iter(range(threads))
+        self._slot_lock = threading.Lock()
+        self._capacity = threading.BoundedSemaphore(threads)
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+        super().__init__(host, port, self.heartbeat(app), handler=TimedRequestHandler, fd=fd)
+
+    def heartbeat(self, app):
+        """Wrap a WSGI app so every response chunk marks the calling thread's slot busy from now"""
+        busy_since = self.busy_since
+
+        def app_with_heartbeat(environ, start_response):
+            slot = self.slot()
+            body = app(environ, start_response)
+            try:
+                for chunk in body:
+                    yield chunk
+                    busy_since[slot] = time.time()
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+
+        return app_with_heartbeat
+
+    def slot(self):
+        """Index of the calling thread in busy_since"""
+        if not hasattr(self._local, 'slot'):
+            with self._slot_lock:
+                self._local.slot = next(self._next_slot)
+        return self._local.slot
+
+    def accepted_at(self):
+        """time.monotonic() when the calling thread's connection was accepted"""
+        return getattr(self._local, 'accepted_at', time.monotonic())
+
+    def drain(self, timeout):
+        """Wait up to timeout seconds for running requests to finish; False if some are left"""
+        deadline = time.monotonic() + timeout
+        for _ in range(len(self.busy_since)):
+            if not self._capacity.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                return False
+        return True
+
+    def process_request(self, request, client_address):
+        self._capacity.acquire()
+        self._executor.submit(self._process, request, client_address, time.monotonic())
+
+    def _process(self, request, client_address, accepted_at):
+        self._local.accepted_at = accepted_at
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._capacity.release()
+
+
+def catch_up_model():
+    """Reload a freshly forked worker's model only if the files changed since the master loaded them"""
+    import app as app_module
+
+    if app_module.model_files_signature() == app_module.loaded_signature:
+        return False
+    return app_module.reload_model(only_if_changed=True)
+
+
+def run_worker(listener, threads, busy_since, unix_listener=None):
+    """Serve the inherited listening socket until terminated"""
+    import app as app_module
+    from app import app
+
+    # Until the server exists there is nothing to drain; the handlers are set below
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, lambda signum, frame: app_module.request_reload())
+    app_module.reload_coordinator = os.getppid()
+    app_module.size_admission(threads)
+    if catch_up_model():
+        logger.info(f"Worker {os.getpid()} loaded model {app_module.bundle.metadata['version']} from disk")
+    if config.MODEL_WATCH_ENABLED:
+        app_module.start_model_watcher()
+    if unix_listener is not None:
+        app_module.start_unix_server(unix_listener)
+
+    host, port = listener.getsockname()[:2]
+    server = PooledWSGIServer(host, port, app, fd=listener.fileno(), threads=threads,
+                              busy_since=busy_since)
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever to return, so it cannot run on this
+        # (the serving) thread; afterwards spawn() flushes logs and the audit log
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info(f"Worker {os.getpid()} serving with {threads} threads")
+    server.serve_forever()
+    if not server.drain(TimedRequestHandler.timeout):
+        logger.warning(f"Worker {os.getpid()} stopping with requests still running")
+    logger.info(f"Worker {os.getpid()} stopped")
+
+
+class Master:
+    """Pre-forks workers, restarts the ones that die or overrun the timeout"""
+
+    def __init__(self, listener, workers, threads, timeout, unix_listener=None):
+        self.listener = listener
+        self.unix_listener = unix_listener
+        self.n_workers = workers
+        self.threads = threads
+        self.timeout = timeout
+        self.workers = {}
+        self.running = True
+        self.reload_requested = False
+
+    def spawn(self):
+        busy_since = multiprocessing.Array('d', self.threads, lock=False)
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                run_worker(self.listener, self.threads, busy_since, self.unix_listener)
+            except BaseException:
+                logger.exception(f"Worker {os.getpid()} crashed")
+                status = 1
+            finally:
+                # os._exit skips atexit, so publish final counts and flush the summary,
+                # audit segments and log queue here
+                metrics.shutdown()
+                predlog.shutdown()
+                audit.shutdown()
+                logpipe.shutdown()
+                os._exit(status)
+        self.workers[pid] = busy_since
+
+    def stop(self, signum, frame):
+        self.running = False
+
+    def reload(self, signum, frame):
+        # Loading a model is not safe inside a signal handler; the run loop does it
+        self.reload_requested = True
+
+    def reload_workers(self):
+        """Reload the master's model, so respawned workers fork the new one, then every worker's"""
+        import app as app_module
+
+        logger.info("Reloading the model in the master and all workers")
+        app_module.reload_model()
+        gc.freeze()
+        for pid in self.workers:
+            os.kill(pid, signal.SIGHUP)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self.workers.pop(pid, None) is not None and self.running:
+                logger.warning(f"Worker {pid} exited with status {status}; restarting")
+
+    def kill_overdue(self):
+        now = time.time()
+        for pid, busy_since in list(self.workers.items()):
+            started = [t for t in busy_since if t]
+            if started and now - min(started) > self.timeout:
+                logger.error(f"Worker {pid} held a request over {self.timeout}s; killing it")
+                os.kill(pid, signal.SIGKILL)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, self.reload)
+
+        while self.running:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload_workers()
+            self.reap()
+            while self.running and len(self.workers) < self.n_workers:
+                self.spawn()
+            self.kill_overdue()
+            time.sleep(1.0)
+
+        logger.info("Shutting down workers")
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+        for pid in list(self.workers):
+            os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=config.WORKERS)
+    parser.add_argument('--threads', type=int, default=config.THREAD_POOL_SIZE)
+    parser.add_argument('--timeout', type=float, default=config.TIMEOUT)
+    args = parser.parse_args()
+    TimedRequestHandler.timeout = args.timeout
+
+    # Importing the app configures logging
+    import app as app_module
+
+    logger.info("Starting ML DevOps application (pre-fork)")
+    app_module.load_or_train_model()
+
+    # Keep the loaded model out of the cyclic GC so its pages stay shared after fork
+    gc.freeze()
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((args.host, args.port))
+    listener.listen(socket.SOMAXCONN)
+    logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers x {args.threads} threads")
+
+    # Bound before forking too, so all workers accept on the same Unix socket
+    unix_listener = None
+    if config.UNIX_SOCKET_ENABLED:
+        from uds import bind_unix_socket
+        unix_listener = bind_unix_socket(config.UNIX_SOCKET_PATH)
+        logger.info(f"Listening on {config.UNIX_SOCKET_PATH}")
+
+    Master(listener, args.workers, args.threads, args.timeout, unix_listener).run()
+    listener.close()
+    if unix_listener is not None:
+        unix_listener.close()
+        os.unlink(config.UNIX_SOCKET_PATH)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,29 @@
+"""
+Test isolation for the backend suite
+Points every path the app writes to (trained model files, the log file, audit
+segments) at a temporary directory, so a test run leaves nothing behind in the
+working directory. pytest loads this before any test module imports the app,
+which opens LOG_FILE at import.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+workdir = tempfile.mkdtemp(prefix='ml-devops-tests-')
+# Registered before the app's own exit hooks, so it runs after they flush
+atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+
+config.MODEL_PATH = os.path.join(workdir, 'models', 'iris_model.pkl')
+config.SCALER_PATH = os.path.join(workdir, 'models', 'scaler.pkl')
+config.MODEL_MODULE_PATH = os.path.join(workdir, 'models', 'iris_predictor.py')
+config.MODEL_ARTIFACT_PATH = os.path.join(workdir, 'models', 'iris_forest.bin')
+config.LOG_FILE = os.path.join(workdir, 'logs', 'app.log')
+config.AUDIT_DIR = os.path.join(workdir, 'audit')
@@ -0,0 +1,126 @@
+"""
+Tests for adaptive admission control
+"""
+
+import unittest
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from admission import AdaptiveLimiter
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+
+    def test_rejects_beyond_limit(self):
+        """Slots are handed out up to the limit, then refused without blocking"""
+        limiter = AdaptiveLimiter(initial=2)
+        self.assertTrue(limiter.try_acquire())
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+        limiter.release(0.001)
+        self.assertTrue(limiter.try_acquire())
+        self.assertEqual(limiter.stats()['rejected'], 1)
+
+    def test_aimd(self):
+        """Slow completions cut the limit; fast saturated ones grow it back to the cap"""
+        limiter = AdaptiveLimiter(initial=10, target_latency=0.05, backoff=0.5)
+        limiter.try_acquire()
+        limiter.release(1.0)
+        self.assertEqual(limiter.stats()['limit'], 5)
+
+        # Another slow completion inside the same interval does not cut again
+        limiter.try_acquire()
+        limiter.release(1.0)
+        self.assertEqual(limiter.stats()['limit'], 5)
+
+        for _ in range(200):
+            while limiter.try_acquire():
+                pass
+            limiter.release(0.001)
+            limiter.in_flight = 0
+        self.assertEqual(limiter.stats()['limit'], 10)
+
+    def test_resize_and_release_without_adapting(self):
+        """resize() sets a new ceiling; a release with no latency only frees the slot"""
+        limiter = AdaptiveLimiter(initial=8, target_latency=0.05)
+        limiter.resize(3)
+        self.assertEqual(limiter.stats()['limit'], 3)
+        limiter.try_acquire()
+        limiter.release()
+        self.assertEqual(limiter.stats(), {'limit': 3, 'in_flight': 0, 'accepted': 1, 'rejected': 0})
+
+    def test_fixed_budget(self):
+        """min_limit == max_limit never adapts"""
+        limiter = AdaptiveLimiter(initial=2, min_limit=2)
+        limiter.try_acquire()
+        limiter.release(10.0)
+        self.assertEqual(limiter.stats()['limit'], 2)
+
+
+class TestAdmissionRoutes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        app_module.load_or_train_model()
+
+    def setUp(self):
+        self.client = app_module.app.test_client()
+
+    def test_full_predict_budget_sheds_but_health_answers(self):
+        """With every prediction slot taken, predictions get 503 and /health still 200"""
+        limiter = app_module.predict_limiter
+        taken = 0
+        while limiter.try_acquire():
+            taken += 1
+        try:
+            response = self.client.post('/api/predict', json={'features': [5.1, 3.5, 1.4, 0.2]})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '1')
+            self.assertEqual(self.client.get('/health').status_code, 200)
+        finally:
+            for _ in range(taken):
+                limiter.release(0.0)
+
+        response = self.client.post('/api/predict', json={'features': [5.1, 3.5, 1.4, 0.2]})
+        self.assertEqual(response.status_code, 200)
+        admission = json.loads(self.client.get('/api/metrics').data)['admission']
+        # The metrics request itself holds the only slot
+        self.assertEqual(admission['predict']['in_flight'], 1)
+
+    def test_budget_follows_pool_size(self):
+        """With 3 threads one request of any route fills the budget and /health still answers"""
+        limiter = app_module.predict_limiter
+        app_module.size_admission(3)
+        self.addCleanup(app_module.size_admission, app_module.config.THREAD_POOL_SIZE)
+        self.assertEqual(limiter.stats()['limit'], 1)
+
+        self.assertTrue(limiter.try_acquire())
+        try:
+            row = [5.1, 3.5, 1.4, 0.2]
+            self.assertEqual(self.client.post('/api/predict', json={'features': row}).status_code, 503)
+            self.assertEqual(self.client.post('/api/predict/batch', json={'features': [row]}).status_code, 503)
+            response = self.client.post('/api/predict/stream', data=b'[5.1, 3.5, 1.4, 0.2]\n',
+                                        content_type='application/x-ndjson')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(self.client.get('/api/model/info').status_code, 503)
+            self.assertEqual(self.client.get('/health').status_code, 200)
+        finally:
+            limiter.release()
+        self.assertEqual(limiter.stats()['in_flight'], 0)
+
+    def test_batch_latency_scaled_to_its_target(self):
+        """A batch within its own target does not shrink the shared limit"""
+        before = app_module.predict_limiter.stats()['limit']
+        scale = app_module.ADMISSION_LATENCY_SCALE['/api/predict/batch']
+        self.assertTrue(app_module.predict_limiter.try_acquire())
+        app_module.predict_limiter.release(0.5 * scale)
+        self.assertEqual(app_module.predict_limiter.stats()['limit'], before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,14 +6,26 @@ import unittest
 import json
 import sys
 import os
+import time
+from unittest import mock
+
+import numpy as np
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app
+import config
+import deadlines
+import app as app_module
+from app import app, load_or_train_model
 
 class TestMLDevOpsApp(unittest.TestCase):
     
+    @classmethod
+    def setUpClass(cls):
+        """Load the model once for all tests"""
+        load_or_train_model()
+    
     def setUp(self):
         """Set up test client"""
         self.app = app
@@ -86,6 +98,89 @@ class TestMLDevOpsApp(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 400)
     
+    def test_predict_non_finite_features(self):
+        """NaN or infinite features are the client's error: 400 on every encoding"""
+        for path, body in (('/api/predict', '{"features": [NaN, 3.5, 1.4, 0.2]}'),
+                           ('/api/predict/batch', '{"features": [[5.1, 3.5, 1.4, 0.2], [Infinity, 3.3, 6.0, 2.5]]}')):
+            response = self.client.post(path, data=body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(json.loads(response.data)['error'], 'Input contains NaN or infinity')
+        
+        row = np.array([[5.1, np.nan, 1.4, 0.2]], dtype='<f4').tobytes()
+        response = self.client.post('/api/predict', data=row, content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_predict_batch_valid_input(self):
+        """Test batch prediction matches single-row predictions"""
+        rows = [[5.1, 3.5, 1.4, 0.2], [7.0, 3.2, 4.7, 1.4], [6.3, 3.3, 6.0, 2.5]]
+        response = self.client.post(
+            '/api/predict/batch',
+            data=json.dumps({'features': rows}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(len(data['predictions']), 3)
+        for row, result in zip(rows, data['predictions']):
+            single = json.loads(self.client.post(
+                '/api/predict',
+                data=json.dumps({'features': row}),
+                content_type='application/json'
+            ).data)
+            self.assertEqual(result['prediction'], single['prediction'])
+            self.assertEqual(result['class'], single['class'])
+            self.assertEqual(result['probabilities'], single['probabilities'])
+    
+    def test_predict_batch_invalid_input(self):
+        """Test batch prediction rejects empty, ragged and wrong-width rows"""
+        for payload in ({}, {'features': []}, {'features': [[5.1, 3.5, 1.4, 0.2], [5.1, 3.5]]},
+                        {'features': [[5.1, 3.5, 1.4]]}, {'features': [5.1, 3.5, 1.4, 0.2]}):
+            response = self.client.post(
+                '/api/predict/batch',
+                data=json.dumps(payload),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 400)
+    
+    def test_predict_class_only_mode(self):
+        """Test class-only mode agrees with full prediction and reports trees used"""
+        rows = [[5.1, 3.5, 1.4, 0.2], [6.3, 3.3, 6.0, 2.5]]
+        full = json.loads(self.client.post(
+            '/api/predict/batch',
+            data=json.dumps({'features': rows}),
+            content_type='application/json'
+        ).data)
+        
+        for row, expected in zip(rows, full['predictions']):
+            response = self.client.post(
+                '/api/predict',
+                data=json.dumps({'features': row, 'mode': 'class_only'}),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.data)
+            self.assertEqual(data['class'], expected['class'])
+            self.assertNotIn('probabilities', data)
+            self.assertGreaterEqual(data['trees_evaluated'], 1)
+        
+        response = self.client.post(
+            '/api/predict/batch',
+            data=json.dumps({'features': rows, 'mode': 'class_only'}),
+            content_type='application/json'
+        )
+        data = json.loads(response.data)
+        self.assertEqual([r['class'] for r in data['predictions']],
+                         [r['class'] for r in full['predictions']])
+        
+        response = self.client.post(
+            '/api/predict',
+            data=json.dumps({'features': rows[0], 'mode': 'bogus'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+    
     def test_404_error(self):
         """Test 404 error handling"""
         response = self.client.get('/nonexistent')
@@ -96,5 +191,195 @@ class TestMLDevOpsApp(unittest.TestCase):
         response = self.client.get('/health')
         self.assertIn('Access-Control-Allow-Origin', response.headers)
 
+class TestStreamPrediction(unittest.TestCase):
+    """NDJSON streaming endpoint"""
+    
+    @classmethod
+    def setUpClass(cls):
+        load_or_train_model()
+    
+    def setUp(self):
+        self.client = app.test_client()
+        self.rows = [[5.1, 3.5, 1.4, 0.2], [6.3, 3.3, 6.0, 2.5], [5.9, 3.0, 4.2, 1.5]] * 3
+    
+    def stream(self, body):
+        response = self.client.post('/api/predict/stream', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        return [json.loads(line) for line in response.data.splitlines()]
+    
+    def test_stream_matches_batch(self):
+        """Streamed predictions match the batch endpoint across chunk boundaries"""
+        batch = json.loads(self.client.post('/api/predict/batch', json={'features': self.rows}).data)
+        body = ''.join(json.dumps(row) + '\n' for row in self.rows).encode()
+        with mock.patch.object(config, 'STREAM_CHUNK_ROWS', 2):
+            results = self.stream(body + b'\n')
+        self.assertEqual(results, batch['predictions'])
+    
+    def test_stream_reports_bad_line(self):
+        """Bad input ends the stream with an error naming the line"""
+        results = self.stream(b'[5.1, 3.5, 1.4, 0.2]\n[1, 2, 3]\n[5.1, 3.5, 1.4, 0.2]\n')
+        self.assertEqual(results, [{'error': 'Line 2: expected a JSON array of 4 numbers'}])
+    
+    def test_stream_rows_must_match_lines(self):
+        """A row split across lines, or two rows on one line, is an error on that line"""
+        results = self.stream(b'[5.1,3.5\n1.4,0.2]\n[6.3,3.3,6.0,2.5]\n')
+        self.assertEqual(results, [{'error': 'Line 1: expected a JSON array of 4 numbers'}])
+        results = self.stream(b'[5.1,3.5,1.4,0.2],[6.3,3.3,6.0,2.5]\n[5.9,3.0,4.2,1.5]\n')
+        self.assertEqual(results, [{'error': 'Line 1: expected a JSON array of 4 numbers'}])
+    
+    def test_iter_lines(self):
+        """Lines are reassembled across small reads; overlong lines are refused"""
+        chunks = iter([b'[1,', b'2]\n[3', b',4]\n', b'[5]'])
+        self.assertEqual(list(app_module.iter_lines(lambda size: next(chunks, b''))),
+                         [b'[1,2]', b'[3,4]', b'[5]'])
+        
+        with self.assertRaises(ValueError):
+            list(app_module.iter_lines(lambda size: b'x' * size, chunk_bytes=64, max_line_bytes=100))
+        
+        # Complete lines inside one read are held to the limit too
+        chunks = iter([b'[1,2]\n' + b'x' * 200 + b'\n[3,4]\n'])
+        with self.assertRaises(ValueError):
+            list(app_module.iter_lines(lambda size: next(chunks, b''), max_line_bytes=100))
+
+class TestDeadlines(unittest.TestCase):
+    """Per-request deadlines from config.TIMEOUT and the client header"""
+    
+    @classmethod
+    def setUpClass(cls):
+        load_or_train_model()
+    
+    def setUp(self):
+        self.client = app.test_client()
+        self.payload = {'features': [5.1, 3.5, 1.4, 0.2]}
+    
+    def test_budget_from_header(self):
+        """Header budgets are milliseconds, capped at TIMEOUT; bad values fall back"""
+        self.assertEqual(deadlines.budget_from_header('250', 30), 0.25)
+        self.assertEqual(deadlines.budget_from_header('900000', 30), 30)
+        for value in (None, '', 'soon', '-5', 'nan'):
+            self.assertEqual(deadlines.budget_from_header(value, 30), 30)
+    
+    def test_late_request_is_shed(self):
+        """A request whose deadline passed while queued gets 503 without inference"""
+        before = deadlines.stats()['expired_in_queue']
+        response = self.client.post(
+            '/api/predict', json=self.payload,
+            headers={config.DEADLINE_HEADER: '50'},
+            environ_base={'serve.accepted_at': time.monotonic() - 1}
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(deadlines.stats()['expired_in_queue'], before + 1)
+        
+        response = self.client.post('/api/predict', json=self.payload, headers={config.DEADLINE_HEADER: '5000'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('deadlines', json.loads(self.client.get('/api/metrics').data))
+
+class TestModelReload(unittest.TestCase):
+    """Hot-swapping the model without restarting"""
+    
+    @classmethod
+    def setUpClass(cls):
+        load_or_train_model()
+    
+    def setUp(self):
+        self.client = app.test_client()
+        self.rows = np.array([[5.1, 3.5, 1.4, 0.2], [6.3, 3.3, 6.0, 2.5]])
+    
+    def wait_for_reload(self):
+        deadline = time.time() + 10
+        while app_module.reload_lock.locked() and time.time() < deadline:
+            time.sleep(0.01)
+    
+    def test_reload_swaps_bundle(self):
+        """Reload installs a new bundle while the old one stays usable for in-flight requests"""
+        old = app_module.bundle
+        expected = old.engine.score(self.rows)
+        
+        self.assertTrue(app_module.reload_model())
+        self.assertIsNot(app_module.bundle, old)
+        self.assertIs(app_module.engine, app_module.bundle.engine)
+        
+        np.testing.assert_array_equal(old.engine.score(self.rows)[1], expected[1])
+        np.testing.assert_array_equal(app_module.predict_rows(self.rows)[1], expected[1])
+    
+    def test_failed_reload_keeps_model(self):
+        """A missing or broken model on disk leaves the serving model in place"""
+        current = app_module.bundle
+        failures = app_module.reload_stats['failures']
+        with mock.patch.object(config, 'MODEL_FORMAT', 'pickle'), \
+                mock.patch.object(config, 'MODEL_PATH', '/nonexistent/model.pkl'):
+            self.assertFalse(app_module.reload_model())
+        self.assertIs(app_module.bundle, current)
+        self.assertEqual(app_module.reload_stats['failures'], failures + 1)
+    
+    def test_admin_reload_requires_token(self):
+        """Admin reload is disabled without a token and rejects bad credentials"""
+        with mock.patch.object(config, 'ADMIN_TOKEN', None):
+            response = self.client.post('/api/admin/reload', headers={'Authorization': 'Bearer x'})
+            self.assertEqual(response.status_code, 403)
+        
+        with mock.patch.object(config, 'ADMIN_TOKEN', 'secret'):
+            response = self.client.post('/api/admin/reload', headers={'Authorization': 'Bearer wrong'})
+            self.assertEqual(response.status_code, 401)
+            
+            self.wait_for_reload()
+            reloads = app_module.reload_stats['reloads']
+            response = self.client.post('/api/admin/reload', headers={'Authorization': 'Bearer secret'})
+            self.assertEqual(response.status_code, 202)
+            self.wait_for_reload()
+            self.assertEqual(app_module.reload_stats['reloads'], reloads + 1)
+    
+    def test_admin_reload_signals_master(self):
+        """Under serve.py the admin endpoint asks the master to reload every worker"""
+        self.wait_for_reload()
+        with mock.patch.object(config, 'ADMIN_TOKEN', 'secret'), \
+                mock.patch.object(app_module, 'reload_coordinator', 4242), \
+                mock.patch.object(app_module.os, 'kill') as kill:
+            response = self.client.post('/api/admin/reload', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.data)['scope'], 'all_workers')
+        kill.assert_called_once_with(4242, app_module.signal.SIGHUP)
+        self.assertFalse(app_module.reload_lock.locked())
+    
+    def test_reload_if_changed(self):
+        """A worker catching up at startup skips the swap when the disk holds its model"""
+        current = app_module.bundle
+        self.assertFalse(app_module.reload_model(only_if_changed=True))
+        self.assertIs(app_module.bundle, current)
+        
+        stale = app_module.ModelBundle(
+            current.engine, current.model, current.scaler, dict(current.metadata, version='stale'))
+        app_module.install_bundle(stale)
+        try:
+            self.assertTrue(app_module.reload_model(only_if_changed=True))
+            self.assertIsNot(app_module.bundle, stale)
+        finally:
+            app_module.install_bundle(current)
+    
+    def test_reload_runs_hooks(self):
+        """Hooks run after a successful swap only"""
+        hook = mock.Mock()
+        with mock.patch.object(app_module, 'reload_hooks', [hook]):
+            self.assertTrue(app_module.reload_model())
+            with mock.patch.object(config, 'MODEL_FORMAT', 'pickle'), \
+                    mock.patch.object(config, 'MODEL_PATH', '/nonexistent/model.pkl'):
+                self.assertFalse(app_module.reload_model())
+        hook.assert_called_once_with()
+    
+    def test_watcher_reloads_changed_files(self):
+        """Touching a model file triggers a reload once the change settles"""
+        reloads = app_module.reload_stats['reloads']
+        with mock.patch.object(app_module, 'watcher', None):
+            app_module.start_model_watcher(interval=0.05)
+            time.sleep(0.1)
+            stat = os.stat(config.MODEL_PATH)
+            os.utime(config.MODEL_PATH, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+            deadline = time.time() + 5
+            while app_module.reload_stats['reloads'] == reloads and time.time() < deadline:
+                time.sleep(0.05)
+        self.assertEqual(app_module.reload_stats['reloads'], reloads + 1)
+
 if __name__ == '__main__':
     unittest.main()
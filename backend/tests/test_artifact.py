@@ -0,0 +1,108 @@
+"""
+Tests for the memory-mapped forest artifact
+"""
+
+import unittest
+import sys
+import os
+import mmap
+import tempfile
+
+import numpy as np
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact import ArtifactError, load_forest, memory_report, save_forest
+from inference import CompiledForest
+
+
+class TestArtifact(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        iris = load_iris()
+        scaler = StandardScaler().fit(iris.data)
+        model = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0)
+        model.fit(scaler.transform(iris.data), iris.target)
+        cls.forest = CompiledForest.from_sklearn(model).fold_scaler(scaler)
+        rng = np.random.default_rng(0)
+        cls.X = np.vstack([iris.data, rng.normal(iris.data.mean(axis=0), 1.5, size=(2000, 4))])
+
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.path = save_forest(cls.forest, os.path.join(cls.tmpdir.name, 'forest.bin'))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def test_round_trip_is_exact(self):
+        """Mapped forest has identical arrays and predictions"""
+        loaded = load_forest(self.path)
+        for name in ('feature', 'threshold', 'children_left', 'children_right', 'value', 'roots', 'classes_'):
+            np.testing.assert_array_equal(getattr(loaded, name), getattr(self.forest, name))
+        np.testing.assert_array_equal(loaded.predict_proba(self.X), self.forest.predict_proba(self.X))
+
+    def test_arrays_are_read_only_views(self):
+        """Node arrays view the mapping rather than private copies"""
+        loaded = load_forest(self.path)
+        self.assertFalse(loaded.threshold.flags.writeable)
+        base = loaded.threshold
+        while isinstance(base, np.ndarray):
+            base = base.base
+        if isinstance(base, memoryview):
+            base = base.obj
+        self.assertIsInstance(base, mmap.mmap)
+
+    def test_rejects_bad_files(self):
+        """Wrong magic and truncated files fail at load"""
+        bad = os.path.join(self.tmpdir.name, 'bad.bin')
+        with open(bad, 'wb') as f:
+            f.write(b'NOTAFRST' + bytes(64))
+        with self.assertRaises(ArtifactError):
+            load_forest(bad)
+
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        with open(bad, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        with self.assertRaises(ArtifactError):
+            load_forest(bad)
+
+    def test_overwrite_keeps_live_mappings_valid(self):
+        """Re-exporting over a mapped artifact replaces the file instead of truncating it"""
+        path = os.path.join(self.tmpdir.name, 'live.bin')
+        save_forest(self.forest, path)
+        loaded = load_forest(path)
+        expected = loaded.predict_proba(self.X)
+        inode = os.stat(path).st_ino
+
+        # A smaller forest: written in place, it would cut the old mapping short
+        iris = load_iris()
+        small = RandomForestClassifier(n_estimators=2, max_depth=2, random_state=0).fit(iris.data, iris.target)
+        save_forest(CompiledForest.from_sklearn(small), path)
+        # Scoring a truncated mapping raises SIGBUS, so do it in a child process
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if np.array_equal(loaded.predict_proba(self.X), expected) else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(status, 0)
+        self.assertNotEqual(os.stat(path).st_ino, inode)
+        self.assertEqual([name for name in os.listdir(self.tmpdir.name) if name.endswith('.tmp')], [])
+
+    def test_memory_report_counts_mapping(self):
+        """Mapped artifact pages show up as resident after use"""
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            self.skipTest('smaps_rollup not available')
+        loaded = load_forest(self.path)
+        loaded.predict_proba(self.X)
+        report = memory_report(self.path)
+        self.assertGreater(report['rss_kb'], 0)
+        self.assertGreater(report['artifact']['rss_kb'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
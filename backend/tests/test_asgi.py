@@ -0,0 +1,165 @@
+"""
+Unit tests for the ASGI variant
+"""
+
+import unittest
+import asyncio
+import json
+import sys
+import os
+from unittest import mock
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from app import app as flask_app
+from asgi import InferenceApp
+from predlog import RateLimitedLog
+
+
+async def call(asgi_app, method, path, body=b'', headers=()):
+    """Drive one HTTP request through the ASGI app; returns (status, headers, body)"""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi_app({'type': 'http', 'method': method, 'path': path, 'headers': list(headers)}, receive, send)
+    headers = dict(sent[0]['headers'])
+    return sent[0]['status'], headers, b''.join(m.get('body', b'') for m in sent[1:])
+
+
+class TestInferenceApp(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.asgi_app = InferenceApp(workers=2)
+        cls.asgi_app.startup()
+        cls.flask_client = flask_app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.asgi_app.shutdown()
+
+    def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b''
+        return asyncio.run(call(self.asgi_app, method, path, body))
+
+    def test_health_on_event_loop(self):
+        """Health is served without touching the executor"""
+        status, headers, body = self.request('GET', '/health')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['status'], 'healthy')
+        self.assertEqual(headers[b'access-control-allow-origin'], b'*')
+
+    def test_predict_matches_flask(self):
+        """Prediction bodies match the Flask app apart from the timestamp"""
+        payload = {'features': [6.3, 3.3, 6.0, 2.5]}
+        status, _, body = self.request('POST', '/api/predict', payload)
+        self.assertEqual(status, 200)
+        expected = json.loads(self.flask_client.post('/api/predict', json=payload).data)
+        actual = json.loads(body)
+        for data in (expected, actual):
+            data.pop('timestamp')
+        self.assertEqual(actual, expected)
+
+    def test_binary_predict(self):
+        """Packed float rows are scored and answered as packed probabilities"""
+        rows = np.array([[5.1, 3.5, 1.4, 0.2], [6.3, 3.3, 6.0, 2.5]], dtype='<f4')
+        status, headers, body = asyncio.run(call(
+            self.asgi_app, 'POST', '/api/predict/batch', rows.tobytes(),
+            [(b'content-type', b'application/octet-stream')]
+        ))
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'application/octet-stream; dtype=float32')
+        probabilities = np.frombuffer(body, dtype='<f4').reshape(2, 3)
+        expected = json.loads(self.flask_client.post('/api/predict/batch',
+                                                     json={'features': rows.astype(float).tolist()}).data)
+        self.assertEqual(probabilities.argmax(axis=1).tolist(), [r['prediction'] for r in expected['predictions']])
+
+    def test_expired_deadline(self):
+        """A request already past its client deadline is shed with 503"""
+        status, headers, _ = asyncio.run(call(
+            self.asgi_app, 'POST', '/api/predict', json.dumps({'features': [5.1, 3.5, 1.4, 0.2]}).encode(),
+            [(b'content-type', b'application/json'), (b'x-request-timeout-ms', b'0.001')]
+        ))
+        self.assertIn(status, (503, 504))
+        self.assertEqual(headers.get(b'retry-after'), b'1' if status == 503 else None)
+
+    def test_errors(self):
+        """Invalid input, unknown paths and a full queue are rejected"""
+        self.assertEqual(self.request('POST', '/api/predict', {'features': [1, 2]})[0], 400)
+        self.assertEqual(self.request('GET', '/nonexistent')[0], 404)
+        self.assertEqual(asyncio.run(call(self.asgi_app, 'POST', '/api/predict', b'{not json'))[0], 400)
+
+        full = InferenceApp(max_pending=0)
+        status, headers, _ = asyncio.run(call(full, 'POST', '/api/predict', b'{}'))
+        self.assertEqual(status, 503)
+        self.assertIn(b'retry-after', headers)
+
+    def test_admission_reaches_max_pending(self):
+        """Concurrent batches queue on the executor up to max_pending instead of being shed"""
+        asgi_app = InferenceApp(workers=2, max_pending=200)
+        asgi_app.startup()
+        self.addCleanup(asgi_app.shutdown)
+        body = json.dumps({'features': [[5.1, 3.5, 1.4, 0.2]] * 100}).encode()
+
+        async def burst():
+            return await asyncio.gather(*[
+                call(asgi_app, 'POST', '/api/predict/batch', body, [(b'content-type', b'application/json')])
+                for _ in range(100)
+            ])
+
+        statuses = [status for status, _, _ in asyncio.run(burst())]
+        self.assertEqual(statuses, [200] * 100)
+
+    def test_batch_latency_leaves_predict_limit(self):
+        """Slow batches shrink only the batch route's limit"""
+        asgi_app = InferenceApp(workers=2, max_pending=100)
+        batch = asgi_app.limiters['/api/predict/batch']
+        batch.try_acquire()
+        batch.release(60.0)
+        _, _, body = asyncio.run(call(asgi_app, 'GET', '/api/metrics'))
+        admission = json.loads(body)['admission']
+        self.assertEqual(admission['batch']['limit'], 90)
+        self.assertEqual(admission['predict']['limit'], 100)
+
+    def test_not_found_log_is_capped(self):
+        """404s share the Flask app's per-interval cap instead of logging one line each"""
+        capped = RateLimitedLog(app_module.logger, limit=2, interval=60.0)
+        with mock.patch.object(app_module, 'not_found_log', capped), \
+                self.assertLogs(app_module.logger, 'WARNING') as captured:
+            for _ in range(5):
+                self.assertEqual(self.request('GET', '/wp-login.php')[0], 404)
+        self.assertEqual(len(captured.records), 2)
+        self.assertEqual(captured.records[0].getMessage(), '404 error: /wp-login.php')
+
+    def test_process_executor_metrics(self):
+        """Inference time and classes recorded in executor children reach the parent's metrics"""
+        asgi_app = InferenceApp(workers=1, executor_kind='process')
+        asgi_app.startup()
+        self.addCleanup(asgi_app.shutdown)
+
+        def metrics():
+            return json.loads(asyncio.run(call(asgi_app, 'GET', '/api/metrics'))[2])
+
+        before = metrics()
+        body = json.dumps({'features': [6.3, 3.3, 6.0, 2.5]}).encode()
+        for _ in range(5):
+            status, _, _ = asyncio.run(call(asgi_app, 'POST', '/api/predict', body,
+                                            [(b'content-type', b'application/json')]))
+            self.assertEqual(status, 200)
+        after = metrics()
+        self.assertEqual(after['inference_time']['count'] - before['inference_time']['count'], 5)
+        self.assertEqual(after['predictions_by_class']['Virginica'] - before['predictions_by_class']['Virginica'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Tests for the prediction audit log
+"""
+
+import unittest
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+import audit
+from audit import AuditLog, RECORD_DTYPE, iter_records, iter_segments
+
+
+def temporary_audit_log(test, **kwargs):
+    """AuditLog in a temporary directory, unregistered from the exit-time close on cleanup"""
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory)
+    audit_log = AuditLog(directory, **kwargs)
+    test.addCleanup(audit._instances.remove, audit_log)
+    return directory, audit_log
+
+
+class TestAuditLog(unittest.TestCase):
+
+    def wait_for_compression(self, audit_log, n_segments):
+        deadline = time.monotonic() + 5
+        while audit_log.stats()['compressed'] < n_segments and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_round_trip(self):
+        """Records come back with their features, outputs, latency and model version"""
+        directory, audit_log = temporary_audit_log(self, compress=False)
+        audit_log.record([[5.1, 3.5, 1.4, 0.2]], 0, [0.9, 0.1, 0.0], 0.00025, 'abc')
+        audit_log.record(np.array([[6.0, 3.0, 4.5, 1.5], [7.0, 3.0, 6.0, 2.0]]), np.array([1, 2]), None, 0.001, 'abc')
+        audit_log.flush()
+
+        records = list(iter_records(directory))
+        self.assertEqual([r['prediction'] for r in records], [0, 1, 2])
+        self.assertEqual(records[0]['features'], [5.1, 3.5, 1.4, 0.2])
+        np.testing.assert_allclose(records[0]['probabilities'], [0.9, 0.1, 0.0], rtol=1e-6)
+        self.assertTrue(np.isnan(records[1]['probabilities']).all())
+        self.assertEqual(records[0]['latency_us'], 250)
+        self.assertEqual({r['model_version'] for r in records}, {'abc'})
+        self.assertEqual(audit_log.stats()['records'], 3)
+
+    def test_rotation_and_compression(self):
+        """Segments close at the size limit or on a new model version and get gzipped"""
+        directory, audit_log = temporary_audit_log(self, max_bytes=RECORD_DTYPE.itemsize * 2)
+        for i in range(5):
+            audit_log.record([[float(i), 0, 0, 0]], i % 3, [1, 0, 0], 0.001, 'v1')
+        audit_log.record([[5.0, 0, 0, 0]], 0, [1, 0, 0], 0.001, 'v2')
+        audit_log.close()
+        self.wait_for_compression(audit_log, 4)
+
+        segments = list(iter_segments(directory))
+        self.assertEqual(len(segments), 4)
+        self.assertTrue(all(path.endswith('.seg.gz') for path, _, _ in segments))
+        self.assertEqual([header['model_version'] for _, header, _ in segments], ['v1', 'v1', 'v1', 'v2'])
+        records = list(iter_records(directory))
+        self.assertEqual([r['features'][0] for r in records], [0.0, 1.0, 2.0, 3.0, 4.0, 5.0])
+
+    def test_time_filter(self):
+        directory, audit_log = temporary_audit_log(self, compress=False)
+        audit_log.record([[1.0, 0, 0, 0]], 0, None, 0.001, 'v1')
+        audit_log.flush()
+        cutoff = time.time()
+        self.assertEqual(len(list(iter_records(directory, since=cutoff))), 0)
+        self.assertEqual(len(list(iter_records(directory, until=cutoff))), 1)
+
+    def test_full_queue_drops(self):
+        """A full queue drops the entry instead of blocking the caller"""
+        directory, audit_log = temporary_audit_log(self, compress=False)
+        audit_log.record([[1.0, 0, 0, 0]], 0, None, 0.001, 'v1')
+        # The writer keeps waiting on the old queue, so this one stays full
+        audit_log._queue = queue.Queue(1)
+        audit_log._queue.put_nowait(None)
+        started = time.perf_counter()
+        audit_log.record([[1.0, 0, 0, 0]], 0, None, 0.001, 'v1')
+        self.assertLess(time.perf_counter() - started, 0.01)
+        self.assertEqual(audit_log.stats()['dropped'], 1)
+
+    def test_forked_worker_writes_own_segments(self):
+        """A forked child starts its own writer and segment files"""
+        directory, audit_log = temporary_audit_log(self, compress=False)
+        pid = os.fork()
+        if pid == 0:
+            audit_log.record([[1.0, 2.0, 3.0, 4.0]], 1, None, 0.001, 'v1')
+            audit_log.close()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        headers = [header for _, header, _ in iter_segments(directory)]
+        self.assertEqual([header['pid'] for header in headers], [pid])
+
+    def test_orphaned_segments_compressed_at_start(self):
+        """Segments left open by a process that died are gzipped by the next one to start"""
+        directory, audit_log = temporary_audit_log(self)
+        pid = os.fork()
+        if pid == 0:
+            # Killed before closing its segment
+            audit_log.record([[1.0, 2.0, 3.0, 4.0]], 1, None, 0.001, 'v1')
+            audit_log.flush()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(audit.orphaned_segments(directory), [path for path, _, _ in iter_segments(directory)])
+
+        audit_log.record([[5.0, 6.0, 7.0, 8.0]], 2, None, 0.001, 'v1')
+        audit_log.close()
+        self.assertEqual(audit.orphaned_segments(directory), [])
+        self.assertTrue(all(path.endswith('.seg.gz') for path, _, _ in iter_segments(directory)))
+        self.assertEqual(sorted(r['prediction'] for r in iter_records(directory)), [1, 2])
+
+
+class TestAuditRoutes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        app_module.load_or_train_model()
+
+    def test_predictions_are_audited(self):
+        """Single and batch predictions land in the audit log under the model's version"""
+        directory, audit_log = temporary_audit_log(self, compress=False)
+        client = app_module.app.test_client()
+        with mock.patch.object(app_module, 'audit_log', audit_log):
+            client.post('/api/predict', json={'features': [5.1, 3.5, 1.4, 0.2]})
+            client.post('/api/predict/batch', json={'features': [[6.0, 3.0, 4.5, 1.5], [7.0, 3.0, 6.0, 2.0]]})
+            client.post('/api/predict', json={'features': [5.1, 3.5, 1.4, 0.2], 'mode': 'class_only'})
+            audit_log.flush()
+            self.assertIn('audit', app_module.metrics_payload())
+
+        records = list(iter_records(directory))
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[0]['prediction'], 0)
+        self.assertEqual({r['model_version'] for r in records}, {app_module.bundle.metadata['version']})
+
+
+if __name__ == '__main__':
+    unittest.main()
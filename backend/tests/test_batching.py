@@ -0,0 +1,106 @@
+"""
+Unit tests for the prediction micro-batcher
+"""
+
+import unittest
+import sys
+import os
+import threading
+import time
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batching import MicroBatcher, _PendingPrediction
+from deadlines import DeadlineExceeded
+
+
+def fake_predict(features):
+    """Class is the row's first feature, probabilities echo the row"""
+    return features[:, 0].astype(int), features[:, :3]
+
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def submit_concurrently(self, batcher, rows):
+        results = [None] * len(rows)
+        start = threading.Barrier(len(rows))
+
+        def worker(i):
+            start.wait()
+            results[i] = batcher.submit(rows[i])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(rows))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_results_fan_back_to_callers(self):
+        """Every caller gets the result for its own row"""
+        batcher = MicroBatcher(fake_predict, max_batch_size=8, max_wait_us=20000)
+        rows = [np.array([i, i + 0.1, i + 0.2, i + 0.3]) for i in range(20)]
+        results = self.submit_concurrently(batcher, rows)
+
+        for row, (prediction, probabilities) in zip(rows, results):
+            self.assertEqual(prediction, int(row[0]))
+            np.testing.assert_array_equal(probabilities, row[:3])
+
+    def test_concurrent_rows_share_batches(self):
+        """Concurrent submissions are coalesced and reported in stats"""
+        batcher = MicroBatcher(fake_predict, max_batch_size=8, max_wait_us=50000)
+        self.submit_concurrently(batcher, [np.zeros(4)] * 16)
+
+        stats = batcher.stats()
+        self.assertEqual(stats['rows'], 16)
+        self.assertLess(stats['batches'], 16)
+        self.assertLessEqual(max(int(k[2:]) for k in stats['batch_size_histogram']), 8)
+        self.assertIn('p99', stats['queue_delay_us'])
+
+    def test_errors_propagate(self):
+        """A failing batch call raises in the submitting thread"""
+        def broken(features):
+            raise ValueError('boom')
+
+        batcher = MicroBatcher(broken, max_wait_us=0)
+        with self.assertRaises(ValueError):
+            batcher.submit(np.zeros(4))
+
+    def test_expired_rows_are_dropped(self):
+        """Rows already past their deadline are failed with 503 and never scored"""
+        scored = []
+
+        def record(features):
+            scored.append(len(features))
+            return fake_predict(features)
+
+        batcher = MicroBatcher(record, max_wait_us=0)
+        with self.assertRaises(DeadlineExceeded) as raised:
+            batcher.submit(np.zeros(4), deadline=time.monotonic() - 1)
+        self.assertEqual(raised.exception.status, 503)
+        batcher.submit(np.zeros(4), deadline=time.monotonic() + 10)
+        self.assertEqual(scored, [1])
+
+        live = batcher._drop_expired([
+            _PendingPrediction(np.zeros(4), deadline=time.monotonic() - 1),
+            _PendingPrediction(np.zeros(4), deadline=time.monotonic() + 10),
+        ])
+        self.assertEqual(len(live), 1)
+
+    def test_caller_stops_waiting_at_deadline(self):
+        """A slow batch answers 504 to callers whose deadline passes meanwhile"""
+        def slow(features):
+            time.sleep(0.2)
+            return fake_predict(features)
+
+        batcher = MicroBatcher(slow, max_wait_us=0)
+        with self.assertRaises(DeadlineExceeded) as raised:
+            batcher.submit(np.zeros(4), deadline=time.monotonic() + 0.05)
+        self.assertEqual(raised.exception.status, 504)
+
+
+if __name__ == '__main__':
+    unittest.main()
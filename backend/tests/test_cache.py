@@ -0,0 +1,89 @@
+"""
+Unit tests for the prediction cache
+"""
+
+import unittest
+import json
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from cache import PredictionCache
+
+
+class TestPredictionCache(unittest.TestCase):
+
+    def test_canonicalize_rounds_to_precision(self):
+        """Rows equal at the configured precision share a key"""
+        cache = PredictionCache(precision=1)
+        key_a, row_a = cache.canonicalize([5.14, 3.5, 1.4, -0.01])
+        key_b, row_b = cache.canonicalize([5.1, 3.46, 1.4, 0.0])
+        self.assertEqual(key_a, key_b)
+        np.testing.assert_array_equal(row_a, [5.1, 3.5, 1.4, 0.0])
+
+    def test_lru_eviction(self):
+        """Least recently used entries are evicted past max_entries"""
+        cache = PredictionCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_ttl_expiry(self):
+        """Entries older than the TTL are misses"""
+        cache = PredictionCache(ttl_seconds=0.01)
+        cache.put('a', 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_invalidate_rejects_stale_puts(self):
+        """Values computed against an older model are not stored"""
+        cache = PredictionCache()
+        generation = cache.generation
+        cache.invalidate()
+        cache.put('a', 1, generation)
+        self.assertIsNone(cache.get('a'))
+
+
+class TestPredictionCacheEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app_module.app.test_client()
+        self.previous = app_module.prediction_cache
+        app_module.prediction_cache = PredictionCache(precision=1)
+        app_module.load_or_train_model()
+
+    def tearDown(self):
+        app_module.prediction_cache = self.previous
+
+    def test_repeated_predictions_hit_cache(self):
+        """Repeated rows are served from cache and reported in metrics"""
+        for features in ([5.1, 3.5, 1.4, 0.2], [5.12, 3.5, 1.4, 0.2]):
+            response = self.client.post('/api/predict', data=json.dumps({'features': features}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+
+        stats = json.loads(self.client.get('/api/metrics').data)['prediction_cache']
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_reload_invalidates_cache(self):
+        """Reloading the model empties the cache"""
+        self.client.post('/api/predict', data=json.dumps({'features': [5.1, 3.5, 1.4, 0.2]}),
+                         content_type='application/json')
+        app_module.load_or_train_model()
+        self.assertEqual(app_module.prediction_cache.stats()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
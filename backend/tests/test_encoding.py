@@ -0,0 +1,127 @@
+"""
+Tests for the binary and msgpack prediction encodings
+"""
+
+import unittest
+import json
+import sys
+import os
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, load_or_train_model
+from encoding import PredictionEncoder, decode_rows, encode_json, encode_rows, msgpack
+
+ROWS = [[5.1, 3.5, 1.4, 0.2], [6.3, 3.3, 6.0, 2.5], [5.9, 3.0, 4.2, 1.5]]
+
+
+class TestEncoding(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        load_or_train_model()
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.expected = json.loads(self.client.post('/api/predict/batch', json={'features': ROWS}).data)
+
+    def test_decode_rows(self):
+        """Packed bodies decode to (N, 4) views and reject partial rows"""
+        body = encode_rows(ROWS, np.dtype('<f8'))
+        np.testing.assert_array_equal(decode_rows(body, np.dtype('<f8')), ROWS)
+        with self.assertRaises(ValueError):
+            decode_rows(body[:-1], np.dtype('<f8'))
+        with self.assertRaises(ValueError):
+            decode_rows(b'', np.dtype('<f4'))
+
+    def test_binary_single_row(self):
+        """One packed row returns its packed probabilities in the request dtype"""
+        for dtype, name in ((np.dtype('<f4'), 'float32'), (np.dtype('<f8'), 'float64')):
+            # float32 transport rounds the inputs, so compare against the same rounded values
+            row = np.array(ROWS[1], dtype=dtype)
+            expected = json.loads(self.client.post('/api/predict', json={'features': row.tolist()}).data)
+            response = self.client.post(
+                '/api/predict',
+                data=row.tobytes(),
+                content_type=f'application/octet-stream; dtype={name}'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content_type, f'application/octet-stream; dtype={name}')
+            probabilities = np.frombuffer(response.data, dtype=dtype)
+            np.testing.assert_allclose(probabilities, list(expected['probabilities'].values()), rtol=1e-6)
+
+    def test_binary_batch(self):
+        """A packed matrix is scored in one pass"""
+        response = self.client.post(
+            '/api/predict/batch',
+            data=np.array(ROWS, dtype='<f8').tobytes(),
+            content_type='application/octet-stream; dtype=float64'
+        )
+        self.assertEqual(response.status_code, 200)
+        probabilities = np.frombuffer(response.data, dtype='<f8').reshape(-1, 3)
+        expected = [list(r['probabilities'].values()) for r in self.expected['predictions']]
+        np.testing.assert_array_equal(probabilities, expected)
+
+    def test_binary_errors(self):
+        """Partial rows, extra rows and unknown dtypes are rejected"""
+        body = np.array(ROWS, dtype='<f4').tobytes()
+        self.assertEqual(self.client.post('/api/predict', data=body[:-2],
+                                          content_type='application/octet-stream').status_code, 400)
+        self.assertEqual(self.client.post('/api/predict', data=body,
+                                          content_type='application/octet-stream').status_code, 400)
+        self.assertEqual(self.client.post('/api/predict/batch', data=body,
+                                          content_type='application/octet-stream; dtype=int8').status_code, 400)
+
+    def test_templates_match_jsonify(self):
+        """Precompiled full responses are byte-identical to jsonify of the payload"""
+        classes = ['Setosa', 'Versicolor', 'Virginica']
+        encoder = PredictionEncoder(classes)
+        rng = np.random.default_rng(0)
+        vectors = rng.dirichlet(np.ones(3), size=500).tolist() + [[1.0, 0.0, 0.0], [1e-05, 0.3, 0.69999], [0.1, 0.2, 0.7]]
+        timestamp = '2026-01-01T00:00:00.123456'
+        with app.app_context():
+            for probability in vectors:
+                prediction = int(np.argmax(probability))
+                confidence = max(probability)
+                payload = {
+                    'prediction': prediction,
+                    'class': classes[prediction],
+                    'confidence': confidence,
+                    'probabilities': {classes[i]: probability[i] for i in range(3)},
+                    'timestamp': timestamp
+                }
+                expected = app.json.response(payload).get_data()
+                self.assertEqual(encoder.full(prediction, probability, confidence, timestamp), expected)
+                self.assertEqual(encode_json(payload), expected)
+                self.assertEqual(json.loads(encoder.compact(prediction, probability)),
+                                 {'prediction': prediction, 'probabilities': probability})
+
+    def test_compact_mode(self):
+        """Compact answers carry only the prediction and probability list"""
+        for path, features in (('/api/predict', ROWS[1]), ('/api/predict/batch', ROWS)):
+            data = json.loads(self.client.post(path, json={'features': features, 'mode': 'compact'}).data)
+            self.assertNotIn('timestamp', data)
+        data = json.loads(self.client.post('/api/predict', json={'features': ROWS[1], 'mode': 'compact'}).data)
+        expected = self.expected['predictions'][1]
+        self.assertEqual(data, {'prediction': expected['prediction'],
+                                'probabilities': list(expected['probabilities'].values())})
+
+    @unittest.skipIf(msgpack is None, 'msgpack not installed')
+    def test_msgpack(self):
+        """msgpack documents get msgpack answers matching the JSON ones"""
+        response = self.client.post(
+            '/api/predict/batch',
+            data=msgpack.packb({'features': ROWS}),
+            content_type='application/msgpack'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = msgpack.unpackb(response.data)
+        self.assertEqual([r['class'] for r in data['predictions']],
+                         [r['class'] for r in self.expected['predictions']])
+
+
+if __name__ == '__main__':
+    unittest.main()
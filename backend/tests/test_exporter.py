@@ -0,0 +1,57 @@
+"""
+Parity tests for the standalone predictor module exporter
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exporter import export_predictor_module, load_predictor_module
+from inference import CompiledForest
+
+
+class TestExporter(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        iris = load_iris()
+        cls.scaler = StandardScaler().fit(iris.data)
+        cls.model = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0)
+        cls.model.fit(cls.scaler.transform(iris.data), iris.target)
+        rng = np.random.default_rng(0)
+        cls.X = np.vstack([iris.data, rng.normal(iris.data.mean(axis=0), 1.5, size=(2000, 4))])
+
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        path = export_predictor_module(cls.model, cls.scaler, os.path.join(cls.tmpdir.name, 'predictor.py'))
+        cls.module = load_predictor_module(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def test_module_matches_sklearn(self):
+        """Generated module reproduces scaler + sklearn on raw input"""
+        X_scaled = self.scaler.transform(self.X)
+        np.testing.assert_allclose(self.module.predict_proba(self.X), self.model.predict_proba(X_scaled),
+                                   rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(self.module.predict(self.X), self.model.predict(X_scaled))
+
+    def test_module_round_trips_into_engine(self):
+        """Engine built from the module is identical to one built from sklearn"""
+        direct = CompiledForest.from_sklearn(self.model).fold_scaler(self.scaler)
+        loaded = CompiledForest.from_module(self.module)
+        np.testing.assert_array_equal(loaded.threshold, direct.threshold)
+        np.testing.assert_array_equal(loaded.predict_proba(self.X), direct.predict_proba(self.X))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Parity tests for the compiled inference engines
+"""
+
+import unittest
+import sys
+import os
+
+import numpy as np
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference import CompiledForest, LookupTable, QuantizedForest, probe_inputs, precision_report
+
+
+def sample_inputs(model, n_random=2000, seed=0):
+    """Random rows plus rows sitting exactly on split thresholds"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0.0, 1.5, size=(n_random, 4))
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        for feature, threshold in zip(tree.feature, tree.threshold):
+            if feature >= 0:
+                row = rng.normal(0.0, 1.5, size=4)
+                row[feature] = threshold
+                X = np.vstack([X, row])
+    return X
+
+
+class TestCompiledForest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Train a deep forest on the real iris data"""
+        iris = load_iris()
+        cls.scaler = StandardScaler().fit(iris.data)
+        cls.model = RandomForestClassifier(n_estimators=25, max_depth=10, random_state=0)
+        cls.model.fit(cls.scaler.transform(iris.data), iris.target)
+        cls.X = sample_inputs(cls.model)
+
+    def test_predict_proba_parity(self):
+        """Compiled probabilities match sklearn"""
+        engine = CompiledForest.from_sklearn(self.model)
+        np.testing.assert_allclose(
+            engine.predict_proba(self.X), self.model.predict_proba(self.X), rtol=0, atol=1e-12
+        )
+
+    def test_score_parity(self):
+        """One traversal yields sklearn's classes and probabilities"""
+        engine = CompiledForest.from_sklearn(self.model)
+        predictions, probabilities = engine.score(self.X)
+        np.testing.assert_array_equal(predictions, self.model.predict(self.X))
+        self.assertEqual(probabilities.shape, (len(self.X), 3))
+
+    def test_apply_parity(self):
+        """Leaves reached match sklearn's apply"""
+        engine = CompiledForest.from_sklearn(self.model)
+        leaves = engine.apply(self.X) - engine.roots
+        np.testing.assert_array_equal(leaves, self.model.apply(self.X))
+
+    def test_fold_scaler_parity(self):
+        """Folded forest on raw input matches scaler + sklearn exactly"""
+        engine = CompiledForest.from_sklearn(self.model).fold_scaler(self.scaler)
+        rng = np.random.default_rng(1)
+        X_raw = self.scaler.inverse_transform(self.X)
+        # Probe each raw split point and its neighbouring doubles
+        is_split = engine.children_left != np.arange(engine.n_nodes)
+        for feature, threshold in zip(engine.feature[is_split], engine.threshold[is_split]):
+            for value in (np.nextafter(threshold, -np.inf), threshold, np.nextafter(threshold, np.inf)):
+                row = self.scaler.inverse_transform(rng.normal(0.0, 1.5, size=(1, 4)))[0]
+                row[feature] = value
+                X_raw = np.vstack([X_raw, row])
+
+        X_scaled = self.scaler.transform(X_raw)
+        np.testing.assert_array_equal(engine.apply(X_raw), self.model.apply(X_scaled) + engine.roots)
+        expected = self.model.predict_proba(X_scaled)
+        np.testing.assert_allclose(engine.predict_proba(X_raw), expected, rtol=0, atol=1e-12)
+
+    def test_lookup_table_parity(self):
+        """Lookup table reproduces the forest bit for bit, on and off split points"""
+        forest = CompiledForest.from_sklearn(self.model).fold_scaler(self.scaler)
+        lookup = LookupTable.from_forest(forest)
+        X_raw = self.scaler.inverse_transform(self.X)
+        for f, cuts in enumerate(lookup.cuts):
+            X_raw[:len(cuts), f] = cuts
+
+        np.testing.assert_array_equal(lookup.predict_proba(X_raw), forest.predict_proba(X_raw))
+        np.testing.assert_array_equal(lookup.score(X_raw)[0], forest.score(X_raw)[0])
+
+    def test_lookup_table_budget(self):
+        """Tables over the memory budget are refused"""
+        forest = CompiledForest.from_sklearn(self.model)
+        with self.assertRaises(MemoryError):
+            LookupTable.from_forest(forest, max_bytes=1024)
+
+    def test_int16_splits_are_exact(self):
+        """16-bit threshold ranks reach the same leaves on every split probe"""
+        forest = CompiledForest.from_sklearn(self.model).fold_scaler(self.scaler)
+        compact = QuantizedForest(forest, 'int16', leaf_bits=8)
+        X = probe_inputs(forest)
+        np.testing.assert_array_equal(compact.apply(X), forest.apply(X))
+
+        report = precision_report(forest, compact, X)
+        self.assertLessEqual(report['max_abs_probability_deviation'], 0.5 / 255)
+        self.assertLess(report['candidate_bytes'], report['reference_bytes'])
+
+    def test_float32_report(self):
+        """float32 copy is smaller and its deviation is reported"""
+        forest = CompiledForest.from_sklearn(self.model).fold_scaler(self.scaler)
+        compact = QuantizedForest(forest, 'float32')
+        report = precision_report(forest, compact, probe_inputs(forest))
+        self.assertEqual(compact.threshold.dtype, np.float32)
+        self.assertLess(report['candidate_bytes'], report['reference_bytes'])
+        self.assertGreaterEqual(report['class_flip_rate'], 0.0)
+
+    def test_early_exit_class_parity(self):
+        """Early-exit classes match full evaluation, with fewer trees walked"""
+        forest = CompiledForest.from_sklearn(self.model)
+        expected = self.model.predict(self.X)
+
+        predictions, trees_evaluated = forest.predict_class(self.X, block_size=4)
+        np.testing.assert_array_equal(predictions, expected)
+        self.assertLess(trees_evaluated.mean(), forest.n_estimators)
+
+        for i in range(0, len(self.X), 97):
+            prediction, trees = forest.predict_class(self.X[i:i + 1])
+            self.assertEqual(prediction[0], expected[i])
+            self.assertLessEqual(trees[0], forest.n_estimators)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tests for the non-blocking logging pipeline
+"""
+
+import unittest
+import logging
+import os
+import queue
+import sys
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+import logpipe
+from logpipe import BoundedQueueHandler, LogPipeline
+
+
+class TestBoundedQueueHandler(unittest.TestCase):
+
+    def test_drop_policy_counts(self):
+        """A full queue drops records without blocking and counts them"""
+        handler = BoundedQueueHandler(queue.Queue(2), policy='drop')
+        logger = logging.getLogger('test_logpipe.drop')
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            for i in range(5):
+                logger.warning('record %d', i)
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual(handler.dropped, 3)
+        self.assertEqual(handler.queue.get_nowait().msg, 'record 0')
+
+    def test_block_policy_waits_then_drops(self):
+        """The block policy waits up to its timeout before giving up"""
+        handler = BoundedQueueHandler(queue.Queue(1), policy='block', block_timeout=0.01)
+        record = logging.LogRecord('x', logging.INFO, __file__, 1, 'msg', None, None)
+        handler.handle(record)
+        handler.handle(record)
+        self.assertEqual(handler.dropped, 1)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            BoundedQueueHandler(queue.Queue(1), policy='spill')
+
+
+class TestLogPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.root_handlers = list(logging.getLogger().handlers)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'app.log')
+        file_handler = logging.FileHandler(self.path)
+        file_handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        self.pipeline = LogPipeline([file_handler], logging.INFO, queue_size=100)
+
+    def tearDown(self):
+        # Put the app's own pipeline back
+        self.pipeline.stop()
+        app_module.log_pipeline = logpipe.configure_logging(app_module.config)
+
+    def read_log(self):
+        with open(self.path) as f:
+            return f.read()
+
+    def test_records_written_by_listener(self):
+        """Records reach the file once the queue is flushed, with exceptions rendered"""
+        logger = logging.getLogger('test_logpipe.pipeline')
+        logger.info('hello %s', 'world')
+        logger.debug('below level')
+        try:
+            raise RuntimeError('boom')
+        except RuntimeError:
+            logger.exception('failed')
+        self.pipeline.stop()
+
+        text = self.read_log()
+        self.assertIn('INFO hello world', text)
+        self.assertNotIn('below level', text)
+        self.assertIn('RuntimeError: boom', text)
+        self.assertEqual(self.pipeline.stats()['dropped'], 0)
+
+    def test_forked_child_gets_its_own_listener(self):
+        """After fork the child restarts the listener and its records are written"""
+        pid = os.fork()
+        if pid == 0:
+            logging.getLogger('test_logpipe.child').warning('from child')
+            logpipe.shutdown()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertIn('WARNING from child', self.read_log())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+Tests for per-thread request and inference metrics
+"""
+
+import unittest
+import json
+import sys
+import os
+import threading
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from metrics import RequestMetrics, SharedTotals
+
+CLASSES = ['Setosa', 'Versicolor', 'Virginica']
+
+
+class TestRequestMetrics(unittest.TestCase):
+
+    def test_threads_merge_and_retire(self):
+        """Counts from many threads add up, and survive their threads exiting"""
+        metrics = RequestMetrics(CLASSES)
+
+        def work():
+            for _ in range(100):
+                metrics.request_started()
+                metrics.inference(0.0004, 8)
+                metrics.predictions([0, 2])
+                metrics.request_finished('/api/predict', 200, 0.002)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(len(metrics._shards), 0)
+        self.assertEqual(snapshot['in_flight'], 0)
+        self.assertEqual(snapshot['requests'], {'/api/predict': {'200': 800}})
+        self.assertEqual(snapshot['predictions_by_class'], {'Setosa': 800, 'Versicolor': 0, 'Virginica': 800})
+        self.assertEqual(snapshot['batch_size']['count'], 800)
+        self.assertEqual(snapshot['batch_size']['mean_rows'], 8)
+        self.assertEqual(snapshot['inference_time']['p50_ms'], 0.5)
+        self.assertEqual(snapshot['handler_time']['/api/predict']['p99_ms'], 2.5)
+
+        # Retired counts stay in later snapshots
+        self.assertEqual(metrics.snapshot()['requests'], snapshot['requests'])
+
+    def test_in_flight(self):
+        metrics = RequestMetrics(CLASSES)
+        metrics.request_started()
+        metrics.request_started()
+        metrics.request_finished('/health', 200, 0.001)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['in_flight'], 1)
+        self.assertIsNone(snapshot['inference_time']['p50_ms'])
+
+    def test_forked_workers_aggregate(self):
+        """A snapshot in one worker counts every worker's published totals, exited ones too"""
+        metrics = RequestMetrics(CLASSES, shared=SharedTotals(len(CLASSES), slots=4))
+        metrics.request_started()
+        metrics.request_finished('/api/predict', 200, 0.001)
+
+        ready_r, ready_w = os.pipe()
+        done_r, done_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            for _ in range(3):
+                metrics.request_started()
+                metrics.predictions(1)
+                metrics.request_finished('/api/predict', 200, 0.001)
+            # Still running one request when it is killed
+            metrics.request_started()
+            metrics.publish()
+            os.write(ready_w, b'x')
+            os.read(done_r, 1)
+            os._exit(0)
+        os.read(ready_r, 1)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['processes'], 2)
+        self.assertEqual(snapshot['requests'], {'/api/predict': {'200': 4}})
+        self.assertEqual(snapshot['predictions_by_class']['Versicolor'], 3)
+        self.assertEqual(snapshot['in_flight'], 1)
+
+        os.write(done_w, b'x')
+        os.waitpid(pid, 0)
+        for fd in (ready_r, ready_w, done_r, done_w):
+            os.close(fd)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['processes'], 1)
+        self.assertEqual(snapshot['requests'], {'/api/predict': {'200': 4}})
+        self.assertEqual(snapshot['in_flight'], 0)
+
+
+class TestMetricsRoute(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        app_module.load_or_train_model()
+
+    def setUp(self):
+        self.client = app_module.app.test_client()
+
+    def test_metrics_reflect_traffic(self):
+        """/api/metrics counts routes, statuses, batch sizes and classes"""
+        before = json.loads(self.client.get('/api/metrics').data)
+
+        self.client.post('/api/predict', json={'features': [5.1, 3.5, 1.4, 0.2]})
+        self.client.post('/api/predict', json={'features': [5.1, 3.5]})
+        self.client.post('/api/predict/batch', json={'features': [[5.1, 3.5, 1.4, 0.2]] * 5})
+        self.client.get('/wp-login.php')
+
+        after = json.loads(self.client.get('/api/metrics').data)
+
+        def count(data, endpoint, status):
+            return data['requests'].get(endpoint, {}).get(status, 0)
+
+        self.assertEqual(count(after, '/api/predict', '200') - count(before, '/api/predict', '200'), 1)
+        self.assertEqual(count(after, '/api/predict', '400') - count(before, '/api/predict', '400'), 1)
+        self.assertEqual(count(after, '<unmatched>', '404') - count(before, '<unmatched>', '404'), 1)
+        self.assertEqual(after['predictions_by_class']['Setosa'] - before['predictions_by_class']['Setosa'], 6)
+        self.assertGreaterEqual(after['batch_size']['count'] - before['batch_size']['count'], 2)
+        self.assertIn('/api/predict/batch', after['handler_time'])
+        # The metrics request itself is the one in flight
+        self.assertEqual(after['in_flight'], 1)
+        self.assertEqual(after['model_version'], app_module.bundle.metadata['version'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+Tests for sampled and aggregated prediction logging
+"""
+
+import unittest
+import logging
+import sys
+import os
+import time
+from unittest import mock
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+import predlog
+from predlog import PredictionLog, RateLimitedLog
+
+CLASSES = ['Setosa', 'Versicolor', 'Virginica']
+
+
+class Captured(logging.Handler):
+    """Collects records; assertNoLogs needs Python 3.10"""
+
+    def __init__(self, logger):
+        super().__init__()
+        self.records = []
+        self.logger = logger
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def __enter__(self):
+        self.logger.addHandler(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.logger.removeHandler(self)
+
+
+class TestPredictionLog(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger('test_predlog')
+        self.logger.setLevel(logging.INFO)
+
+    def test_sample_rate(self):
+        """Rate 0 never samples, rate 1 always does, in between roughly the rate"""
+        self.assertFalse(any(PredictionLog(self.logger, CLASSES, sample_rate=0.0).sampled() for _ in range(1000)))
+        self.assertTrue(all(PredictionLog(self.logger, CLASSES, sample_rate=1.0).sampled() for _ in range(1000)))
+        hits = sum(PredictionLog(self.logger, CLASSES, sample_rate=0.1).sampled() for _ in range(10000))
+        self.assertTrue(700 < hits < 1300)
+
+    def test_summary_after_interval(self):
+        """Aggregates are logged once the interval has passed, then reset"""
+        log = PredictionLog(self.logger, CLASSES, sample_rate=0.0, interval=0.05, timer=False)
+        with self.assertLogs('test_predlog', 'INFO') as captured:
+            log.record(0, 0.9, 0.001)
+            log.record(np.array([2, 2]), np.array([0.5, 0.7]), 0.003)
+            time.sleep(0.06)
+            log.record(1, None, 0.002)
+        self.assertEqual(len(captured.records), 1)
+        message = captured.records[0].getMessage()
+        self.assertIn('4 predictions in 3 requests', message)
+        self.assertIn('Setosa=1, Versicolor=1, Virginica=2', message)
+        self.assertIn('mean confidence=0.7000', message)
+
+        # Nothing pending after a flush with an empty window
+        log.flush()
+        with Captured(self.logger) as captured:
+            log.flush()
+        self.assertEqual(captured.records, [])
+
+    def test_timer_logs_without_traffic(self):
+        """The summary is logged on time even if no prediction follows"""
+        log = PredictionLog(self.logger, CLASSES, sample_rate=0.0, interval=0.05)
+        self.addCleanup(predlog._instances.remove, log)
+        with Captured(self.logger) as captured:
+            log.record(0, 0.9, 0.001)
+            deadline = time.monotonic() + 2
+            while not captured.records and time.monotonic() < deadline:
+                time.sleep(0.01)
+            # An idle window logs nothing
+            time.sleep(0.15)
+        self.assertEqual(len(captured.records), 1)
+        self.assertIn('1 predictions in 1 requests', captured.records[0].getMessage())
+
+    def test_shutdown_flushes(self):
+        """Exit-time shutdown logs what the current window holds"""
+        log = PredictionLog(self.logger, CLASSES, sample_rate=0.0, interval=60.0, timer=False)
+        self.addCleanup(predlog._instances.remove, log)
+        log.record(np.array([1, 2]), None, 0.001)
+        with self.assertLogs('test_predlog', 'INFO') as captured:
+            predlog.shutdown()
+        self.assertTrue(any('2 predictions in 1 requests' in r.getMessage() for r in captured.records))
+
+
+class TestRateLimitedLog(unittest.TestCase):
+
+    def test_caps_and_reports_suppressed(self):
+        """Warnings beyond the cap are counted and reported when the next window opens"""
+        log = RateLimitedLog(logging.getLogger('test_predlog.404'), limit=2, interval=0.05)
+        with self.assertLogs('test_predlog.404', 'WARNING') as captured:
+            for i in range(5):
+                log.warning("404 error: %s", f'/scan/{i}')
+            time.sleep(0.06)
+            log.warning("404 error: %s", '/late')
+        messages = [record.getMessage() for record in captured.records]
+        self.assertEqual(messages, [
+            '404 error: /scan/0', '404 error: /scan/1',
+            'Suppressed 3 similar warnings', '404 error: /late'
+        ])
+
+
+class TestPredictionLogRoutes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        app_module.load_or_train_model()
+
+    def test_unsampled_predictions_feed_summary(self):
+        """With sampling off, /api/predict logs no per-prediction lines but is summarized"""
+        log = PredictionLog(app_module.logger, CLASSES, sample_rate=0.0, interval=3600)
+        client = app_module.app.test_client()
+        with mock.patch.object(app_module, 'prediction_log', log):
+            with Captured(app_module.logger) as captured:
+                for _ in range(3):
+                    response = client.post('/api/predict', json={'features': [5.1, 3.5, 1.4, 0.2]})
+                    self.assertEqual(response.status_code, 200)
+            self.assertEqual(captured.records, [])
+            with self.assertLogs(app_module.logger, 'INFO') as captured:
+                log.flush()
+        self.assertIn('Setosa=3', captured.records[0].getMessage())
+
+
+if __name__ == '__main__':
+    unittest.main()
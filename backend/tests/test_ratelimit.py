@@ -0,0 +1,120 @@
+"""
+Tests for the cross-worker rate limiter
+"""
+
+import unittest
+import json
+import sys
+import os
+import time
+from unittest import mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from ratelimit import SharedRateLimiter
+
+
+class TestSharedRateLimiter(unittest.TestCase):
+
+    def test_burst_then_limited(self):
+        """A full bucket allows `requests` at once, then asks the client to wait one interval"""
+        limiter = SharedRateLimiter(5, 60, slots=64)
+        for _ in range(5):
+            self.assertTrue(limiter.hit('ip:10.0.0.1')[0])
+        allowed, retry_after = limiter.hit('ip:10.0.0.1')
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 12.0, delta=0.5)
+
+        # Other clients have their own buckets
+        self.assertTrue(limiter.hit('ip:10.0.0.2')[0])
+        stats = limiter.stats()
+        self.assertEqual((stats['allowed'], stats['limited'], stats['active_clients']), (6, 1, 2))
+
+    def test_sliding_refill(self):
+        """Tokens come back continuously, not at a window boundary"""
+        limiter = SharedRateLimiter(2, 0.2, slots=64)
+        self.assertTrue(limiter.hit('k')[0])
+        self.assertTrue(limiter.hit('k')[0])
+        self.assertFalse(limiter.hit('k')[0])
+        time.sleep(0.11)
+        self.assertTrue(limiter.hit('k')[0])
+        self.assertFalse(limiter.hit('k')[0])
+
+    def test_eviction_when_group_is_full(self):
+        """A table with one group keeps the most recently active clients"""
+        limiter = SharedRateLimiter(1, 60, slots=4)
+        for client in range(5):
+            self.assertTrue(limiter.hit(f'c{client}')[0])
+        stats = limiter.stats()
+        self.assertEqual(stats['evicted'], 1)
+        self.assertEqual(stats['active_clients'], 4)
+        self.assertFalse(limiter.hit('c4')[0])
+
+    def test_shared_with_forked_workers(self):
+        """Requests counted in a forked child use up the parent's budget"""
+        limiter = SharedRateLimiter(5, 60, slots=64)
+        pid = os.fork()
+        if pid == 0:
+            for _ in range(3):
+                limiter.hit('ip:10.0.0.9')
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertTrue(limiter.hit('ip:10.0.0.9')[0])
+        self.assertTrue(limiter.hit('ip:10.0.0.9')[0])
+        self.assertFalse(limiter.hit('ip:10.0.0.9')[0])
+        self.assertEqual(limiter.stats()['allowed'], 5)
+
+
+class TestRateLimitRoutes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        app_module.load_or_train_model()
+
+    def setUp(self):
+        self.client = app_module.app.test_client()
+
+    def test_api_routes_limited_per_client(self):
+        """Over-limit clients get 429 with Retry-After; API keys and /health are separate"""
+        payload = {'features': [5.1, 3.5, 1.4, 0.2]}
+        with mock.patch.object(app_module, 'rate_limiter', SharedRateLimiter(2, 60, slots=64)):
+            for _ in range(2):
+                self.assertEqual(self.client.post('/api/predict', json=payload).status_code, 200)
+            response = self.client.post('/api/predict', json=payload)
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.headers['Retry-After'], '30')
+            self.assertEqual(self.client.get('/health').status_code, 200)
+
+            headers = {app_module.config.RATE_LIMIT_API_KEY_HEADER: 'team-a'}
+            self.assertEqual(self.client.post('/api/predict', json=payload, headers=headers).status_code, 200)
+
+            metrics = json.loads(self.client.get('/api/metrics', headers=headers).data)
+            self.assertEqual(metrics['rate_limit']['limited'], 1)
+
+    def test_forwarded_clients_have_own_buckets(self):
+        """Behind a trusted proxy each forwarded address is limited on its own"""
+        payload = {'features': [5.1, 3.5, 1.4, 0.2]}
+        first = {'X-Forwarded-For': '203.0.113.7'}
+        second = {'X-Forwarded-For': '198.51.100.4, 203.0.113.9'}
+        with mock.patch.object(app_module, 'rate_limiter', SharedRateLimiter(2, 60, slots=64)), \
+                mock.patch.object(app_module.app, 'wsgi_app', app_module.app.wsgi_app):
+            app_module.trust_proxies(1)
+            for _ in range(2):
+                self.assertEqual(self.client.post('/api/predict', json=payload, headers=first).status_code, 200)
+            self.assertEqual(self.client.post('/api/predict', json=payload, headers=first).status_code, 429)
+            # Same proxy address, different client: only the last hop is trusted
+            self.assertEqual(self.client.post('/api/predict', json=payload, headers=second).status_code, 200)
+
+    def test_forwarded_address(self):
+        """Only as many X-Forwarded-For entries as trusted hops are believed"""
+        forwarded = '10.9.9.9, 198.51.100.4'
+        self.assertEqual(app_module.forwarded_address('172.18.0.3', forwarded, hops=0), '172.18.0.3')
+        self.assertEqual(app_module.forwarded_address('172.18.0.3', forwarded, hops=1), '198.51.100.4')
+        self.assertEqual(app_module.forwarded_address('172.18.0.3', forwarded, hops=2), '10.9.9.9')
+        self.assertEqual(app_module.forwarded_address('172.18.0.3', forwarded, hops=3), '172.18.0.3')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+Unit tests for the pre-fork production launcher
+"""
+
+import unittest
+import json
+import sys
+import os
+import signal
+import socket
+import subprocess
+import threading
+import time
+import urllib.request
+from unittest import mock
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from app import app, load_or_train_model
+from serve import Master, PooledWSGIServer, catch_up_model
+
+
+class TestPooledWSGIServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        load_or_train_model()
+        cls.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        cls.listener.bind(('127.0.0.1', 0))
+        cls.listener.listen(16)
+        host, port = cls.listener.getsockname()
+        cls.server = PooledWSGIServer(host, port, app, fd=cls.listener.fileno(), threads=2)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f'http://{host}:{port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.listener.close()
+
+    def test_serves_concurrent_predictions(self):
+        """Pooled threads answer more requests than there are threads"""
+        results = []
+
+        def call():
+            request = urllib.request.Request(
+                f'{self.base_url}/api/predict',
+                data=json.dumps({'features': [5.1, 3.5, 1.4, 0.2]}).encode(),
+                headers={'Content-Type': 'application/json'}
+            )
+            with urllib.request.urlopen(request, timeout=5) as response:
+                results.append(json.loads(response.read())['class'])
+
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['Setosa'] * 8)
+        # Slots clear once each handler returns, just after the response is sent
+        deadline = time.time() + 2
+        while any(self.server.busy_since) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(list(self.server.busy_since), [0.0, 0.0])
+
+
+class TestMaster(unittest.TestCase):
+
+    def test_kills_worker_over_timeout(self):
+        """A worker holding a request past the timeout is killed"""
+        child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        master = Master(listener=None, workers=1, threads=2, timeout=1.0)
+        master.workers[child.pid] = [time.time() - 5, 0.0]
+        master.kill_overdue()
+        self.assertEqual(child.wait(timeout=5), -9)
+
+    def test_stream_outlasting_timeout_is_not_killed(self):
+        """A response that keeps producing chunks runs past the timeout; only a stall counts"""
+        def slow_stream(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'application/x-ndjson')])
+            for i in range(8):
+                time.sleep(0.1)
+                yield f'{i}\n'.encode()
+
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(4)
+        host, port = listener.getsockname()
+        server = PooledWSGIServer(host, port, slow_stream, fd=listener.fileno(), threads=1)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(listener.close)
+        self.addCleanup(server.shutdown)
+
+        child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        self.addCleanup(child.kill)
+        master = Master(listener=None, workers=1, threads=1, timeout=0.3)
+        master.workers[child.pid] = server.busy_since
+
+        body = []
+        reader = threading.Thread(target=lambda: body.append(urllib.request.urlopen(f'http://{host}:{port}/', timeout=5).read()))
+        reader.start()
+        while reader.is_alive():
+            master.kill_overdue()
+            time.sleep(0.02)
+        self.assertEqual(body, [b''.join(f'{i}\n'.encode() for i in range(8))])
+        self.assertIsNone(child.poll())
+
+        # The same worker stalled for longer than the timeout is still killed
+        server.busy_since[0] = time.time() - 1
+        master.kill_overdue()
+        self.assertEqual(child.wait(timeout=5), -9)
+
+    def test_worker_exits_cleanly_on_sigterm(self):
+        """SIGTERM stops a worker's server so its shutdown flushing runs before exit"""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(4)
+        self.addCleanup(listener.close)
+        host, port = listener.getsockname()
+        master = Master(listener, workers=1, threads=2, timeout=5.0)
+        master.spawn()
+        (pid,) = master.workers
+
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                with urllib.request.urlopen(f'http://{host}:{port}/health', timeout=1):
+                    break
+            except OSError:
+                time.sleep(0.05)
+        os.kill(pid, signal.SIGTERM)
+        _, status = os.waitpid(pid, 0)
+        self.assertTrue(os.WIFEXITED(status))
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+
+    def test_reload_master_then_workers(self):
+        """SIGHUP reloads the master's own model first, so respawned workers fork the new one"""
+        import app as app_module
+
+        load_or_train_model()
+        old = app_module.bundle
+        child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        master = Master(listener=None, workers=1, threads=2, timeout=1.0)
+        master.workers[child.pid] = [0.0, 0.0]
+        master.reload_workers()
+        self.assertIsNot(app_module.bundle, old)
+        self.assertEqual(child.wait(timeout=5), -signal.SIGHUP)
+
+    def test_worker_reuses_masters_model(self):
+        """A forked worker reloads from disk only when the files changed after the master loaded them"""
+        import app as app_module
+
+        load_or_train_model()
+        with mock.patch.object(app_module, 'reload_model', return_value=True) as reload_model:
+            self.assertFalse(catch_up_model())
+            reload_model.assert_not_called()
+            stat = os.stat(config.MODEL_PATH)
+            os.utime(config.MODEL_PATH, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+            self.assertTrue(catch_up_model())
+            reload_model.assert_called_once_with(only_if_changed=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
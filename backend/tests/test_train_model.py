@@ -0,0 +1,39 @@
+"""
+Unit tests for latency-budgeted forest selection
+"""
+
+import unittest
+import sys
+import os
+
+from sklearn.datasets import load_iris
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from train_model import select_forest
+
+
+class TestSelectForest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.iris = load_iris()
+
+    def test_node_budget_picks_smallest_accurate_forest(self):
+        """The chosen forest fits the node budget and the accuracy tolerance"""
+        model, scaler, report = select_forest(
+            self.iris.data, self.iris.target, max_nodes=200, tolerance=0.05,
+            n_estimators_grid=(5, 25), max_depth_grid=(2, 4), cv=3
+        )
+        chosen = report['chosen']
+        self.assertLessEqual(chosen['n_nodes'], 200)
+        self.assertGreaterEqual(chosen['cv_accuracy'], report['reference']['cv_accuracy'] - 0.05)
+        self.assertEqual(model.n_estimators, chosen['n_estimators'])
+        eligible = [c for c in report['candidates'] if c['within_tolerance'] and c['within_budget']]
+        self.assertEqual(chosen['n_nodes'], min(c['n_nodes'] for c in eligible))
+        self.assertEqual(len(report['candidates']), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Tests for the Unix-domain-socket prediction server
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from uds import UnixPredictionClient, bind_unix_socket
+
+
+class TestUnixPredictionServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        app_module.load_or_train_model()
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmpdir.name, 'predict.sock')
+        cls.server = app_module.start_unix_server(bind_unix_socket(cls.path))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+        app_module.unix_server = None
+        cls.tmpdir.cleanup()
+
+    def setUp(self):
+        self.client = UnixPredictionClient(self.path)
+        self.rows = np.array([[5.1, 3.5, 1.4, 0.2], [6.3, 3.3, 6.0, 2.5], [5.9, 3.0, 4.2, 1.5]])
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_matches_http_model(self):
+        """Round trips return the same classes and probabilities as the shared engine"""
+        expected_predictions, expected_probabilities = app_module.predict_rows(self.rows)
+        predictions, probabilities = self.client.predict(self.rows, dtype=np.float64)
+        np.testing.assert_array_equal(predictions, expected_predictions)
+        np.testing.assert_array_equal(probabilities, expected_probabilities)
+
+        # Persistent connection: several float32 requests on one socket
+        for row in self.rows.astype(np.float32):
+            predictions, probabilities = self.client.predict(row)
+            self.assertEqual(probabilities.dtype, np.float32)
+            self.assertEqual(probabilities.shape, (1, 3))
+
+    def test_errors_and_metrics(self):
+        """Bad rows answer with an error frame and show up in /api/metrics"""
+        before = self.server.stats()
+        with self.assertRaises(ValueError):
+            self.client.predict([[np.nan, 1.0, 1.0, 1.0]])
+        self.client.predict(self.rows)
+
+        metrics = app_module.metrics_payload()['unix_socket']
+        self.assertEqual(metrics['errors'], before['errors'] + 1)
+        self.assertEqual(metrics['rows'], before['rows'] + len(self.rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
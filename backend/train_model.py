@@ -4,11 +4,18 @@ Can be run manually to retrain the model
 """
 
 import os
+import json
+import time
+import argparse
 import joblib
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.datasets import load_iris
+from sklearn.model_selection import cross_val_score
+from inference import CompiledForest, QuantizedForest, probe_inputs, precision_report
+from exporter import export_predictor_module
+from artifact import atomic_write, save_forest
 
 def train_iris_model():
     """Train a Random Forest model on iris dataset"""
@@ -38,8 +45,10 @@ def train_iris_model():
     
     # Save model and scaler
     os.makedirs('models', exist_ok=True)
-    joblib.dump(model, 'models/iris_model.pkl')
-    joblib.dump(scaler, 'models/scaler.pkl')
+    with atomic_write('models/iris_model.pkl') as f:
+        joblib.dump(model, f)
+    with atomic_write('models/scaler.pkl') as f:
+        joblib.dump(scaler, f)
     
     print("✓ Model saved to models/iris_model.pkl")
     print("✓ Scaler saved to models/scaler.pkl")
@@ -53,7 +62,161 @@ def train_iris_model():
     accuracy = model.score(X_scaled, y)
     print(f"\nTraining Accuracy: {accuracy:.4f}")
     
+    report_reduced_precision(model, scaler, X)
+    
+    return model, scaler
+
+def report_reduced_precision(model, scaler, X):
+    """Compare compact serving representations against the full forest"""
+    forest = CompiledForest.from_sklearn(model).fold_scaler(scaler)
+    
+    print("\nReduced-precision serving representations:")
+    print(f"  float64: {forest.nbytes} bytes")
+    for precision in QuantizedForest.PRECISIONS:
+        compact = QuantizedForest(forest, precision)
+        for name, rows in (('iris data', X), ('split probes', probe_inputs(forest))):
+            report = precision_report(forest, compact, rows)
+            print(
+                f"  {precision} on {name}: {report['candidate_bytes']} bytes, "
+                f"max probability deviation {report['max_abs_probability_deviation']:.6f}, "
+                f"class flip rate {report['class_flip_rate']:.4%}"
+            )
+
+def measure_row_latency(model, scaler, X, n_calls=500):
+    """Per-row serving latency (microseconds) of the compiled, scaler-folded forest"""
+    forest = CompiledForest.from_sklearn(model).fold_scaler(scaler)
+    rows = X[np.arange(n_calls) % len(X)]
+    timings = np.empty(n_calls)
+    
+    for i in range(n_calls):
+        row = rows[i:i + 1]
+        start = time.perf_counter()
+        forest.score(row)
+        timings[i] = time.perf_counter() - start
+    
+    timings *= 1e6
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99))
+
+def select_forest(X, y, target_p99_us=None, max_nodes=None, tolerance=0.01,
+                  n_estimators_grid=(5, 10, 25, 50, 100), max_depth_grid=(2, 3, 4, 6, 10),
+                  cv=5):
+    """Find the smallest forest within tolerance of the full model's accuracy
+    
+    Every (n_estimators, max_depth) pair is scored by cross-validation and by
+    measured per-row serving latency. Among candidates whose accuracy is within
+    ``tolerance`` of the full 100-tree, depth-10 model and that meet the p99 and
+    node budgets, the one with the fewest nodes wins. Returns
+    (model, scaler, report).
+    """
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    
+    def evaluate(n_estimators, max_depth):
+        model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=42)
+        accuracy = float(cross_val_score(model, X_scaled, y, cv=cv).mean())
+        model.fit(X_scaled, y)
+        p50_us, p99_us = measure_row_latency(model, scaler, X)
+        n_nodes = int(sum(estimator.tree_.node_count for estimator in model.estimators_))
+        return model, {
+            'n_estimators': n_estimators,
+            'max_depth': max_depth,
+            'n_nodes': n_nodes,
+            'cv_accuracy': accuracy,
+            'p50_us': p50_us,
+            'p99_us': p99_us,
+        }
+    
+    _, reference = evaluate(100, 10)
+    floor = reference['cv_accuracy'] - tolerance
+    
+    candidates = []
+    for n_estimators in n_estimators_grid:
+        for max_depth in max_depth_grid:
+            model, row = evaluate(n_estimators, max_depth)
+            row['within_tolerance'] = row['cv_accuracy'] >= floor
+            row['within_budget'] = (
+                (target_p99_us is None or row['p99_us'] <= target_p99_us)
+                and (max_nodes is None or row['n_nodes'] <= max_nodes)
+            )
+            candidates.append((model, row))
+            print(
+                f"  trees={n_estimators:<4} depth={max_depth:<3} nodes={row['n_nodes']:<6} "
+                f"accuracy={row['cv_accuracy']:.4f} p99={row['p99_us']:.1f}us"
+            )
+    
+    eligible = [c for c in candidates if c[1]['within_tolerance'] and c[1]['within_budget']]
+    if eligible:
+        model, chosen = min(eligible, key=lambda c: (c[1]['n_nodes'], c[1]['p99_us']))
+    else:
+        # Nothing meets the budget: take the fastest model that is still accurate enough
+        print("⚠ No candidate meets the latency/node budget; choosing the fastest accurate one")
+        accurate = [c for c in candidates if c[1]['within_tolerance']]
+        model, chosen = min(accurate, key=lambda c: c[1]['p99_us'])
+    
+    report = {
+        'target_p99_us': target_p99_us,
+        'max_nodes': max_nodes,
+        'tolerance': tolerance,
+        'reference': reference,
+        'chosen': chosen,
+        'candidates': [row for _, row in candidates],
+    }
+    return model, scaler, report
+
+def train_latency_budgeted_model(target_p99_us=None, max_nodes=None, tolerance=0.01):
+    """Select, save and report the smallest forest that fits the serving budget"""
+    
+    print("Loading iris dataset...")
+    iris = load_iris()
+    
+    print("Searching forest size and depth...")
+    model, scaler, report = select_forest(
+        iris.data, iris.target,
+        target_p99_us=target_p99_us, max_nodes=max_nodes, tolerance=tolerance
+    )
+    
+    os.makedirs('models', exist_ok=True)
+    with atomic_write('models/iris_model.pkl') as f:
+        joblib.dump(model, f)
+    with atomic_write('models/scaler.pkl') as f:
+        joblib.dump(scaler, f)
+    with atomic_write('models/selection_report.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    chosen = report['chosen']
+    print(
+        f"\n✓ Chose trees={chosen['n_estimators']} depth={chosen['max_depth']} "
+        f"({chosen['n_nodes']} nodes, accuracy {chosen['cv_accuracy']:.4f}, p99 {chosen['p99_us']:.1f}us)"
+    )
+    print("✓ Model saved to models/iris_model.pkl")
+    print("✓ Scaler saved to models/scaler.pkl")
+    print("✓ Report saved to models/selection_report.json")
+    
     return model, scaler
 
 if __name__ == '__main__':
-    train_iris_model()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--target-p99-us', type=float,
+                        help='select the smallest forest whose per-row p99 latency fits this budget')
+    parser.add_argument('--max-nodes', type=int,
+                        help='select the smallest forest with at most this many tree nodes')
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help='allowed accuracy drop versus the full 100-tree model (default: 0.01)')
+    parser.add_argument('--export-module', nargs='?', const='models/iris_predictor.py', metavar='PATH',
+                        help='also write a NumPy-only predictor module (default: models/iris_predictor.py)')
+    parser.add_argument('--export-artifact', nargs='?', const='models/iris_forest.bin', metavar='PATH',
+                        help='also write a memory-mappable forest artifact (default: models/iris_forest.bin)')
+    args = parser.parse_args()
+    
+    if args.target_p99_us is not None or args.max_nodes is not None:
+        model, scaler = train_latency_budgeted_model(args.target_p99_us, args.max_nodes, args.tolerance)
+    else:
+        model, scaler = train_iris_model()
+    
+    if args.export_module:
+        export_predictor_module(model, scaler, args.export_module)
+        print(f"✓ Predictor module saved to {args.export_module}")
+    
+    if args.export_artifact:
+        save_forest(CompiledForest.from_sklearn(model).fold_scaler(scaler), args.export_artifact)
+        print(f"✓ Forest artifact saved to {args.export_artifact}")
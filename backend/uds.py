@@ -0,0 +1,157 @@
+"""
+Unix-domain-socket prediction server for co-located clients
+Speaks a length-prefixed binary protocol on persistent connections, so local
+callers skip TCP, HTTP and JSON. It scores through the same predict function
+(and therefore the same loaded model) as the HTTP routes.
+
+Request:  <uint32 n_rows><uint8 dtype> then n_rows x 4 little-endian floats
+Response: <uint8 status><uint32 count>
+          status 0: count = n_rows, then n_rows uint8 class ids and
+                    n_rows x 3 probabilities in the request dtype
+          status 1: count = length of the UTF-8 error message that follows
+dtype is 0 for float32 and 1 for float64.
+"""
+
+import logging
+import os
+import socket
+import struct
+import threading
+
+import numpy as np
+
+logger = logging.getLogger('uds')
+
+REQUEST_HEADER = struct.Struct('<IB')
+RESPONSE_HEADER = struct.Struct('<BI')
+DTYPES = {0: np.dtype('<f4'), 1: np.dtype('<f8')}
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+def recv_exact(conn, n_bytes):
+    """Read exactly n_bytes; raises EOFError if the peer closes first"""
+    buffer = bytearray(n_bytes)
+    view = memoryview(buffer)
+    received = 0
+    while received < n_bytes:
+        n = conn.recv_into(view[received:])
+        if not n:
+            raise EOFError('connection closed')
+        received += n
+    return buffer
+
+
+def bind_unix_socket(path):
+    """Listening socket at path, replacing a stale socket file"""
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(socket.SOMAXCONN)
+    return listener
+
+
+class UnixPredictionServer:
+    """Accept loop plus one thread per persistent client connection"""
+
+    def __init__(self, predict_fn, listener, max_rows=10000, n_features=4):
+        self.predict_fn = predict_fn
+        self.listener = listener
+        self.max_rows = max_rows
+        self.n_features = n_features
+        self._lock = threading.Lock()
+        self._stats = {'connections': 0, 'requests': 0, 'rows': 0, 'errors': 0}
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name='uds-accept', daemon=True)
+        thread.start()
+        return thread
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                # Listener closed
+                return
+            with self._lock:
+                self._stats['connections'] += 1
+            threading.Thread(target=self.handle, args=(conn,), name='uds-conn', daemon=True).start()
+
+    def handle(self, conn):
+        try:
+            while True:
+                try:
+                    n_rows, dtype_code = REQUEST_HEADER.unpack(recv_exact(conn, REQUEST_HEADER.size))
+                except EOFError:
+                    return
+
+                dtype = DTYPES.get(dtype_code)
+                if dtype is None or not 0 < n_rows <= self.max_rows:
+                    # The body length cannot be trusted, so drop the connection after answering
+                    self.send_error(conn, f'Expected 1-{self.max_rows} rows and dtype 0 or 1')
+                    return
+
+                body = recv_exact(conn, n_rows * self.n_features * dtype.itemsize)
+                features = np.frombuffer(body, dtype=dtype).reshape(n_rows, self.n_features)
+                try:
+                    predictions, probabilities = self.predict_fn(features)
+                except Exception as e:
+                    self.send_error(conn, str(e))
+                    continue
+
+                # Counted before replying, so a client that reads stats next sees it
+                with self._lock:
+                    self._stats['requests'] += 1
+                    self._stats['rows'] += n_rows
+                conn.sendall(
+                    RESPONSE_HEADER.pack(STATUS_OK, n_rows)
+                    + np.asarray(predictions, dtype=np.uint8).tobytes()
+                    + np.ascontiguousarray(probabilities, dtype=dtype).tobytes()
+                )
+        except (EOFError, OSError) as e:
+            logger.warning(f"Unix socket client dropped: {str(e)}")
+        finally:
+            conn.close()
+
+    def send_error(self, conn, message):
+        with self._lock:
+            self._stats['errors'] += 1
+        encoded = message.encode()
+        conn.sendall(RESPONSE_HEADER.pack(STATUS_ERROR, len(encoded)) + encoded)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        self.listener.close()
+
+
+class UnixPredictionClient:
+    """Blocking client for UnixPredictionServer over one persistent connection"""
+
+    def __init__(self, path, n_features=4, n_classes=3):
+        self.n_features = n_features
+        self.n_classes = n_classes
+        self.conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.conn.connect(path)
+
+    def predict(self, features, dtype=np.float32):
+        """Returns (class ids, probabilities) for an (N, 4) array; raises ValueError on a server error"""
+        dtype = np.dtype(dtype).newbyteorder('<')
+        code = {v: k for k, v in DTYPES.items()}[dtype]
+        features = np.ascontiguousarray(features, dtype=dtype).reshape(-1, self.n_features)
+        self.conn.sendall(REQUEST_HEADER.pack(len(features), code) + features.tobytes())
+
+        status, count = RESPONSE_HEADER.unpack(recv_exact(self.conn, RESPONSE_HEADER.size))
+        if status != STATUS_OK:
+            raise ValueError(recv_exact(self.conn, count).decode())
+        body = recv_exact(self.conn, count + count * self.n_classes * dtype.itemsize)
+        predictions = np.frombuffer(body, dtype=np.uint8, count=count)
+        probabilities = np.frombuffer(body, dtype=dtype, offset=count).reshape(count, self.n_classes)
+        return predictions, probabilities
+
+    def close(self):
+        self.conn.close()